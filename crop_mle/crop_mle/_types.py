@@ -1,5 +1,9 @@
 from dataclasses import dataclass, field
+from functools import cached_property
 from typing import Dict, List
+import json
+import numpy as np
+import pandas as pd
 
 
 @dataclass
@@ -81,3 +85,82 @@ class CropTypeDictionary(LabelsDictionary):
             "Vineyard": 31,
         }
     )
+
+    @classmethod
+    def from_file(cls, path: str) -> "CropTypeDictionary":
+        """
+        Load a label dictionary from a JSON or YAML file with `crop_dict` and/or `crop_numeric` keys.
+            Keys that are left out fall back to the built-in defaults.
+
+        Args:
+            path (str): Path to a .json, .yaml or .yml file.
+
+        Returns:
+            CropTypeDictionary: Label dictionary built from the file.
+        """
+        with open(path) as f:
+            if path.endswith((".yaml", ".yml")):
+                try:
+                    import yaml
+                except ImportError as e:
+                    raise ImportError(
+                        "Loading a YAML label map requires PyYAML (pip install pyyaml)"
+                    ) from e
+                data = yaml.safe_load(f)
+            else:
+                data = json.load(f)
+        return cls(**data)
+
+    @cached_property
+    def alias_lookup(self) -> Dict[str, str]:
+        """
+        Inverse of `crop_dict`: raw label alias -> standardized crop type. The first crop type listing an alias wins.
+            Built once per instance, so `crop_dict` should not be mutated after first use.
+        """
+        lookup = {}
+        for crop, aliases in self.crop_dict.items():
+            for alias in aliases:
+                lookup.setdefault(alias, crop)
+        return lookup
+
+    @cached_property
+    def name_lookup(self) -> np.ndarray:
+        """
+        Inverse of `crop_numeric` as an object array: `name_lookup[i]` is the crop type for predicted int `i` (None if unused).
+        """
+        size = max((v for v in self.crop_numeric.values() if v >= 0), default=-1) + 1
+        lookup = np.full(size, None, dtype=object)
+        for crop, value in self.crop_numeric.items():
+            if value >= 0 and lookup[value] is None:
+                lookup[value] = crop
+        return lookup
+
+    @cached_property
+    def label_dtype(self) -> pd.CategoricalDtype:
+        """
+        Categorical dtype over the standardized crop types, in `crop_dict` order (the confusion matrix order).
+        """
+        return pd.CategoricalDtype(categories=list(self.crop_dict.keys()))
+
+    def names_from_ints(self, values) -> np.ndarray:
+        """
+        Vectorized lookup of standardized crop types for predicted ints.
+
+        Args:
+            values (array-like): Predicted ints (floats and NaN are accepted, as left by merges).
+
+        Returns:
+            np.ndarray: Object array of crop types, None where a value has no crop type.
+        """
+        codes = pd.to_numeric(pd.Series(values), errors="coerce").to_numpy(
+            dtype=np.float64, na_value=np.nan
+        )
+        names = np.full(codes.shape, None, dtype=object)
+        valid = (
+            np.isfinite(codes)
+            & (codes >= 0)
+            & (codes < len(self.name_lookup))
+            & (codes == np.floor(codes))
+        )
+        names[valid] = self.name_lookup.take(codes[valid].astype(np.int64))
+        return names
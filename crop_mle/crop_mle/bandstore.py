@@ -0,0 +1,217 @@
+from dataclasses import dataclass
+import json
+import os
+import numpy as np
+import rasterio as rio
+from affine import Affine
+from rasterio.enums import MaskFlags
+from rasterio.mask import raster_geometry_mask
+from rasterio.windows import Window, transform as window_transform
+
+DATA_FILE = "bands.npy"
+MASK_FILE = "masks.npy"
+META_FILE = "meta.json"
+
+
+@dataclass
+class BandStore:
+    """
+    Uncompressed, memory-mapped copy of the class/confidence bands of a prediction raster. `data` has shape
+        (len(bands), height, width); windows are numpy views into the mapping, so worker processes share the
+        decoded pixels through the OS page cache instead of each decompressing the GeoTIFF. Provides the
+        `transform`/`width`/`height`/`window_transform` attributes `rasterio.mask.raster_geometry_mask` needs.
+        `valid` holds the dataset masks of the bands when the raster has mask bands or alpha, which a nodata
+        comparison cannot reproduce.
+    """
+
+    data: np.ndarray
+    transform: Affine
+    crs: str
+    bands: list
+    nodata: float = None
+    source: dict = None
+    valid: np.ndarray = None
+
+    @property
+    def height(self) -> int:
+        return self.data.shape[1]
+
+    @property
+    def width(self) -> int:
+        return self.data.shape[2]
+
+    @property
+    def shape(self) -> tuple:
+        return self.data.shape[1:]
+
+    def window_transform(self, window: Window) -> Affine:
+        """Affine transform of `window`."""
+        return window_transform(window, self.transform)
+
+    def read(self, window: Window) -> np.ndarray:
+        """
+        Zero-copy view of all stored bands within `window`.
+
+        Args:
+            window (Window): Pixel window (must lie within the raster).
+
+        Returns:
+            np.ndarray: Array of shape (len(bands), window height, window width).
+        """
+        (row_start, row_stop), (col_start, col_stop) = window.toranges()
+        return self.data[:, row_start:row_stop, col_start:col_stop]
+
+    def mask(self, geom) -> np.ma.MaskedArray:
+        """
+        Stored bands cropped to the bounding window of `geom`, masked outside the geometry, where equal to the
+            raster's nodata value and where masked by its mask or alpha band; the same result as
+            `rasterio.mask.mask(src, [geom], crop=True, indexes=bands, filled=False)`. The data is a view into the
+            store, in its native dtype.
+
+        Args:
+            geom (shapely.Geometry): Field geometry.
+
+        Returns:
+            np.ma.MaskedArray: Array of shape (len(bands), window height, window width).
+        """
+        shape_mask, _, window = raster_geometry_mask(self, [geom], crop=True)
+        view = self.read(window)
+        invalid = np.broadcast_to(shape_mask, view.shape)
+        if self.nodata is not None:
+            invalid = invalid | (view == self.nodata)
+        if self.valid is not None:
+            (row_start, row_stop), (col_start, col_stop) = window.toranges()
+            invalid = invalid | ~self.valid[:, row_start:row_stop, col_start:col_stop]
+        return np.ma.MaskedArray(view, mask=invalid, copy=False)
+
+
+def _source_signature(raster_path: str) -> dict:
+    """Path, size and modification time of the source raster, used to detect stale stores."""
+    stat = os.stat(raster_path)
+    return {
+        "path": os.path.abspath(raster_path),
+        "size": stat.st_size,
+        "mtime_ns": stat.st_mtime_ns,
+    }
+
+
+def build_band_store(
+    raster_path: str, store_dir: str, bands: tuple = (3, 4), strip_rows: int = 1024
+) -> str:
+    """
+    Decode `bands` of the prediction raster once into `store_dir/bands.npy` (an uncompressed .npy file for
+        memory-mapping) and save the grid and source signature to `store_dir/meta.json`. If the bands are masked
+        by anything other than a nodata value (mask band, alpha band), their dataset masks are stored as well in
+        `store_dir/masks.npy`.
+
+    Args:
+        raster_path (str): Path to the prediction raster.
+        store_dir (str): Directory to write the store to.
+        bands (tuple): 1-based band indexes to extract (class band first, then confidence).
+        strip_rows (int): Rows decoded per read.
+
+    Returns:
+        str: `store_dir`.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    tmp_path = os.path.join(store_dir, "bands.tmp.npy")
+    mask_tmp_path = os.path.join(store_dir, "masks.tmp.npy")
+    with rio.open(raster_path) as src:
+        # nodata and all-valid masks are reproduced from the data, other masks have to be stored
+        with_masks = any(
+            src.mask_flag_enums[b - 1]
+            not in ([MaskFlags.all_valid], [MaskFlags.nodata])
+            for b in bands
+        )
+        shape = (len(bands), src.height, src.width)
+        data = np.lib.format.open_memmap(
+            tmp_path, mode="w+", dtype=np.dtype(src.dtypes[bands[0] - 1]), shape=shape
+        )
+        if with_masks:
+            valid = np.lib.format.open_memmap(
+                mask_tmp_path, mode="w+", dtype=bool, shape=shape
+            )
+        for row_start in range(0, src.height, strip_rows):
+            window = Window(
+                0, row_start, src.width, min(strip_rows, src.height - row_start)
+            )
+            rows = slice(row_start, row_start + window.height)
+            data[:, rows] = src.read(list(bands), window=window)
+            if with_masks:
+                valid[:, rows] = src.read_masks(list(bands), window=window) > 0
+        data.flush()
+        del data
+        if with_masks:
+            valid.flush()
+            del valid
+        meta = {
+            "transform": list(src.transform)[:6],
+            "crs": src.crs.to_wkt() if src.crs else None,
+            "bands": list(bands),
+            "nodata": src.nodata,
+            "masks": with_masks,
+            "source": _source_signature(raster_path),
+        }
+    # replace atomically so readers never map a half-written store
+    os.replace(tmp_path, os.path.join(store_dir, DATA_FILE))
+    if with_masks:
+        os.replace(mask_tmp_path, os.path.join(store_dir, MASK_FILE))
+    elif os.path.exists(os.path.join(store_dir, MASK_FILE)):
+        os.remove(os.path.join(store_dir, MASK_FILE))
+    with open(os.path.join(store_dir, META_FILE), "w") as f:
+        json.dump(meta, f, indent=2)
+    return store_dir
+
+
+def open_band_store(store_dir: str) -> BandStore:
+    """
+    Memory-map a store written by `build_band_store` (read-only).
+
+    Args:
+        store_dir (str): Store directory.
+
+    Returns:
+        BandStore: The mapped store.
+    """
+    with open(os.path.join(store_dir, META_FILE)) as f:
+        meta = json.load(f)
+    return BandStore(
+        data=np.load(os.path.join(store_dir, DATA_FILE), mmap_mode="r"),
+        transform=Affine(*meta["transform"]),
+        crs=meta["crs"],
+        bands=meta["bands"],
+        nodata=meta["nodata"],
+        source=meta["source"],
+        valid=(
+            np.load(os.path.join(store_dir, MASK_FILE), mmap_mode="r")
+            if meta.get("masks")
+            else None
+        ),
+    )
+
+
+def ensure_band_store(raster_path: str, store_dir: str, bands: tuple = (3, 4)) -> str:
+    """
+    Build the band store for `raster_path` in `store_dir` unless an up-to-date one (same raster path, size,
+        modification time and bands) already exists.
+
+    Args:
+        raster_path (str): Path to the prediction raster.
+        store_dir (str): Store directory.
+        bands (tuple): 1-based band indexes to extract.
+
+    Returns:
+        str: `store_dir`.
+    """
+    meta_path = os.path.join(store_dir, META_FILE)
+    if os.path.exists(meta_path) and os.path.exists(os.path.join(store_dir, DATA_FILE)):
+        with open(meta_path) as f:
+            meta = json.load(f)
+        # stores written before masks were recorded are rebuilt
+        if (
+            meta["source"] == _source_signature(raster_path)
+            and meta["bands"] == list(bands)
+            and "masks" in meta
+        ):
+            return store_dir
+    return build_band_store(raster_path, store_dir, bands)
@@ -0,0 +1,182 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import logging
+import os
+from crop_mle._types import CropTypeDictionary
+from crop_mle.evaluate import merge_predictions, write_analysis
+from crop_mle.metrics import MetricsAccumulator
+from crop_mle.outputs import output_path, write_fields
+from crop_mle.select_fields import select_records
+from crop_mle.zonal import rasterize_fields, raster_grid, zonal_aggregate
+
+
+def read_manifest(manifest_path: str) -> list:
+    """
+    Read a raster manifest: a CSV with a `raster` column and an optional `name` column.
+
+    Args:
+        manifest_path (str): Path to the manifest file.
+
+    Returns:
+        list: (name, raster path) tuples. Relative raster paths are resolved against the manifest's directory.
+    """
+    manifest = pd.read_csv(manifest_path)
+    base_dir = os.path.dirname(os.path.abspath(manifest_path))
+    paths = [os.path.join(base_dir, p) for p in manifest["raster"]]
+    if "name" in manifest.columns:
+        names = manifest["name"].astype(str).tolist()
+    else:
+        names = raster_names(paths)
+    return list(zip(names, paths))
+
+
+def raster_names(raster_paths: list) -> list:
+    """
+    Derive unique run names from raster file names.
+
+    Args:
+        raster_paths (list): Paths to the prediction rasters.
+
+    Returns:
+        list: One name per raster (file stem, suffixed with a counter when stems repeat).
+    """
+    names = []
+    for path in raster_paths:
+        stem = os.path.splitext(os.path.basename(path))[0]
+        name, i = stem, 1
+        while name in names:
+            i += 1
+            name = f"{stem}_{i}"
+        names.append(name)
+    return names
+
+
+def model_summary(
+    name: str, raster_path: str, metrics: MetricsAccumulator, final_df: pd.DataFrame
+) -> dict:
+    """
+    Headline metrics of one run for the model comparison table.
+
+    Args:
+        name (str): Run name.
+        raster_path (str): Path to the prediction raster.
+        metrics (MetricsAccumulator): Accumulated field-level metrics.
+        final_df (pd.DataFrame): The run's final results table.
+
+    Returns:
+        dict: Row of the comparison table.
+    """
+    count = int(metrics.gt_count.sum())
+    f1 = final_df["F1"].to_numpy(dtype=np.float64)
+    weights = final_df["Count"].to_numpy(dtype=np.float64)
+    return {
+        "Model": name,
+        "Raster": raster_path,
+        "Count": count,
+        "Percent Agreement": (
+            round(metrics.match_count.sum() / count * 100, 2) if count else np.nan
+        ),
+        "Macro F1": round(float(f1.mean()), 2) if f1.size else np.nan,
+        "Weighted F1": (
+            round(float((f1 * weights).sum() / weights.sum()), 2) if f1.size else np.nan
+        ),
+    }
+
+
+def evaluate_rasters(
+    fields: gpd.GeoDataFrame,
+    rasters: list,
+    label_col: str,
+    label_map: CropTypeDictionary,
+    out_dir: str,
+    mode: str = "analysis",
+    output_format: str = "gpkg",
+    columns: list = None,
+    row_group_size: int = None,
+    save_merged: bool = False,
+    bands: tuple = (3, 4),
+    n_bootstrap: int = 0,
+    select=select_records,
+    aggregate=None,
+) -> pd.DataFrame:
+    """
+    Evaluate several prediction rasters against one (schema-checked) ground truth set. Unless an `aggregate`
+        function is given, the block engine is used and the fields are rasterized once per distinct raster grid
+        and reused for every raster on that grid. Each run writes its usual outputs to
+        `out_dir/<name>/`; in analysis mode a `model_comparison.csv` of per-model agreement and F1 is written to `out_dir`.
+
+    Args:
+        fields (gpd.GeoDataFrame): Schema-checked ground truth fields.
+        rasters (list): (name, raster path) tuples.
+        label_col (str): Column name for crop type values.
+        label_map (CropTypeDictionary): Dictionary mapping crop types to labels.
+        out_dir (str): Directory to save the output files.
+        mode (str): 'analysis' or 'select'.
+        output_format (str): File format of the per-field outputs ('gpkg', 'parquet' or 'feather').
+        columns (list): Attribute columns to write to the per-field outputs (all columns if None).
+        row_group_size (int): Rows per Parquet row group / Feather record batch.
+        save_merged (bool): Also write each run's merged per-field table to `merged_fields.<format>`.
+        bands (tuple): 1-based (class, confidence) band indexes of the rasters.
+        n_bootstrap (int): If positive, add bootstrap confidence intervals to each run's final results.
+        select (callable): Selection function with the `select_records` signature.
+        aggregate (callable): Aggregation function with the `aggregate_predictions(raster_path, fields)` signature
+            applied to every raster (e.g. the configured 'field' engine, with a shared `pool` and `batches` so the
+            fields are ordered and encoded and the workers started once for all rasters), or None for the block
+            engine with shared field rasters.
+
+    Returns:
+        pd.DataFrame: Model comparison table (empty in select mode).
+    """
+    label_list = list(label_map.crop_dict.keys())
+    field_rasters = {}
+    summaries = []
+    for name, raster_path in rasters:
+        if aggregate is not None:
+            logging.info(f"Evaluating {name}: {raster_path}")
+            preds = aggregate(raster_path, fields)
+        else:
+            grid_key = repr(raster_grid(raster_path))
+            if grid_key not in field_rasters:
+                logging.info(
+                    f"Rasterizing {len(fields)} fields for the grid of {raster_path}"
+                )
+                field_rasters[grid_key] = rasterize_fields(raster_path, fields)
+            logging.info(f"Evaluating {name}: {raster_path}")
+            preds = zonal_aggregate(
+                raster_path, fields, field_raster=field_rasters[grid_key], bands=bands
+            )
+        merged_df = merge_predictions(fields, preds, label_col, label_map)
+
+        run_dir = os.path.join(out_dir, name)
+        os.makedirs(run_dir, exist_ok=True)
+        if save_merged:
+            write_fields(
+                merged_df,
+                output_path(run_dir, "merged_fields", output_format),
+                output_format,
+                columns,
+                row_group_size,
+            )
+        if mode == "select":
+            selected = select(merged_df, "pred_label", "gt_label", "confidence")
+            write_fields(
+                selected,
+                output_path(run_dir, "selected_fields", output_format),
+                output_format,
+                columns,
+                row_group_size,
+            )
+        else:
+            metrics = MetricsAccumulator.from_label_map(label_map).update_frame(
+                merged_df, "gt_label", "pred_label", "confidence", label_map
+            )
+            final_df = write_analysis(
+                metrics, label_list, run_dir, n_bootstrap=n_bootstrap
+            )
+            summaries.append(model_summary(name, raster_path, metrics, final_df))
+
+    comparison = pd.DataFrame(summaries)
+    if mode != "select":
+        comparison.to_csv(os.path.join(out_dir, "model_comparison.csv"), index=False)
+    return comparison
@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+from datetime import datetime
+import geopandas as gpd
+from crop_mle._types import CropTypeDictionary
+from crop_mle.evaluate import (
+    schema_check,
+    merge_predictions,
+    record_count,
+    agreement,
+    average_confidence,
+    cm_f1,
+)
+from crop_mle.metrics import MetricsAccumulator
+from crop_mle.process import aggregate_predictions
+from crop_mle.select_fields import select_records
+from crop_mle.synthetic import synthetic_raster, synthetic_fields
+from crop_mle.zonal import zonal_aggregate
+
+ENGINES = {"field": aggregate_predictions, "block": zonal_aggregate}
+
+
+def peak_rss_mb() -> tuple:
+    """
+    High-water resident set size of this process and of its (finished) child processes, e.g. pool workers.
+
+    Returns:
+        tuple: Peak RSS in MB of this process (float) and of its largest child (float).
+    """
+    scale = 1024**2 if sys.platform == "darwin" else 1024  # bytes on macOS, KB on Linux
+    return (
+        resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / scale,
+        resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / scale,
+    )
+
+
+def time_stage(func, repeat: int = 1) -> tuple:
+    """
+    Run `func` `repeat` times and keep the fastest run.
+
+    Args:
+        func (callable): Stage to time, called without arguments.
+        repeat (int): Number of runs.
+
+    Returns:
+        tuple: Result of the last run, best wall seconds (float), CPU seconds of that run including children (float).
+    """
+    best = None
+    for _ in range(repeat):
+        cpu_start = os.times()
+        wall_start = time.perf_counter()
+        result = func()
+        wall = time.perf_counter() - wall_start
+        cpu_end = os.times()
+        cpu = sum(cpu_end[:4]) - sum(cpu_start[:4])  # user + system, self + children
+        if best is None or wall < best[0]:
+            best = (wall, cpu)
+    return result, best[0], best[1]
+
+
+def git_commit() -> str:
+    """Current git commit of the repository (None outside a git checkout)."""
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    sizes: list,
+    work_dir: str,
+    width: int = 8192,
+    height: int = 8192,
+    tile_size: int = 512,
+    engines: list = ("field", "block"),
+    repeat: int = 1,
+    seed: int = 0,
+    compress: str = None,
+) -> list:
+    """
+    Time each stage of the aggregation and evaluation pipeline on synthetic data: reading the ground truth, schema
+        check, aggregation (per engine), merge and label standardization, the metric functions (legacy pandas/sklearn
+        functions and `MetricsAccumulator`) and `select_records`. Synthetic rasters and fields are written to
+        `work_dir` once and reused by later runs with the same parameters.
+
+    Args:
+        sizes (list): Numbers of fields to benchmark.
+        work_dir (str): Directory for the synthetic raster and ground truth files.
+        width (int): Synthetic raster width in pixels.
+        height (int): Synthetic raster height in pixels.
+        tile_size (int): Synthetic raster tile size in pixels (0 for an untiled raster).
+        engines (list): Aggregation engines to time ('field' and/or 'block').
+        repeat (int): Runs per stage; the fastest is reported.
+        seed (int): Random seed for the synthetic data.
+        compress (str): Compression of the synthetic raster (None for an uncompressed raster).
+
+    Returns:
+        list: One record per (n_fields, stage) with wall/CPU seconds, fields per second and peak RSS.
+    """
+    os.makedirs(work_dir, exist_ok=True)
+    label_map = CropTypeDictionary()
+    raster_path = os.path.join(
+        work_dir,
+        f"raster_{width}x{height}_t{tile_size}_s{seed}_{compress or 'raw'}.tif",
+    )
+    if not os.path.exists(raster_path):
+        synthetic_raster(
+            raster_path, width, height, tile_size, seed=seed, compress=compress
+        )
+
+    records = []
+    for n_fields in sizes:
+        gt_path = os.path.join(
+            work_dir, f"fields_{n_fields}_{os.path.basename(raster_path)}.gpkg"
+        )
+        if not os.path.exists(gt_path):
+            synthetic_fields(raster_path, n_fields, label_map, seed=seed).to_file(
+                gt_path, driver="GPKG"
+            )
+
+        def record(stage, seconds, cpu_seconds):
+            rss, rss_children = peak_rss_mb()
+            records.append(
+                {
+                    "n_fields": n_fields,
+                    "stage": stage,
+                    "seconds": round(seconds, 4),
+                    "cpu_seconds": round(cpu_seconds, 4),
+                    "fields_per_sec": round(n_fields / seconds, 1) if seconds else None,
+                    "peak_rss_mb": round(rss, 1),
+                    "peak_rss_children_mb": round(rss_children, 1),
+                }
+            )
+            print(f"{n_fields:>9} {stage:<22} {seconds:>9.3f}s", flush=True)
+
+        fields, *timing = time_stage(lambda: gpd.read_file(gt_path), repeat)
+        record("read", *timing)
+        fields, *timing = time_stage(
+            lambda: schema_check(fields.copy(), "normalized_label", label_map), repeat
+        )
+        record("schema_check", *timing)
+
+        for engine in engines:
+            preds, *timing = time_stage(
+                lambda: ENGINES[engine](raster_path, fields), repeat
+            )
+            record(f"aggregate_{engine}", *timing)
+
+        merged, *timing = time_stage(
+            lambda: merge_predictions(fields, preds, "normalized_label", label_map),
+            repeat,
+        )
+        record("merge_standardize", *timing)
+
+        def legacy_metrics():
+            cm_f1(merged, "gt_label", "pred_label", label_map)
+            record_count(merged, "gt_label")
+            agreement(merged, "gt_label", "pred_label")
+            average_confidence(merged, "pred_label", "confidence")
+
+        _, *timing = time_stage(legacy_metrics, repeat)
+        record("metrics_legacy", *timing)
+        _, *timing = time_stage(
+            lambda: MetricsAccumulator.from_label_map(label_map)
+            .update_frame(merged, "gt_label", "pred_label", "confidence", label_map)
+            .final_results(),
+            repeat,
+        )
+        record("metrics_accumulator", *timing)
+        _, *timing = time_stage(
+            lambda: select_records(
+                merged.copy(), "pred_label", "gt_label", "confidence"
+            ),
+            repeat,
+        )
+        record("select_records", *timing)
+    return records
+
+
+def main():
+    """
+    Run the synthetic benchmark suite and write the results as JSON.
+
+    Example usage:
+        python -m crop_mle.benchmark --sizes 10000 150000 1000000 --output bench.json
+    """
+    parser = argparse.ArgumentParser(
+        description="Synthetic benchmark of the aggregation and evaluation pipeline."
+    )
+    parser.add_argument(
+        "--sizes",
+        type=int,
+        nargs="+",
+        default=[10_000, 150_000, 1_000_000],
+        help="Numbers of synthetic fields to benchmark",
+    )
+    parser.add_argument(
+        "--work_dir",
+        type=str,
+        default=os.path.join(os.path.dirname(__file__), "..", ".bench"),
+        help="Directory for the synthetic raster and ground truth files (reused across runs)",
+    )
+    parser.add_argument("--width", type=int, default=8192, help="Raster width")
+    parser.add_argument("--height", type=int, default=8192, help="Raster height")
+    parser.add_argument(
+        "--tile_size", type=int, default=512, help="Raster tile size (0 for untiled)"
+    )
+    parser.add_argument(
+        "--compress",
+        type=str,
+        required=False,
+        help="Raster compression, e.g. 'deflate' or 'zstd' (default: uncompressed)",
+    )
+    parser.add_argument(
+        "--engines",
+        type=str,
+        nargs="+",
+        default=["field", "block"],
+        choices=list(ENGINES),
+        help="Aggregation engines to time",
+    )
+    parser.add_argument("--repeat", type=int, default=1, help="Runs per stage")
+    parser.add_argument("--seed", type=int, default=0, help="Random seed")
+    parser.add_argument(
+        "--output",
+        type=str,
+        default="benchmark.json",
+        help="Path of the JSON results file",
+    )
+    args = parser.parse_args()
+
+    records = run_benchmark(
+        args.sizes,
+        args.work_dir,
+        width=args.width,
+        height=args.height,
+        tile_size=args.tile_size,
+        engines=args.engines,
+        repeat=args.repeat,
+        seed=args.seed,
+        compress=args.compress,
+    )
+    report = {
+        "timestamp": datetime.now().isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "raster": {
+            "width": args.width,
+            "height": args.height,
+            "tile_size": args.tile_size,
+            "compress": args.compress,
+        },
+        "repeat": args.repeat,
+        "results": records,
+    }
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+    print(f"Results written to {args.output}")
+
+
+if __name__ == "__main__":
+    main()
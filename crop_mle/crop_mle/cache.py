@@ -0,0 +1,272 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import shapely
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from dataclasses import dataclass, field
+from crop_mle.process import predictions_frame
+
+CACHE_MODES = ["off", "reuse", "refresh"]
+# part files per cache directory before they are compacted into one
+COMPACT_PARTS = 64
+
+
+@dataclass
+class CacheIndex:
+    """
+    In-memory view of one cache directory: the part files read so far and the latest entry per field_id, as
+        (geometry hash, predicted class, confidence).
+    """
+
+    parts: set = field(default_factory=set)
+    entries: dict = field(default_factory=dict)
+
+
+# cache directory -> CacheIndex, so each part file is read once per process
+_indexes = {}
+_lock = threading.Lock()
+
+
+def file_fingerprint(path: str, chunk_bytes: int = 1 << 24) -> str:
+    """
+    Content hash (BLAKE2b, 128-bit) of a file.
+
+    Args:
+        path (str): Path to the file.
+        chunk_bytes (int): Read size used while hashing.
+
+    Returns:
+        str: Hex digest of the file contents.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(chunk_bytes), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def raster_fingerprint(raster_path: str, cache_dir: str) -> str:
+    """
+    Content hash of the prediction raster, memoized in `cache_dir` by (path, size, mtime) so an unchanged raster
+        is only hashed once.
+
+    Args:
+        raster_path (str): Path to the prediction raster.
+        cache_dir (str): Cache directory.
+
+    Returns:
+        str: Hex digest of the raster contents.
+    """
+    memo_path = os.path.join(cache_dir, "fingerprints.json")
+    stat = os.stat(raster_path)
+    key = f"{os.path.abspath(raster_path)}|{stat.st_size}|{stat.st_mtime_ns}"
+    memo = _read_memo(memo_path)
+    if key in memo:
+        return memo[key]
+    fingerprint = file_fingerprint(raster_path)
+    # merge with entries other runs added while hashing, and replace the file atomically so a concurrent
+    # reader never sees a partial memo
+    memo = _read_memo(memo_path)
+    memo[key] = fingerprint
+    tmp_path = f"{memo_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(memo, f, indent=2)
+    os.replace(tmp_path, memo_path)
+    return fingerprint
+
+
+def _read_memo(memo_path: str) -> dict:
+    if not os.path.exists(memo_path):
+        return {}
+    with open(memo_path) as f:
+        return json.load(f)
+
+
+def geometry_hashes(geoms) -> np.ndarray:
+    """
+    Content hash (BLAKE2b, 128-bit) of each geometry's WKB.
+
+    Args:
+        geoms (array-like): Shapely geometries.
+
+    Returns:
+        np.ndarray: Hex digest per geometry.
+    """
+    return np.array(
+        [
+            hashlib.blake2b(wkb, digest_size=16).hexdigest()
+            for wkb in shapely.to_wkb(np.asarray(geoms))
+        ],
+        dtype=object,
+    )
+
+
+def _part_files(cache_path: str) -> list:
+    # part names start with a zero-padded timestamp, so name order is write order
+    return sorted(
+        name
+        for name in os.listdir(cache_path)
+        if name.startswith("part-") and name.endswith(".parquet")
+    )
+
+
+def _write_part(cache_path: str, rows: pd.DataFrame) -> str:
+    name = f"part-{time.time_ns():020d}-{os.getpid()}-{uuid.uuid4().hex[:8]}.parquet"
+    # write to a temporary file first so an interrupted run never leaves a truncated part
+    tmp_path = os.path.join(cache_path, name + ".tmp")
+    rows.to_parquet(tmp_path, index=False)
+    os.replace(tmp_path, os.path.join(cache_path, name))
+    return name
+
+
+def _update_index(index: CacheIndex, cache_path: str, names) -> None:
+    for name in names:
+        try:
+            part = pd.read_parquet(os.path.join(cache_path, name))
+        except FileNotFoundError:
+            # compacted away by another run; its entries are in the newer compacted part
+            continue
+        index.entries.update(
+            zip(
+                part["field_id"],
+                zip(part["geom_hash"], part["predicted_int"], part["confidence"]),
+            )
+        )
+        index.parts.add(name)
+
+
+def _entries_frame(entries: dict) -> pd.DataFrame:
+    values = list(entries.values())
+    return pd.DataFrame(
+        {
+            "field_id": pd.Series(list(entries.keys()), dtype=object),
+            "geom_hash": pd.Series([v[0] for v in values], dtype=object),
+            "predicted_int": pd.Series([v[1] for v in values], dtype=np.float64),
+            "confidence": pd.Series([v[2] for v in values], dtype=np.float64),
+        }
+    )
+
+
+def read_cache(cache_path: str) -> pd.DataFrame:
+    """
+    Read the entries of a cache directory, one row per field_id with its latest geometry hash and result.
+
+    Args:
+        cache_path (str): Cache directory of one raster and band pair, `cache_dir/<fingerprint>_bands<c>-<f>`.
+
+    Returns:
+        pd.DataFrame: DataFrame with field_id, geom_hash, predicted_int and confidence columns.
+    """
+    index = CacheIndex()
+    _update_index(index, cache_path, _part_files(cache_path))
+    return _entries_frame(index.entries)
+
+
+def cached_aggregate(
+    raster_path: str,
+    fields: gpd.GeoDataFrame,
+    aggregate,
+    cache_dir: str,
+    mode: str = "reuse",
+    bands: tuple = (3, 4),
+) -> gpd.GeoDataFrame:
+    """
+    Wrap an aggregation function with an on-disk cache of per-field results. Results are stored as Parquet part
+        files in `cache_dir/<raster fingerprint>_bands<class>-<confidence>/`, keyed by field_id and geometry hash,
+        so only fields that are new, whose geometry changed, or that were aggregated against different raster
+        contents are recomputed. Each call appends one part holding its recomputed fields and reads only the parts
+        it has not seen yet, so chunked runs cost O(chunk) per call rather than rewriting the whole cache.
+        Parts are compacted into one once there are more than `COMPACT_PARTS`.
+
+    Args:
+        raster_path (str): Path to the prediction raster.
+        fields (gpd.GeoDataFrame): GeoDataFrame containing field geometries.
+        aggregate (callable): Aggregation function with the `aggregate_predictions(raster_path, fields)` signature.
+        cache_dir (str): Cache directory.
+        mode (str): 'reuse' to read and extend the cache, 'refresh' to recompute the given fields and overwrite
+            their cache entries (entries of other fields are kept), or 'off' to bypass the cache. Entries of a
+            field_id whose geometry changed are replaced, so stale geometries do not accumulate.
+        bands (tuple): 1-based (class, confidence) band indexes `aggregate` reads.
+
+    Returns:
+        gpd.GeoDataFrame: GeoDataFrame containing field_id, predicted class, and confidence.
+    """
+    if mode == "off":
+        return aggregate(raster_path, fields)
+    if mode not in CACHE_MODES:
+        raise ValueError(
+            "Invalid cache mode. Please select 'off', 'reuse' or 'refresh'."
+        )
+
+    cache_path = os.path.join(
+        cache_dir,
+        f"{raster_fingerprint(raster_path, cache_dir)}_bands{bands[0]}-{bands[1]}",
+    )
+    os.makedirs(cache_path, exist_ok=True)
+    field_ids = fields["field_id"].to_numpy()
+    hashes = geometry_hashes(fields.geometry.values)
+
+    predicted_int = np.full(len(fields), np.nan)
+    confidence = np.full(len(fields), np.nan)
+    hit = np.zeros(len(fields), dtype=bool)
+    with _lock:
+        index = _indexes.setdefault(os.path.abspath(cache_path), CacheIndex())
+        _update_index(
+            index,
+            cache_path,
+            [name for name in _part_files(cache_path) if name not in index.parts],
+        )
+        # 'refresh' recomputes every field of this call but keeps the other entries
+        if mode == "reuse":
+            for i, (field_id, geom_hash) in enumerate(zip(field_ids, hashes)):
+                entry = index.entries.get(field_id)
+                if entry is not None and entry[0] == geom_hash:
+                    hit[i] = True
+                    predicted_int[i], confidence[i] = entry[1], entry[2]
+    logging.info(
+        f"Aggregation cache: {int(hit.sum())} hits, {int((~hit).sum())} misses"
+    )
+
+    if (~hit).any():
+        preds = aggregate(raster_path, fields[~hit])
+        new_rows = pd.DataFrame(
+            {
+                "field_id": field_ids[~hit],
+                "geom_hash": hashes[~hit],
+                "predicted_int": preds["predicted_int"].to_numpy(dtype=np.float64),
+                "confidence": preds["confidence"].to_numpy(dtype=np.float64),
+            }
+        )
+        predicted_int[~hit] = new_rows["predicted_int"].to_numpy()
+        confidence[~hit] = new_rows["confidence"].to_numpy()
+
+        with _lock:
+            # a newer part replaces the entry of its field_ids, including stale geometries
+            _update_index(index, cache_path, [_write_part(cache_path, new_rows)])
+            if len(index.parts) > COMPACT_PARTS:
+                _compact(index, cache_path)
+
+    missing = np.isnan(predicted_int)
+    return predictions_frame(
+        fields["field_id"].values,
+        np.where(missing, -1, predicted_int).astype(np.int64),
+        confidence,
+        missing,
+    )
+
+
+def _compact(index: CacheIndex, cache_path: str) -> None:
+    # the compacted part is newer than every part it replaces, so their entries stay shadowed
+    name = _write_part(cache_path, _entries_frame(index.entries))
+    for old in index.parts:
+        try:
+            os.remove(os.path.join(cache_path, old))
+        except FileNotFoundError:
+            pass
+    index.parts = {name}
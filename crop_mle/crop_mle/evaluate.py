@@ -1,27 +1,12 @@
 import geopandas as gpd
 import pandas as pd
-import matplotlib.pyplot as plt
-import seaborn as sns
 import numpy as np
-from sklearn.metrics import confusion_matrix, f1_score
-from dataclasses import asdict
 from crop_mle._types import CropTypeDictionary
+from crop_mle.metrics import MetricsAccumulator
+from crop_mle.instrument import StageTimer
 from collections import OrderedDict
 import logging
 import os
-from datetime import datetime
-
-# Set up logging
-log_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".log"))
-os.makedirs(log_dir, exist_ok=True)
-log_filename = datetime.now().strftime("logfile_%Y%m%d_%H%M%S.log")
-log_filepath = os.path.join(log_dir, log_filename)
-
-logging.basicConfig(
-    filename=log_filepath,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
 
 
 def schema_check(
@@ -39,24 +24,17 @@ def schema_check(
     Returns:
         gpd.GeoDataFrame: DataFrame with only fields that have crop types in the label_map.
     """
-    label_map_dict = asdict(label_map)
-    crop_dict = label_map_dict["crop_dict"]
-    _fields = (
-        fields.copy()
-    )  # copy so we can use original to look at non-conforming fields for info message
-    _fields[label_col] = fields[label_col].apply(
-        lambda x: next((k for k, v in crop_dict.items() if x in v), None)
-    )
-    non_conforming = _fields[_fields[label_col].isna()]
-    if non_conforming.shape[0] > 0:
+    # vectorized alias -> crop type lookup; unmatched values become NaN
+    standardized = fields[label_col].map(label_map.alias_lookup)
+    non_conforming = standardized.isna()
+    if non_conforming.any():
         logging.info(
-            f"Fields with crop types not in label_map: {non_conforming.shape[0]}"
+            f"Fields with crop types not in label_map: {int(non_conforming.sum())}"
         )
         logging.info(
-            f"Non-conforming fields: {non_conforming['field_id'].values}\n {fields.loc[non_conforming.index][label_col]}"
+            f"Non-conforming fields: {fields.loc[non_conforming, 'field_id'].values}\n {fields.loc[non_conforming, label_col]}"
         )
-        keep = _fields.dropna(subset=[label_col])
-        conforming = fields.loc[keep.index]
+        conforming = fields[~non_conforming]
     else:
         conforming = fields
     return conforming
@@ -77,20 +55,45 @@ def standardize_labels(
     Returns:
         gpd.GeoDataFrame: DataFrame with standardized "gt_label" and "pred_label" columns.
     """
-    label_map_dict = asdict(label_map)
-    crop_dict = label_map_dict["crop_dict"]
-    crop_numeric = label_map_dict["crop_numeric"]
-
     # map gt labels pred ints to same standardized labels from label_map
-    df["gt_label"] = df[gt_label].apply(
-        lambda x: next((k for k, v in crop_dict.items() if x in v), None)
-    )
-    df["pred_label"] = df[pred_label].apply(
-        lambda x: next((k for k, v in crop_numeric.items() if x == v), None)
-    )
+    df["gt_label"] = df[gt_label].map(label_map.alias_lookup)
+    df["pred_label"] = label_map.names_from_ints(df[pred_label])
     return df
 
 
+def merge_predictions(
+    fields: gpd.GeoDataFrame,
+    preds: pd.DataFrame,
+    label_col: str,
+    label_map: CropTypeDictionary,
+    timer: StageTimer = None,
+) -> gpd.GeoDataFrame:
+    """
+    Merge ground truth fields with aggregated model predictions, drop fields without predictions,
+        and add standardized "gt_label" and "pred_label" columns.
+
+    Args:
+        fields (gpd.GeoDataFrame): Schema-checked ground truth fields.
+        preds (pd.DataFrame): Output of the aggregation step (field_id, predicted_int, confidence).
+        label_col (str): Column name for crop type values in `fields`.
+        label_map (CropTypeDictionary): Dictionary mapping crop types to labels.
+        timer (StageTimer): Optional timer for the merge and label standardization stages.
+
+    Returns:
+        gpd.GeoDataFrame: Merged fields with standardized labels.
+    """
+    timer = timer or StageTimer(enabled=False)
+    with timer.stage("merge", len(fields)):
+        merged_df = fields.merge(
+            preds, on="field_id", how="left", suffixes=("_field", "_pred")
+        )
+        merged_df.dropna(
+            inplace=True
+        )  # drop fields with no predictions (i.e. no pixels in field)
+    with timer.stage("standardize_labels", len(merged_df)):
+        return standardize_labels(merged_df, label_col, "predicted_int", label_map)
+
+
 def cm_f1(
     gt_pred_df: gpd.GeoDataFrame,
     gt_label: str,
@@ -109,15 +112,15 @@ def cm_f1(
     Returns:
         tuple: Confusion matrix (np.ndarray) and F1 scores DataFrame (pd.DataFrame).
     """
-    label_map_dict = asdict(label_map)
-    crop_dict = label_map_dict["crop_dict"]
+    # sklearn is only needed here, so keep it off the import path of the select/analysis workflows
+    from sklearn.metrics import confusion_matrix, f1_score
 
     # prep gt & pred labels for confusion matrix and f1-score
     gt_labels = gt_pred_df[gt_label]
     preds_labels = gt_pred_df[pred_label]
 
     # we want to account for and remove classes with zero instances in both gt and pred when reporting f1-score
-    all_classes = list(crop_dict.keys())
+    all_classes = list(label_map.crop_dict.keys())
 
     # Compute confusion matrix
     cm = confusion_matrix(gt_labels, preds_labels, labels=all_classes)
@@ -216,6 +219,10 @@ def plot_confusion_matrix(cm: np.ndarray, labels: list, output_path: str):
         labels (list): List of labels for the confusion matrix.
         output_path (str): Path to save the plot.
     """
+    # plotting libraries take seconds to import; load them only when a plot is made
+    import matplotlib.pyplot as plt
+    import seaborn as sns
+
     plt.figure(figsize=(14, 14))
     sns.heatmap(
         cm,
@@ -233,3 +240,44 @@ def plot_confusion_matrix(cm: np.ndarray, labels: list, output_path: str):
     plt.yticks(fontsize=12)
     plt.tight_layout()  # Adjust layout to make room for labels
     plt.savefig(output_path)
+    plt.close()
+
+
+def write_analysis(
+    metrics: MetricsAccumulator,
+    label_list: list,
+    out_dir: str,
+    timer: StageTimer = None,
+    n_bootstrap: int = 0,
+) -> pd.DataFrame:
+    """
+    Write the confusion matrix (csv/png) and final results table for accumulated analysis metrics.
+
+    Args:
+        metrics (MetricsAccumulator): Accumulated field-level metrics.
+        label_list (list): Crop type labels in confusion matrix order.
+        out_dir (str): Directory to save the output files.
+        timer (StageTimer): Optional timer for the metrics, plotting and write stages.
+        n_bootstrap (int): If positive, add bootstrap confidence intervals for F1 and percent agreement to the
+            final results from this many resamples.
+
+    Returns:
+        pd.DataFrame: The final results table.
+    """
+    timer = timer or StageTimer(enabled=False)
+    cm = metrics.confusion
+
+    # F1, average confidence, counts and agreement by crop type for final .csv
+    with timer.stage("metrics"):
+        final_df = metrics.final_results(n_bootstrap=n_bootstrap)
+
+    # Save confusion matrix csv/png
+    with timer.stage("plot"):
+        plot_confusion_matrix(
+            cm, label_list, output_path=out_dir + "/confusion_matrix.png"
+        )
+    with timer.stage("write"):
+        cm_df = pd.DataFrame(cm)
+        cm_df.to_csv(os.path.join(out_dir, "confusion_matrix.csv"), index=True)
+        final_df.to_csv(os.path.join(out_dir, "final_results.csv"), index=False)
+    return final_df
@@ -0,0 +1,330 @@
+from dataclasses import dataclass, field, fields as dataclass_fields
+import numpy as np
+import pandas as pd
+
+# confidence histogram bin edges (percent); values outside the edges are counted in the first/last bin
+CONF_EDGES = np.linspace(0, 100, 21)
+
+
+def confidence_bins(conf: np.ndarray, edges: np.ndarray = CONF_EDGES) -> np.ndarray:
+    """
+    Histogram bin of each confidence value (bins are closed on the left, the last bin also on the right).
+
+    Args:
+        conf (np.ndarray): Confidence values.
+        edges (np.ndarray): Bin edges.
+
+    Returns:
+        np.ndarray: Bin index per value, clipped to the first/last bin.
+    """
+    bins = np.searchsorted(edges, conf, side="right") - 1
+    return np.clip(bins, 0, len(edges) - 2)
+
+
+def _csr_rows(dense_rows: list) -> tuple:
+    """CSR (indptr, indices, data) arrays from a list of dense 1-D count arrays."""
+    lengths = np.zeros(len(dense_rows) + 1, dtype=np.int64)
+    indices = []
+    for i, row in enumerate(dense_rows):
+        nonzero = np.flatnonzero(row)
+        lengths[i + 1] = nonzero.size
+        indices.append(nonzero)
+    indices = (
+        np.concatenate(indices).astype(np.int32) if indices else np.empty(0, np.int32)
+    )
+    data = (
+        np.concatenate([row[row != 0] for row in dense_rows]).astype(np.int64)
+        if dense_rows
+        else np.empty(0, np.int64)
+    )
+    return np.cumsum(lengths), indices, data
+
+
+def _csr_dense(dense: np.ndarray) -> tuple:
+    """CSR (indptr, indices, data) arrays of a dense 2-D count matrix."""
+    rows, cols = np.nonzero(dense)
+    indptr = np.zeros(dense.shape[0] + 1, dtype=np.int64)
+    np.cumsum(np.bincount(rows, minlength=dense.shape[0]), out=indptr[1:])
+    return indptr, cols.astype(np.int32), dense[rows, cols].astype(np.int64)
+
+
+def _row_ids(indptr: np.ndarray) -> np.ndarray:
+    """Row of every stored entry of a CSR matrix."""
+    return np.repeat(np.arange(len(indptr) - 1), np.diff(indptr))
+
+
+@dataclass
+class FieldHistograms:
+    """
+    Per-field pixel histograms kept from the raster pass: a sparse field x class pixel count matrix and a sparse
+        field x confidence bin matrix, both in CSR layout (`*_indptr`, `*_index`, `*_count`, as in
+        `scipy.sparse.csr_matrix`), plus the exact confidence sum per field. The majority class and mean confidence
+        of the aggregation engines, and further statistics (runner-up class, purity, entropy, confidence quantiles),
+        are array operations on these matrices. Rows of `failed` fields are empty.
+    """
+
+    field_id: np.ndarray
+    class_indptr: np.ndarray
+    class_index: np.ndarray
+    class_count: np.ndarray
+    conf_indptr: np.ndarray
+    conf_index: np.ndarray
+    conf_count: np.ndarray
+    conf_sum: np.ndarray
+    failed: np.ndarray
+    conf_edges: np.ndarray = field(default_factory=lambda: CONF_EDGES.copy())
+
+    @classmethod
+    def from_rows(
+        cls,
+        field_id: np.ndarray,
+        class_rows: list,
+        conf_rows: list,
+        conf_sum: np.ndarray,
+        failed: np.ndarray,
+        conf_edges: np.ndarray = CONF_EDGES,
+    ) -> "FieldHistograms":
+        """
+        Build from per-field dense count arrays, as produced by `np.bincount` in the `field` engine's workers.
+
+        Args:
+            field_id (np.ndarray): Field IDs.
+            class_rows (list): Pixel count per class for each field (any length).
+            conf_rows (list): Pixel count per confidence bin for each field.
+            conf_sum (np.ndarray): Confidence sum per field.
+            failed (np.ndarray): Boolean mask of fields that could not be aggregated.
+            conf_edges (np.ndarray): Confidence bin edges.
+
+        Returns:
+            FieldHistograms: The histograms.
+        """
+        class_csr = _csr_rows(class_rows)
+        conf_csr = _csr_rows(conf_rows)
+        return cls(
+            np.asarray(field_id),
+            *class_csr,
+            *conf_csr,
+            np.asarray(conf_sum, dtype=np.float64),
+            np.asarray(failed, dtype=bool),
+            np.asarray(conf_edges, dtype=np.float64),
+        )
+
+    @classmethod
+    def from_dense(
+        cls,
+        field_id: np.ndarray,
+        class_counts: np.ndarray,
+        conf_counts: np.ndarray,
+        conf_sum: np.ndarray,
+        failed: np.ndarray,
+        conf_edges: np.ndarray = CONF_EDGES,
+    ) -> "FieldHistograms":
+        """
+        Build from dense field x class and field x confidence bin count matrices, as accumulated by the `block`
+            engine. Rows of failed fields are cleared.
+
+        Args:
+            field_id (np.ndarray): Field IDs.
+            class_counts (np.ndarray): Pixel counts, shape (fields, classes).
+            conf_counts (np.ndarray): Confidence bin counts, shape (fields, bins).
+            conf_sum (np.ndarray): Confidence sum per field.
+            failed (np.ndarray): Boolean mask of fields that could not be aggregated.
+            conf_edges (np.ndarray): Confidence bin edges.
+
+        Returns:
+            FieldHistograms: The histograms.
+        """
+        failed = np.asarray(failed, dtype=bool)
+        keep = ~failed[:, None]
+        return cls(
+            np.asarray(field_id),
+            *_csr_dense(class_counts * keep),
+            *_csr_dense(conf_counts * keep),
+            np.where(failed, 0.0, conf_sum),
+            failed,
+            np.asarray(conf_edges, dtype=np.float64),
+        )
+
+    @classmethod
+    def concat(cls, parts: list) -> "FieldHistograms":
+        """Stack the rows of several histograms (e.g. one per worker batch)."""
+        if not parts:
+            return cls.from_rows(np.empty(0, dtype=object), [], [], [], [])
+
+        def stack(indptrs):
+            offsets = np.cumsum([0] + [p[-1] for p in indptrs[:-1]])
+            return np.concatenate(
+                [indptrs[0][:1]] + [p[1:] + o for p, o in zip(indptrs, offsets)]
+            )
+
+        return cls(
+            np.concatenate([p.field_id for p in parts]),
+            stack([p.class_indptr for p in parts]),
+            np.concatenate([p.class_index for p in parts]),
+            np.concatenate([p.class_count for p in parts]),
+            stack([p.conf_indptr for p in parts]),
+            np.concatenate([p.conf_index for p in parts]),
+            np.concatenate([p.conf_count for p in parts]),
+            np.concatenate([p.conf_sum for p in parts]),
+            np.concatenate([p.failed for p in parts]),
+            parts[0].conf_edges,
+        )
+
+    def take(self, rows: np.ndarray) -> "FieldHistograms":
+        """
+        Select (and reorder) fields.
+
+        Args:
+            rows (np.ndarray): Row positions to keep, in output order.
+
+        Returns:
+            FieldHistograms: Histograms of the selected fields.
+        """
+
+        def gather(indptr, index, count):
+            starts = indptr[rows]
+            lengths = indptr[rows + 1] - starts
+            new_indptr = np.zeros(len(rows) + 1, dtype=np.int64)
+            np.cumsum(lengths, out=new_indptr[1:])
+            pos = np.repeat(starts - new_indptr[:-1], lengths) + np.arange(
+                new_indptr[-1]
+            )
+            return new_indptr, index[pos], count[pos]
+
+        rows = np.asarray(rows, dtype=np.int64)
+        return FieldHistograms(
+            self.field_id[rows],
+            *gather(self.class_indptr, self.class_index, self.class_count),
+            *gather(self.conf_indptr, self.conf_index, self.conf_count),
+            self.conf_sum[rows],
+            self.failed[rows],
+            self.conf_edges,
+        )
+
+    def __len__(self) -> int:
+        return len(self.field_id)
+
+    def pixel_count(self) -> np.ndarray:
+        """Number of valid class pixels per field."""
+        return np.bincount(
+            _row_ids(self.class_indptr), self.class_count, minlength=len(self)
+        ).astype(np.int64)
+
+    @property
+    def missing(self) -> np.ndarray:
+        """Fields without a prediction: failed, or without valid pixels."""
+        return self.failed | (self.pixel_count() == 0)
+
+    def _ranked_class(self, rank: int) -> np.ndarray:
+        """Class of the given frequency rank per field (0 = most pixels, ties to the lowest class), -1 if none."""
+        rows = _row_ids(self.class_indptr)
+        order = np.lexsort((self.class_index, -self.class_count, rows))
+        rows, classes = rows[order], self.class_index[order]
+        at_rank = np.arange(rows.size) - self.class_indptr[rows] == rank
+        out = np.full(len(self), -1, dtype=np.int64)
+        out[rows[at_rank]] = classes[at_rank]
+        return out
+
+    def majority(self) -> np.ndarray:
+        """Majority class per field (ties go to the lowest class, as `np.bincount(...).argmax()`), -1 if missing."""
+        return self._ranked_class(0)
+
+    def runner_up(self) -> np.ndarray:
+        """Second most frequent class per field, -1 for fields with fewer than two classes."""
+        return self._ranked_class(1)
+
+    def purity(self) -> np.ndarray:
+        """Share of valid pixels in the majority class (NaN if missing)."""
+        rows = _row_ids(self.class_indptr)
+        top = np.zeros(len(self), dtype=np.int64)
+        np.maximum.at(top, rows, self.class_count)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return top / self.pixel_count()
+
+    def entropy(self) -> np.ndarray:
+        """Shannon entropy in bits of the class distribution of each field (NaN if missing)."""
+        rows = _row_ids(self.class_indptr)
+        total = self.pixel_count()
+        p = self.class_count / total[rows]
+        h = -np.bincount(rows, p * np.log2(p), minlength=len(self))
+        return np.where(total > 0, h + 0.0, np.nan)
+
+    def mean_confidence(self) -> np.ndarray:
+        """Exact mean confidence over each field's valid confidence pixels (NaN if none)."""
+        n = np.bincount(
+            _row_ids(self.conf_indptr), self.conf_count, minlength=len(self)
+        )
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.conf_sum / n
+
+    def confidence_quantile(self, q: float) -> np.ndarray:
+        """
+        Confidence quantile per field, interpolated linearly within the histogram bin that holds it.
+
+        Args:
+            q (float): Quantile in [0, 1].
+
+        Returns:
+            np.ndarray: Quantile per field (NaN if the field has no confidence pixels).
+        """
+        out = np.full(len(self), np.nan)
+        cum = np.cumsum(self.conf_count)
+        start = np.r_[0, cum][self.conf_indptr[:-1]]
+        n = np.r_[0, cum][self.conf_indptr[1:]] - start
+        has = n > 0
+        target = start[has] + q * n[has]
+        # first entry of the row whose cumulative count reaches the target
+        pos = np.searchsorted(cum, target, side="left")
+        pos = np.clip(pos, self.conf_indptr[:-1][has], self.conf_indptr[1:][has] - 1)
+        bins = self.conf_index[pos]
+        frac = (target - (cum[pos] - self.conf_count[pos])) / self.conf_count[pos]
+        width = np.diff(self.conf_edges)[bins]
+        out[has] = self.conf_edges[bins] + frac * width
+        return out
+
+    def statistics(self, quantiles: tuple = (0.1, 0.5, 0.9)) -> pd.DataFrame:
+        """
+        Per-field statistics derived from the histograms.
+
+        Args:
+            quantiles (tuple): Confidence quantiles to include.
+
+        Returns:
+            pd.DataFrame: field_id, pixel_count, predicted_int, runner_up, purity, entropy, confidence and
+                confidence_p<q> columns; predicted_int is -1 and confidence NaN for fields without a prediction.
+        """
+        missing = self.missing
+        stats = {
+            "field_id": self.field_id,
+            "pixel_count": self.pixel_count(),
+            "predicted_int": self.majority(),
+            "runner_up": self.runner_up(),
+            "purity": self.purity(),
+            "entropy": self.entropy(),
+            "confidence": np.where(missing, np.nan, self.mean_confidence()),
+        }
+        for q in quantiles:
+            stats[f"confidence_p{round(q * 100)}"] = np.where(
+                missing, np.nan, self.confidence_quantile(q)
+            )
+        return pd.DataFrame(stats)
+
+    def save(self, path: str):
+        """
+        Write the histograms to an uncompressed `.npz` file. Object field IDs are stored as strings.
+
+        Args:
+            path (str): Output path.
+        """
+        arrays = {f.name: getattr(self, f.name) for f in dataclass_fields(self)}
+        arrays["field_id"] = np.asarray(arrays["field_id"])
+        if arrays["field_id"].dtype == object:
+            arrays["field_id"] = arrays["field_id"].astype(str)
+        with open(path, "wb") as f:
+            np.savez(f, **arrays)
+
+    @classmethod
+    def load(cls, path: str) -> "FieldHistograms":
+        """Read histograms written by `save`."""
+        with np.load(path) as data:
+            return cls(**{f.name: data[f.name] for f in dataclass_fields(cls)})
@@ -0,0 +1,256 @@
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import rasterio as rio
+import shapely
+from shapely import STRtree
+import hashlib
+import json
+import logging
+import os
+from crop_mle.cache import geometry_hashes
+from crop_mle.prepare import align_crs
+from crop_mle.process import predictions_frame
+from crop_mle.zonal import block_windows, raster_grid
+
+STATE_FILE = "aggregation_state.parquet"
+DIGESTS_FILE = "block_digests.parquet"
+GRID_FILE = "raster_grid.json"
+
+
+def _raw_block_digest(src: rio.DatasetReader, f, bands: tuple, window) -> str:
+    """
+    Hash of the stored (still compressed) GeoTIFF blocks under a block-aligned window, or None if the block
+        layout is not exposed by the driver.
+    """
+    block_h, block_w = src.block_shapes[0]
+    rows = range(
+        window.row_off // block_h, -(-(window.row_off + window.height) // block_h)
+    )
+    cols = range(
+        window.col_off // block_w, -(-(window.col_off + window.width) // block_w)
+    )
+    digest = hashlib.blake2b(digest_size=16)
+    seen = set()
+    for band in bands:
+        for row in rows:
+            for col in cols:
+                offset = src.get_tag_item(
+                    f"BLOCK_OFFSET_{col}_{row}", "TIFF", bidx=band
+                )
+                size = src.get_tag_item(f"BLOCK_SIZE_{col}_{row}", "TIFF", bidx=band)
+                if offset is None or size is None:
+                    return None
+                # pixel-interleaved bands share their blocks
+                if (offset, size) in seen:
+                    continue
+                seen.add((offset, size))
+                # hash sizes and contents, not offsets, which shift when an earlier block changes size
+                f.seek(int(offset))
+                digest.update(size.encode())
+                digest.update(f.read(int(size)))
+    return digest.hexdigest()
+
+
+def block_digests(
+    raster_path: str, bands: tuple = (3, 4), window_size: int = 256
+) -> pd.DataFrame:
+    """
+    Content hash of the class/confidence bands in every block-aligned window of the raster. For a local GeoTIFF the
+        stored block bytes are hashed without decoding them, so a digest pass costs one read of the blocks holding
+        the bands (of every band for pixel-interleaved files) rather than their decompression. Other rasters are
+        decoded. Re-encoded but identical pixels count as changed, which only re-aggregates more fields.
+
+    Args:
+        raster_path (str): Path to the prediction raster.
+        bands (tuple): 1-based band indexes read by the aggregation.
+        window_size (int): Minimum window height/width in pixels (see `block_windows`).
+
+    Returns:
+        pd.DataFrame: One row per window with row_off, col_off, height, width, digest and window bounds.
+    """
+    rows = []
+    with rio.open(raster_path) as src:
+        raw = (
+            open(raster_path, "rb")
+            if src.driver == "GTiff" and os.path.isfile(raster_path)
+            else None
+        )
+        try:
+            for window in block_windows(src, window_size):
+                digest = None
+                if raw is not None:
+                    digest = _raw_block_digest(src, raw, bands, window)
+                if digest is None:
+                    data = src.read(list(bands), window=window)
+                    digest = hashlib.blake2b(data.tobytes(), digest_size=16).hexdigest()
+                rows.append(
+                    (
+                        window.row_off,
+                        window.col_off,
+                        window.height,
+                        window.width,
+                        digest,
+                        *src.window_bounds(window),
+                    )
+                )
+        finally:
+            if raw is not None:
+                raw.close()
+    return pd.DataFrame(
+        rows,
+        columns=[
+            "row_off",
+            "col_off",
+            "height",
+            "width",
+            "digest",
+            "minx",
+            "miny",
+            "maxx",
+            "maxy",
+        ],
+    )
+
+
+def dirty_blocks(previous: pd.DataFrame, current: pd.DataFrame) -> pd.DataFrame:
+    """
+    Windows of `current` whose digest differs from (or is missing in) `previous`.
+
+    Args:
+        previous (pd.DataFrame): Block digests of the previous raster.
+        current (pd.DataFrame): Block digests of the new raster.
+
+    Returns:
+        pd.DataFrame: Subset of `current` that changed.
+    """
+    key = ["row_off", "col_off", "height", "width"]
+    merged = current.merge(
+        previous[key + ["digest"]], on=key, how="left", suffixes=("", "_previous")
+    )
+    return current[(merged["digest"] != merged["digest_previous"]).to_numpy()]
+
+
+def save_state(
+    state_dir: str,
+    raster_path: str,
+    fields: gpd.GeoDataFrame,
+    preds: pd.DataFrame,
+    digests: pd.DataFrame = None,
+    window_size: int = 256,
+    bands: tuple = (3, 4),
+):
+    """
+    Persist what an incremental run needs from this one: per-field results keyed by field_id and geometry hash,
+        the raster block digests and the raster grid.
+
+    Args:
+        state_dir (str): Directory to write the state files to.
+        raster_path (str): Path to the prediction raster the results were computed from.
+        fields (gpd.GeoDataFrame): Fields that were aggregated.
+        preds (pd.DataFrame): Aggregation results, in `fields` order.
+        digests (pd.DataFrame): Block digests of the raster (computed if not given).
+        window_size (int): Digest window size used when `digests` is not given.
+        bands (tuple): 1-based (class, confidence) band indexes used when `digests` is not given.
+    """
+    os.makedirs(state_dir, exist_ok=True)
+    if digests is None:
+        digests = block_digests(raster_path, bands, window_size=window_size)
+    pd.DataFrame(
+        {
+            "field_id": fields["field_id"].to_numpy(),
+            "geom_hash": geometry_hashes(fields.geometry.values),
+            "predicted_int": preds["predicted_int"].to_numpy(dtype=np.float64),
+            "confidence": preds["confidence"].to_numpy(dtype=np.float64),
+        }
+    ).to_parquet(os.path.join(state_dir, STATE_FILE), index=False)
+    digests.to_parquet(os.path.join(state_dir, DIGESTS_FILE), index=False)
+    with open(os.path.join(state_dir, GRID_FILE), "w") as f:
+        json.dump(raster_grid(raster_path), f)
+
+
+def incremental_aggregate(
+    raster_path: str,
+    fields: gpd.GeoDataFrame,
+    aggregate,
+    previous_dir: str,
+    window_size: int = 256,
+    bands: tuple = (3, 4),
+) -> tuple:
+    """
+    Re-aggregate only the fields affected by a change since the run saved in `previous_dir`: fields that are new
+        or whose geometry changed, and fields overlapping raster blocks whose class/confidence pixels changed.
+        All other fields reuse their previous results; fields no longer in `fields` are dropped.
+
+    Args:
+        raster_path (str): Path to the new prediction raster.
+        fields (gpd.GeoDataFrame): Current fields.
+        aggregate (callable): Aggregation function with the `aggregate_predictions(raster_path, fields)` signature.
+        previous_dir (str): Directory written by `save_state` for the previous run.
+        window_size (int): Digest window size, matching the one used by `save_state`. Smaller windows flag fewer
+            fields per changed pixel at the cost of more digests.
+        bands (tuple): 1-based (class, confidence) band indexes `aggregate` reads, matching the previous run.
+
+    Returns:
+        tuple: Predictions for all `fields` (gpd.GeoDataFrame), block digests of the new raster (pd.DataFrame)
+    """
+    previous = pd.read_parquet(os.path.join(previous_dir, STATE_FILE))
+    previous_digests = pd.read_parquet(os.path.join(previous_dir, DIGESTS_FILE))
+    with open(os.path.join(previous_dir, GRID_FILE)) as f:
+        previous_grid = json.load(f)
+
+    digests = block_digests(raster_path, bands, window_size=window_size)
+    field_ids = fields["field_id"].to_numpy()
+    geoms = np.asarray(fields.geometry.values)
+
+    # fields that are new or whose geometry changed
+    previous = previous.drop_duplicates(["field_id", "geom_hash"], keep="last")
+    previous_keys = pd.MultiIndex.from_arrays(
+        [previous["field_id"], previous["geom_hash"]]
+    )
+    pos = previous_keys.get_indexer(
+        pd.MultiIndex.from_arrays([field_ids, geometry_hashes(geoms)])
+    )
+    affected = pos < 0
+
+    # fields touching changed raster blocks
+    if previous_grid != raster_grid(raster_path):
+        logging.info("Raster grid changed, re-aggregating all fields")
+        affected[:] = True
+        n_dirty = len(digests)
+    else:
+        dirty = dirty_blocks(previous_digests, digests)
+        n_dirty = len(dirty)
+        if n_dirty:
+            boxes = shapely.box(
+                dirty["minx"], dirty["miny"], dirty["maxx"], dirty["maxy"]
+            )
+            # the block bounds are in the raster CRS
+            with rio.open(raster_path) as src:
+                aligned = align_crs(fields, src.crs)
+            hits = STRtree(boxes).query(
+                np.asarray(aligned.geometry.values), predicate="intersects"
+            )
+            affected[np.unique(hits[0])] = True
+    logging.info(
+        f"Incremental aggregation: {n_dirty} dirty blocks, {int(affected.sum())} of {len(fields)} fields affected"
+    )
+
+    predicted_int = np.full(len(fields), np.nan)
+    confidence = np.full(len(fields), np.nan)
+    reuse = ~affected
+    predicted_int[reuse] = previous["predicted_int"].to_numpy()[pos[reuse]]
+    confidence[reuse] = previous["confidence"].to_numpy()[pos[reuse]]
+    if affected.any():
+        preds = aggregate(raster_path, fields[affected])
+        predicted_int[affected] = preds["predicted_int"].to_numpy(dtype=np.float64)
+        confidence[affected] = preds["confidence"].to_numpy(dtype=np.float64)
+
+    missing = np.isnan(predicted_int)
+    preds = predictions_frame(
+        fields["field_id"].values,
+        np.where(missing, -1, predicted_int).astype(np.int64),
+        confidence,
+        missing,
+    )
+    return preds, digests
@@ -0,0 +1,194 @@
+from contextlib import contextmanager
+from dataclasses import dataclass, field
+import json
+import os
+import time
+import numpy as np
+import pandas as pd
+
+# per-field outcome codes reported by the aggregation workers
+FIELD_OK = 0
+FIELD_EMPTY = 1
+FIELD_FAILED = 2
+
+# latency histogram bin edges in milliseconds
+LATENCY_BINS_MS = [
+    0,
+    0.1,
+    0.25,
+    0.5,
+    1,
+    2.5,
+    5,
+    10,
+    25,
+    50,
+    100,
+    250,
+    500,
+    1000,
+    2500,
+    np.inf,
+]
+
+
+def _cpu_seconds() -> float:
+    """User + system CPU seconds of this process and its reaped child processes (e.g. finished pool workers)."""
+    t = os.times()
+    return t.user + t.system + t.children_user + t.children_system
+
+
+@dataclass
+class FieldProfile:
+    """
+    Per-field hot path statistics collected from the `field` engine's workers: latency and outcome of every
+        field aggregation, and busy time per worker process over the pool's lifetime.
+    """
+
+    latencies: list = field(default_factory=list)
+    statuses: list = field(default_factory=list)
+    worker_busy: dict = field(default_factory=dict)
+    pool_seconds: float = 0.0
+    n_workers: int = 0
+
+    def add(self, latency: np.ndarray, status: np.ndarray, pid: int, busy: float):
+        """
+        Record one task's results.
+
+        Args:
+            latency (np.ndarray): Seconds spent on each field.
+            status (np.ndarray): FIELD_OK, FIELD_EMPTY or FIELD_FAILED per field.
+            pid (int): Worker process or thread ID.
+            busy (float): Seconds the worker spent on the task.
+        """
+        self.latencies.append(np.atleast_1d(np.asarray(latency, dtype=np.float64)))
+        self.statuses.append(np.atleast_1d(np.asarray(status, dtype=np.int8)))
+        self.worker_busy[pid] = self.worker_busy.get(pid, 0.0) + busy
+
+    def add_pool(self, seconds: float, n_workers: int):
+        """Record the wall time and size of a worker pool."""
+        self.pool_seconds += seconds
+        self.n_workers = max(self.n_workers, n_workers)
+
+    def _concat(self, arrays: list, dtype) -> np.ndarray:
+        return np.concatenate(arrays) if arrays else np.empty(0, dtype=dtype)
+
+    def histogram(self) -> pd.DataFrame:
+        """
+        Field latency histogram.
+
+        Returns:
+            pd.DataFrame: Count of field aggregations per latency bin (bin_lo_ms inclusive, bin_hi_ms exclusive).
+        """
+        latency_ms = self._concat(self.latencies, np.float64) * 1000
+        counts, _ = np.histogram(latency_ms, bins=LATENCY_BINS_MS)
+        return pd.DataFrame(
+            {
+                "bin_lo_ms": LATENCY_BINS_MS[:-1],
+                "bin_hi_ms": LATENCY_BINS_MS[1:],
+                "count": counts,
+            }
+        )
+
+    def summary(self) -> dict:
+        """
+        Field counts by outcome, latency percentiles and worker utilization.
+
+        Returns:
+            dict: Summary statistics (JSON serializable).
+        """
+        latency_ms = self._concat(self.latencies, np.float64) * 1000
+        status = self._concat(self.statuses, np.int8)
+        percentiles = (
+            np.percentile(latency_ms, [50, 90, 99]) if latency_ms.size else [None] * 3
+        )
+        capacity = self.pool_seconds * self.n_workers
+        busy = sum(self.worker_busy.values())
+        return {
+            "n_fields": int(status.size),
+            "n_empty": int((status == FIELD_EMPTY).sum()),
+            "n_failed": int((status == FIELD_FAILED).sum()),
+            "latency_ms": {
+                "mean": float(latency_ms.mean()) if latency_ms.size else None,
+                "p50": None if percentiles[0] is None else float(percentiles[0]),
+                "p90": None if percentiles[1] is None else float(percentiles[1]),
+                "p99": None if percentiles[2] is None else float(percentiles[2]),
+                "max": float(latency_ms.max()) if latency_ms.size else None,
+                "total_s": float(latency_ms.sum() / 1000),
+            },
+            "pool_seconds": self.pool_seconds,
+            "n_workers": self.n_workers,
+            "worker_busy_seconds": {str(k): v for k, v in self.worker_busy.items()},
+            "worker_utilization": busy / capacity if capacity else None,
+        }
+
+
+class StageTimer:
+    """
+    Records wall and CPU time of named pipeline stages, and collects the `field` engine's per-field profile.
+        A disabled timer records nothing, so call sites can time stages unconditionally.
+    """
+
+    def __init__(self, enabled: bool = True):
+        self.enabled = enabled
+        self.stages = []
+        self.fields = FieldProfile() if enabled else None
+
+    @contextmanager
+    def stage(self, name: str, n_items: int = None):
+        """
+        Time the enclosed block as stage `name`.
+
+        Args:
+            name (str): Stage name.
+            n_items (int): Optional number of items (e.g. fields) processed by the stage.
+        """
+        if not self.enabled:
+            yield
+            return
+        wall_start, cpu_start = time.perf_counter(), _cpu_seconds()
+        try:
+            yield
+        finally:
+            self.stages.append(
+                {
+                    "stage": name,
+                    "wall_seconds": time.perf_counter() - wall_start,
+                    "cpu_seconds": _cpu_seconds() - cpu_start,
+                    "n_items": n_items,
+                }
+            )
+
+    def stage_frame(self) -> pd.DataFrame:
+        """
+        Stage timings. CPU time includes finished child processes, so a CPU/wall ratio well below the number of
+            workers points at I/O or IPC waits.
+
+        Returns:
+            pd.DataFrame: One row per stage with wall_seconds, cpu_seconds and n_items.
+        """
+        return pd.DataFrame(
+            self.stages, columns=["stage", "wall_seconds", "cpu_seconds", "n_items"]
+        )
+
+    def write(self, out_dir: str):
+        """
+        Write the instrumentation report: `instrumentation.json` (stages and per-field summary),
+            `instrumentation_stages.csv` and `field_latency_histogram.csv`.
+
+        Args:
+            out_dir (str): Directory to save the report to.
+        """
+        if not self.enabled:
+            return
+        stages = self.stage_frame()
+        report = {
+            "stages": self.stages,
+            "fields": self.fields.summary(),
+        }
+        with open(os.path.join(out_dir, "instrumentation.json"), "w") as f:
+            json.dump(report, f, indent=2)
+        stages.to_csv(os.path.join(out_dir, "instrumentation_stages.csv"), index=False)
+        self.fields.histogram().to_csv(
+            os.path.join(out_dir, "field_latency_histogram.csv"), index=False
+        )
@@ -0,0 +1,29 @@
+import logging
+import os
+from datetime import datetime
+
+
+def setup_logging(log_dir: str = None) -> str:
+    """
+    Send the root logger's INFO messages to a timestamped file in `log_dir`. Called once by entry points
+        (not at import time), so library use and short-lived jobs don't create log files they never write to.
+
+    Args:
+        log_dir (str): Directory for the log file (default: `crop_mle/.log`).
+
+    Returns:
+        str: Path of the log file.
+    """
+    if log_dir is None:
+        log_dir = os.path.join(os.path.dirname(__file__), "..", ".log")
+    log_dir = os.path.abspath(log_dir)
+    os.makedirs(log_dir, exist_ok=True)
+    log_filename = datetime.now().strftime("logfile_%Y%m%d_%H%M%S.log")
+    log_filepath = os.path.join(log_dir, log_filename)
+
+    logging.basicConfig(
+        filename=log_filepath,
+        level=logging.INFO,
+        format="%(asctime)s - %(levelname)s - %(message)s",
+    )
+    return log_filepath
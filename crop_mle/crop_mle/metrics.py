@@ -0,0 +1,311 @@
+from dataclasses import dataclass
+import numpy as np
+import pandas as pd
+from crop_mle._types import CropTypeDictionary
+
+
+def encode_labels(labels: pd.Series, label_map: CropTypeDictionary) -> np.ndarray:
+    """
+    Encode standardized crop type labels as integer codes in `crop_dict` order (-1 for missing or unknown labels).
+
+    Args:
+        labels (pd.Series): Standardized crop type labels (e.g. the "gt_label"/"pred_label" columns).
+        label_map (CropTypeDictionary): Dictionary mapping crop types to labels.
+
+    Returns:
+        np.ndarray: Integer code per label.
+    """
+    return label_map.label_dtype.categories.get_indexer(labels).astype(np.int64)
+
+
+def percentile_interval(values: np.ndarray, level: float = 0.95) -> tuple:
+    """
+    Percentile bootstrap interval per column of resampled values.
+
+    Args:
+        values (np.ndarray): Resamples x classes array; NaN where a class has no value in a resample.
+        level (float): Confidence level of the intervals.
+
+    Returns:
+        tuple: Lower bounds (np.ndarray), upper bounds (np.ndarray), NaN for classes without any value
+    """
+    # classes never seen in a resample have no value there; classes never seen at all stay NaN
+    low = np.full(values.shape[1], np.nan)
+    high = np.full(values.shape[1], np.nan)
+    defined = ~np.isnan(values).all(axis=0)
+    alpha = (1 - level) / 2 * 100
+    low[defined], high[defined] = np.nanpercentile(
+        values[:, defined], [alpha, 100 - alpha], axis=0
+    )
+    return low, high
+
+
+@dataclass
+class MetricsAccumulator:
+    """
+    Additive field-level metrics state over integer-coded ground truth and predictions.
+        `counts` is an (n + 1) x (n + 1) matrix of (gt, pred) code pairs whose last row/column collects missing labels,
+        so one `np.bincount` yields the confusion matrix, per-class counts and agreement at once. Accumulators built
+        from separate chunks of fields can be combined with `merge`.
+    """
+
+    labels: list
+    counts: np.ndarray = None
+    conf_sum: np.ndarray = None
+    conf_count: np.ndarray = None
+
+    def __post_init__(self):
+        size = len(self.labels) + 1
+        if self.counts is None:
+            self.counts = np.zeros((size, size), dtype=np.int64)
+        if self.conf_sum is None:
+            self.conf_sum = np.zeros(size, dtype=np.float64)
+        if self.conf_count is None:
+            self.conf_count = np.zeros(size, dtype=np.int64)
+
+    @classmethod
+    def from_label_map(cls, label_map: CropTypeDictionary) -> "MetricsAccumulator":
+        """Empty accumulator over the standardized crop types of `label_map`."""
+        return cls(labels=list(label_map.crop_dict.keys()))
+
+    def update(
+        self, gt_codes: np.ndarray, pred_codes: np.ndarray, confidence: np.ndarray
+    ) -> "MetricsAccumulator":
+        """
+        Fold a chunk of integer-coded fields into the accumulator.
+
+        Args:
+            gt_codes (np.ndarray): Ground truth codes (-1 for missing).
+            pred_codes (np.ndarray): Predicted codes (-1 for missing).
+            confidence (np.ndarray): Field confidence values (NaN values are skipped for average confidence).
+
+        Returns:
+            MetricsAccumulator: self, for chaining.
+        """
+        n = len(self.labels)
+        size = n + 1
+        gt = np.where(gt_codes < 0, n, gt_codes)
+        pred = np.where(pred_codes < 0, n, pred_codes)
+        self.counts += np.bincount(gt * size + pred, minlength=size * size).reshape(
+            size, size
+        )
+        confidence = np.asarray(confidence, dtype=np.float64)
+        has_conf = ~np.isnan(confidence)
+        self.conf_sum += np.bincount(
+            pred[has_conf], weights=confidence[has_conf], minlength=size
+        )
+        self.conf_count += np.bincount(pred[has_conf], minlength=size)
+        return self
+
+    def update_frame(
+        self,
+        df: pd.DataFrame,
+        gt_label: str,
+        pred_label: str,
+        confidence_col: str,
+        label_map: CropTypeDictionary,
+    ) -> "MetricsAccumulator":
+        """
+        Encode and fold the standardized label columns of `df` into the accumulator.
+
+        Args:
+            df (pd.DataFrame): DataFrame containing standardized ground truth and predicted labels.
+            gt_label (str): Column name for ground truth labels.
+            pred_label (str): Column name for predicted labels.
+            confidence_col (str): Column name for confidence values.
+            label_map (CropTypeDictionary): Dictionary mapping crop types to labels.
+
+        Returns:
+            MetricsAccumulator: self, for chaining.
+        """
+        return self.update(
+            encode_labels(df[gt_label], label_map),
+            encode_labels(df[pred_label], label_map),
+            df[confidence_col].to_numpy(dtype=np.float64, na_value=np.nan),
+        )
+
+    def merge(self, other: "MetricsAccumulator") -> "MetricsAccumulator":
+        """
+        Add the state of another accumulator over the same labels into this one.
+
+        Args:
+            other (MetricsAccumulator): Accumulator to merge in.
+
+        Returns:
+            MetricsAccumulator: self, for chaining.
+        """
+        if list(other.labels) != list(self.labels):
+            raise ValueError("Cannot merge metrics accumulated over different labels.")
+        self.counts += other.counts
+        self.conf_sum += other.conf_sum
+        self.conf_count += other.conf_count
+        return self
+
+    def save(self, path: str):
+        """
+        Write the accumulator state to an `.npz` file, e.g. to merge accumulators computed on separate hosts.
+
+        Args:
+            path (str): Output path.
+        """
+        with open(path, "wb") as f:
+            np.savez(
+                f,
+                labels=np.array(self.labels, dtype=str),
+                counts=self.counts,
+                conf_sum=self.conf_sum,
+                conf_count=self.conf_count,
+            )
+
+    @classmethod
+    def load(cls, path: str) -> "MetricsAccumulator":
+        """Read an accumulator written by `save`."""
+        with np.load(path) as data:
+            return cls(
+                labels=data["labels"].tolist(),
+                counts=data["counts"],
+                conf_sum=data["conf_sum"],
+                conf_count=data["conf_count"],
+            )
+
+    @property
+    def confusion(self) -> np.ndarray:
+        """Confusion matrix (rows: ground truth, columns: predicted) over fields with both labels, in `labels` order."""
+        n = len(self.labels)
+        return self.counts[:n, :n]
+
+    @property
+    def gt_count(self) -> np.ndarray:
+        """Number of fields per ground truth class, including fields without a prediction."""
+        return self.counts[:-1].sum(axis=1)
+
+    @property
+    def match_count(self) -> np.ndarray:
+        """Number of fields per ground truth class where the prediction agrees."""
+        return np.diag(self.confusion).copy()
+
+    def f1(self) -> np.ndarray:
+        """Per-class F1 score (0 where undefined), computed as sklearn's `f1_score(average=None, zero_division=0)`."""
+        cm = self.confusion
+        denom = cm.sum(axis=1) + cm.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(denom > 0, 2 * np.diag(cm) / denom, 0.0)
+
+    def precision(self) -> np.ndarray:
+        """Per-class precision (0 where undefined)."""
+        cm = self.confusion
+        pred_sum = cm.sum(axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(pred_sum > 0, np.diag(cm) / pred_sum, 0.0)
+
+    def recall(self) -> np.ndarray:
+        """Per-class recall (0 where undefined)."""
+        cm = self.confusion
+        true_sum = cm.sum(axis=1)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(true_sum > 0, np.diag(cm) / true_sum, 0.0)
+
+    def percent_agreement(self) -> np.ndarray:
+        """Per-class percentage of ground truth fields whose prediction agrees (NaN for classes absent from ground truth)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.match_count / self.gt_count * 100
+
+    def average_confidence(self) -> np.ndarray:
+        """Per-class mean confidence over fields predicted as that class (NaN for classes never predicted)."""
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return self.conf_sum[:-1] / self.conf_count[:-1]
+
+    def bootstrap(
+        self,
+        n_resamples: int = 1000,
+        level: float = 0.95,
+        seed: int = 0,
+        batch_size: int = 256,
+    ) -> pd.DataFrame:
+        """
+        Percentile bootstrap confidence intervals for per-class F1 and percent agreement. Resampling fields with
+            replacement only changes how often each (gt, pred) pair occurs, so each resample is drawn directly as a
+            multinomial sample of the `counts` cells and all metrics are computed for a batch of resampled matrices at
+            once. The cost is independent of the number of fields.
+
+        Args:
+            n_resamples (int): Number of bootstrap resamples.
+            level (float): Confidence level of the intervals.
+            seed (int): Random seed.
+            batch_size (int): Resampled matrices held in memory at a time.
+
+        Returns:
+            pd.DataFrame: F1 CI Low/High and Percent Agreement CI Low/High per label (index), NaN where undefined.
+        """
+        n = len(self.labels)
+        total = int(self.counts.sum())
+        f1 = np.full((n_resamples, n), np.nan)
+        agreement = np.full((n_resamples, n), np.nan)
+        if total:
+            rng = np.random.default_rng(seed)
+            pvals = self.counts.ravel() / total
+            for start in range(0, n_resamples, batch_size):
+                size = min(batch_size, n_resamples - start)
+                counts = rng.multinomial(total, pvals, size=size).reshape(
+                    size, n + 1, n + 1
+                )
+                cm = counts[:, :n, :n]
+                match = np.einsum("bii->bi", cm)
+                denom = cm.sum(axis=2) + cm.sum(axis=1)
+                gt_count = counts[:, :n, :].sum(axis=2)
+                with np.errstate(invalid="ignore", divide="ignore"):
+                    f1[start : start + size] = np.where(
+                        denom > 0, 2 * match / denom, 0.0
+                    )
+                    agreement[start : start + size] = match / gt_count * 100
+
+        f1_low, f1_high = percentile_interval(f1, level)
+        agreement_low, agreement_high = percentile_interval(agreement, level)
+        return pd.DataFrame(
+            {
+                "F1 CI Low": f1_low,
+                "F1 CI High": f1_high,
+                "Percent Agreement CI Low": agreement_low,
+                "Percent Agreement CI High": agreement_high,
+            },
+            index=self.labels,
+        )
+
+    def final_results(self, n_bootstrap: int = 0, seed: int = 0) -> pd.DataFrame:
+        """
+        Build the final results table: F1, average confidence, count and percent agreement per crop type,
+            for crop types present in the ground truth, in `labels` order.
+
+        Args:
+            n_bootstrap (int): If positive, add 95% bootstrap confidence intervals for F1 and percent agreement
+                from this many resamples (see `bootstrap`).
+            seed (int): Random seed for the bootstrap.
+
+        Returns:
+            pd.DataFrame: DataFrame with Crop, F1, Average Confidence, Count and Percent Agreement columns
+                (and F1/Percent Agreement CI Low/High columns when bootstrapping).
+        """
+        cm = self.confusion
+        # classes with zero instances in both gt and pred are left out, as in `cm_f1`
+        present = np.flatnonzero((cm.sum(axis=1) > 0) | (cm.sum(axis=0) > 0))
+        in_gt = self.gt_count[present] > 0
+        f1 = self.f1()
+        count = self.gt_count[present]
+        if not in_gt.all():
+            # predicted-only classes leave NaN counts until they are dropped, so pandas keeps Count as float
+            count = count.astype(np.float64)
+        final_df = pd.DataFrame(
+            {
+                "Crop": [self.labels[i] for i in present],
+                "F1": [round(float(f1[i]), 2) for i in present],
+                "Average Confidence": np.round(self.average_confidence()[present], 2),
+                "Count": count,
+                "Percent Agreement": np.round(self.percent_agreement()[present], 2),
+            }
+        )
+        if n_bootstrap > 0:
+            intervals = self.bootstrap(n_bootstrap, seed=seed).iloc[present]
+            for column in intervals.columns:
+                final_df[column] = np.round(intervals[column].to_numpy(), 2)
+        # drop any crop types with no instances in the ground truth
+        return final_df[in_gt]
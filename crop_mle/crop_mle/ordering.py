@@ -0,0 +1,123 @@
+import numpy as np
+import rasterio as rio
+import geopandas as gpd
+
+
+def _midpoints(fields: gpd.GeoDataFrame) -> tuple:
+    """
+    Bounding-box midpoints of the field geometries and a mask of fields with empty or missing geometries.
+
+    Args:
+        fields (gpd.GeoDataFrame): GeoDataFrame containing field geometries.
+
+    Returns:
+        tuple: x midpoints (np.ndarray), y midpoints (np.ndarray), empty mask (np.ndarray)
+    """
+    bounds = fields.geometry.bounds.to_numpy()
+    x = (bounds[:, 0] + bounds[:, 2]) / 2
+    y = (bounds[:, 1] + bounds[:, 3]) / 2
+    return x, y, np.isnan(x)
+
+
+def hilbert_order(fields: gpd.GeoDataFrame) -> np.ndarray:
+    """
+    Order fields along a Hilbert curve through their bounding-box midpoints. Empty geometries are placed last.
+
+    Args:
+        fields (gpd.GeoDataFrame): GeoDataFrame containing field geometries.
+
+    Returns:
+        np.ndarray: Positional permutation of the fields.
+    """
+    _, _, empty = _midpoints(fields)
+    distance = np.full(len(fields), np.iinfo(np.int64).max, dtype=np.int64)
+    if (~empty).any():
+        distance[~empty] = fields.geometry[~empty].hilbert_distance().to_numpy()
+    return np.argsort(distance, kind="stable")
+
+
+def _spread_bits(v: np.ndarray) -> np.ndarray:
+    """Insert a zero bit between each of the lower 16 bits of `v`."""
+    v = v.astype(np.uint64)
+    v = (v | (v << 8)) & 0x00FF00FF
+    v = (v | (v << 4)) & 0x0F0F0F0F
+    v = (v | (v << 2)) & 0x33333333
+    v = (v | (v << 1)) & 0x55555555
+    return v
+
+
+def morton_order(fields: gpd.GeoDataFrame) -> np.ndarray:
+    """
+    Order fields along a Morton (Z-order) curve through their bounding-box midpoints. Empty geometries are placed last.
+
+    Args:
+        fields (gpd.GeoDataFrame): GeoDataFrame containing field geometries.
+
+    Returns:
+        np.ndarray: Positional permutation of the fields.
+    """
+    x, y, empty = _midpoints(fields)
+    code = np.full(len(fields), np.iinfo(np.uint64).max, dtype=np.uint64)
+    if (~empty).any():
+        scale = 2**16 - 1
+
+        def quantize(v):
+            span = v.max() - v.min()
+            return ((v - v.min()) / (span if span > 0 else 1) * scale).astype(np.uint64)
+
+        code[~empty] = _spread_bits(quantize(x[~empty])) | (
+            _spread_bits(quantize(y[~empty])) << 1
+        )
+    return np.argsort(code, kind="stable")
+
+
+def tile_order(fields: gpd.GeoDataFrame, raster_path: str) -> np.ndarray:
+    """
+    Group fields by the internal raster block (tile) their midpoint falls in, tiles in row-major order,
+        and order fields within a tile along a Hilbert curve. Empty geometries are placed last.
+
+    Args:
+        fields (gpd.GeoDataFrame): GeoDataFrame containing field geometries.
+        raster_path (str): Path to the prediction raster.
+
+    Returns:
+        np.ndarray: Positional permutation of the fields.
+    """
+    x, y, empty = _midpoints(fields)
+    with rio.open(raster_path) as src:
+        block_h, block_w = src.block_shapes[0]
+        n_tile_cols = -(-src.width // block_w)
+        col, row = ~src.transform * (np.nan_to_num(x), np.nan_to_num(y))
+    tile = (np.floor(row) // block_h) * n_tile_cols + np.floor(col) // block_w
+    tile[empty] = np.inf
+    within = np.empty(len(fields), dtype=np.int64)
+    within[hilbert_order(fields)] = np.arange(len(fields))
+    return np.lexsort((within, tile))
+
+
+def spatial_order(
+    fields: gpd.GeoDataFrame, order: str = "hilbert", raster_path: str = None
+) -> np.ndarray:
+    """
+    Compute a spatially local processing order for the fields so consecutive tasks touch neighbouring raster blocks.
+
+    Args:
+        fields (gpd.GeoDataFrame): GeoDataFrame containing field geometries.
+        order (str): 'hilbert', 'morton', 'tile' (requires `raster_path`) or 'none' to keep the input order.
+        raster_path (str): Path to the prediction raster, used for 'tile' ordering.
+
+    Returns:
+        np.ndarray: Positional permutation of the fields.
+    """
+    if order == "none" or len(fields) == 0:
+        return np.arange(len(fields))
+    elif order == "hilbert":
+        return hilbert_order(fields)
+    elif order == "morton":
+        return morton_order(fields)
+    elif order == "tile":
+        return tile_order(fields, raster_path)
+    else:
+        raise ValueError(
+            "Invalid order. Please select 'hilbert', 'morton', 'tile' or 'none'."
+        )
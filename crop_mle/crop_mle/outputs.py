@@ -0,0 +1,178 @@
+import json
+import os
+import geopandas as gpd
+
+OUTPUT_FORMATS = ["gpkg", "parquet", "feather"]
+
+
+def output_path(out_dir: str, name: str, output_format: str = "gpkg") -> str:
+    """
+    Path of a per-field output file in `out_dir`, with the extension of `output_format`.
+
+    Args:
+        out_dir (str): Output directory.
+        name (str): File name without extension (e.g. "selected_fields").
+        output_format (str): 'gpkg', 'parquet' or 'feather'.
+
+    Returns:
+        str: Output file path.
+    """
+    if output_format not in OUTPUT_FORMATS:
+        raise ValueError(
+            "Invalid output format. Please select 'gpkg', 'parquet' or 'feather'."
+        )
+    return os.path.join(out_dir, f"{name}.{output_format}")
+
+
+def select_columns(gdf: gpd.GeoDataFrame, columns: list = None) -> gpd.GeoDataFrame:
+    """
+    Subset a GeoDataFrame to `columns`, always keeping the geometry column.
+
+    Args:
+        gdf (gpd.GeoDataFrame): Per-field table.
+        columns (list): Attribute columns to keep, in output order (all columns if None).
+
+    Returns:
+        gpd.GeoDataFrame: The column subset.
+    """
+    if not columns:
+        return gdf
+    missing = [c for c in columns if c not in gdf.columns]
+    if missing:
+        raise ValueError(f"Output columns not found: {missing}")
+    geometry = gdf.geometry.name
+    return gdf[[c for c in columns if c != geometry] + [geometry]]
+
+
+def write_fields(
+    gdf: gpd.GeoDataFrame,
+    path: str,
+    output_format: str = "gpkg",
+    columns: list = None,
+    row_group_size: int = None,
+):
+    """
+    Write a per-field table as GeoPackage, GeoParquet or Feather (Arrow IPC, readable with `gpd.read_feather`).
+
+    Args:
+        gdf (gpd.GeoDataFrame): Per-field table to write.
+        path (str): Output file path.
+        output_format (str): 'gpkg', 'parquet' or 'feather'.
+        columns (list): Attribute columns to write (all columns if None). The geometry column is always written.
+        row_group_size (int): Rows per Parquet row group / Feather record batch (library default if None).
+    """
+    gdf = select_columns(gdf, columns)
+    if output_format == "gpkg":
+        gdf.to_file(path, driver="GPKG")
+    elif output_format == "parquet":
+        gdf.to_parquet(path, index=False, row_group_size=row_group_size)
+    elif output_format == "feather":
+        # uncompressed so readers can memory-map the batches without a decode step
+        gdf.to_feather(
+            path, index=False, compression="uncompressed", chunksize=row_group_size
+        )
+    else:
+        raise ValueError(
+            "Invalid output format. Please select 'gpkg', 'parquet' or 'feather'."
+        )
+
+
+def _geo_metadata(gdf: gpd.GeoDataFrame) -> bytes:
+    """
+    GeoParquet 'geo' schema metadata for WKB-encoded geometries. Geometry types and bounding box are left out,
+        since they are only known once every chunk of a streamed write has been seen.
+    """
+    geometry = gdf.geometry.name
+    crs = gdf.crs.to_json_dict() if gdf.crs is not None else None
+    return json.dumps(
+        {
+            "primary_column": geometry,
+            "columns": {
+                geometry: {"encoding": "WKB", "crs": crs, "geometry_types": []}
+            },
+            "version": "1.0.0",
+        }
+    ).encode()
+
+
+class FieldWriter:
+    """
+    Append per-field chunks to a single GeoPackage, GeoParquet or Feather file, so streamed workflows can write
+        their output without holding all fields in memory. Use as a context manager, or call `close` when done.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        output_format: str = "gpkg",
+        columns: list = None,
+        row_group_size: int = None,
+    ):
+        if output_format not in OUTPUT_FORMATS:
+            raise ValueError(
+                "Invalid output format. Please select 'gpkg', 'parquet' or 'feather'."
+            )
+        self.path = path
+        self.output_format = output_format
+        self.columns = columns
+        self.row_group_size = row_group_size
+        self.n_written = 0
+        self._schema = None
+        self._writer = None
+        if os.path.exists(path):
+            os.remove(path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _to_arrow(self, gdf: gpd.GeoDataFrame) -> "pyarrow.Table":
+        import pyarrow as pa
+
+        table = pa.table(gdf.to_arrow(index=False))
+        geometry = gdf.geometry.name
+        # store plain WKB with GeoParquet metadata, as geopandas' own writers do
+        i = table.schema.get_field_index(geometry)
+        table = table.set_column(i, geometry, table[geometry].cast(pa.binary()))
+        if self._schema is None:
+            metadata = dict(table.schema.metadata or {})
+            metadata[b"geo"] = _geo_metadata(gdf)
+            self._schema = table.schema.with_metadata(metadata)
+        return table.replace_schema_metadata(self._schema.metadata).cast(self._schema)
+
+    def write(self, gdf: gpd.GeoDataFrame):
+        """
+        Append a chunk of fields. All chunks must share the same columns and dtypes.
+
+        Args:
+            gdf (gpd.GeoDataFrame): Chunk of the per-field table.
+        """
+        if len(gdf) == 0:
+            return
+        gdf = select_columns(gdf, self.columns)
+        if self.output_format == "gpkg":
+            gdf.to_file(self.path, driver="GPKG", mode="a" if self.n_written else "w")
+        else:
+            # imported here so that loading this module (and main.py) does not pay for pyarrow
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+
+            table = self._to_arrow(gdf)
+            if self._writer is None:
+                if self.output_format == "parquet":
+                    self._writer = pq.ParquetWriter(self.path, self._schema)
+                else:
+                    self._writer = pa.ipc.new_file(self.path, self._schema)
+            if self.output_format == "parquet":
+                self._writer.write_table(table, row_group_size=self.row_group_size)
+            else:
+                self._writer.write_table(table, max_chunksize=self.row_group_size)
+        self.n_written += len(gdf)
+
+    def close(self):
+        """Finish the file."""
+        if self._writer is not None:
+            self._writer.close()
+            self._writer = None
@@ -0,0 +1,120 @@
+import logging
+import queue
+import threading
+from crop_mle._types import CropTypeDictionary
+from crop_mle.evaluate import schema_check, merge_predictions
+
+# end-of-stream marker passed between pipeline stages
+_DONE = object()
+
+
+class _StageError:
+    """Exception raised in a pipeline stage, forwarded to the consumer."""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def _put(out: queue.Queue, item, stop: threading.Event) -> bool:
+    """Put `item` on `out`, blocking while it is full (backpressure), unless the pipeline is stopped."""
+    while not stop.is_set():
+        try:
+            out.put(item, timeout=0.1)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def _drain(source: queue.Queue, stop: threading.Event):
+    """Yield items from `source` until the end-of-stream marker, re-raising errors of the upstream stage."""
+    while not stop.is_set():
+        try:
+            item = source.get(timeout=0.1)
+        except queue.Empty:
+            continue
+        if item is _DONE:
+            return
+        if isinstance(item, _StageError):
+            raise item.error
+        yield item
+
+
+def _run_stage(items, func, out: queue.Queue, stop: threading.Event):
+    """Apply `func` to each of `items` and pass the results on to `out`, followed by the end-of-stream marker."""
+    try:
+        for item in items:
+            if not _put(out, func(item), stop):
+                return
+    except BaseException as e:
+        _put(out, _StageError(e), stop)
+        return
+    _put(out, _DONE, stop)
+
+
+def pipelined_merged_chunks(
+    field_chunks,
+    raster_path: str,
+    label_col: str,
+    label_map: CropTypeDictionary,
+    aggregate,
+    queue_size: int = 2,
+):
+    """
+    Pipelined schema check, aggregation and merge of ground truth chunks. A reader thread consumes `field_chunks`
+        (reading from disk) and schema checks them, an aggregation thread aggregates and merges the previous chunk,
+        and the caller folds finished chunks into its metrics or selection candidates as they arrive. Stages are
+        connected by queues of at most `queue_size` chunks, so a slow stage blocks the ones before it and memory stays
+        bounded by a few chunks.
+
+    Args:
+        field_chunks (iterable): Ground truth chunks indexed by row position, e.g. `crop_mle.stream.iter_field_chunks`.
+        raster_path (str): Path to the prediction raster.
+        label_col (str): Column name for crop type values.
+        label_map (CropTypeDictionary): Dictionary mapping crop types to labels.
+        aggregate (callable): Aggregation function with the `aggregate_predictions(raster_path, fields)` signature.
+            Pass a persistent `pool` (see `crop_mle.process.worker_pool`) to the 'field' engine to keep its workers
+            alive across chunks.
+        queue_size (int): Maximum number of chunks waiting between two stages.
+
+    Yields:
+        gpd.GeoDataFrame: Merged chunk with standardized labels, indexed by row position in the file, in file order.
+    """
+    stop = threading.Event()
+    checked = queue.Queue(maxsize=queue_size)
+    merged = queue.Queue(maxsize=queue_size)
+
+    def check(chunk):
+        return schema_check(chunk, label_col, label_map)
+
+    def aggregate_chunk(chunk):
+        logging.info(f"Aggregating chunk of {len(chunk)} fields")
+        preds = aggregate(raster_path, chunk)
+        merged_chunk = merge_predictions(
+            chunk.assign(_row=chunk.index), preds, label_col, label_map
+        )
+        return merged_chunk.set_index("_row").rename_axis(None)
+
+    threads = [
+        threading.Thread(
+            target=_run_stage,
+            args=(field_chunks, check, checked, stop),
+            name="pipeline-read",
+            daemon=True,
+        ),
+        threading.Thread(
+            target=_run_stage,
+            args=(_drain(checked, stop), aggregate_chunk, merged, stop),
+            name="pipeline-aggregate",
+            daemon=True,
+        ),
+    ]
+    for thread in threads:
+        thread.start()
+    try:
+        yield from _drain(merged, stop)
+    finally:
+        # also runs when the consumer stops early or fails: unblock and wait for the stages
+        stop.set()
+        for thread in threads:
+            thread.join()
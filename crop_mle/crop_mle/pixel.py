@@ -0,0 +1,126 @@
+import logging
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import rasterio as rio
+from rasterio.enums import MaskFlags
+from crop_mle._types import CropTypeDictionary
+from crop_mle.evaluate import schema_check
+from crop_mle.metrics import MetricsAccumulator, encode_labels
+from crop_mle.prepare import align_crs
+from crop_mle.stream import iter_field_chunks
+from crop_mle.zonal import _iter_field_pixels
+
+
+def pred_code_lookup(label_map: CropTypeDictionary) -> np.ndarray:
+    """
+    Lookup table from predicted raster class to label code in `crop_dict` order (-1 for classes without a crop type).
+
+    Args:
+        label_map (CropTypeDictionary): Dictionary mapping crop types to labels.
+
+    Returns:
+        np.ndarray: Label code per raster class value.
+    """
+    return encode_labels(pd.Series(label_map.name_lookup), label_map)
+
+
+def pixel_metrics(
+    raster_path: str,
+    fields: gpd.GeoDataFrame,
+    label_col: str,
+    label_map: CropTypeDictionary,
+    bands: tuple = (3, 4),
+    window_size: int = 1024,
+) -> MetricsAccumulator:
+    """
+    Pixel-level confusion matrix and confidence sums of the prediction raster against the ground truth fields.
+        The raster is read one block-aligned window at a time; the fields intersecting each window are rasterized
+        for that window only and every pixel inside a field is folded into the accumulator as a (ground truth class,
+        predicted class, confidence) triple. Raster memory is bounded by the window size; the fields and their
+        spatial index are held in memory (see `stream_pixel_metrics` to bound those as well). Pixels of overlapping
+        fields count once per field, as in the field-level engines.
+
+    Args:
+        raster_path (str): Path to the prediction raster.
+        fields (gpd.GeoDataFrame): Schema-checked ground truth fields (reprojected to the raster CRS if needed).
+        label_col (str): Column name for crop type values.
+        label_map (CropTypeDictionary): Dictionary mapping crop types to labels.
+        bands (tuple): 1-based (class, confidence) band indexes of the raster. Pixels masked by the dataset
+            (nodata or mask band) are left out.
+        window_size (int): Minimum window height/width in pixels used when coalescing raster blocks.
+
+    Returns:
+        MetricsAccumulator: Accumulator whose counts are pixels instead of fields.
+    """
+    metrics = MetricsAccumulator.from_label_map(label_map)
+    gt_codes = encode_labels(fields[label_col].map(label_map.alias_lookup), label_map)
+    pred_lookup = pred_code_lookup(label_map)
+
+    with rio.open(raster_path) as src:
+        fields = align_crs(fields, src.crs)
+        # only build read masks when the dataset can have invalid pixels
+        masked = not all(
+            MaskFlags.all_valid in src.mask_flag_enums[b - 1] for b in bands
+        )
+        blocks = _iter_field_pixels(
+            src, np.asarray(fields.geometry.values), window_size
+        )
+        for window, parts in blocks:
+            croptype, conf = src.read(list(bands), window=window, masked=masked)
+            croptype, conf = croptype.ravel(), conf.ravel()
+            class_valid = ~np.ma.getmaskarray(croptype)
+            conf_valid = ~np.ma.getmaskarray(conf)
+            croptype = np.ma.getdata(croptype).astype(np.int64)
+            conf = np.ma.getdata(conf).astype(np.float64)
+
+            for idx, pixels, local in parts:
+                if masked:
+                    keep = class_valid[pixels]
+                    pixels, local = pixels[keep], local[keep]
+                classes = croptype[pixels]
+                known = (classes >= 0) & (classes < len(pred_lookup))
+                pred = np.full(pixels.size, -1, dtype=np.int64)
+                pred[known] = pred_lookup[classes[known]]
+                metrics.update(
+                    gt_codes[idx[local]],
+                    pred,
+                    np.where(conf_valid[pixels], conf[pixels], np.nan),
+                )
+    return metrics
+
+
+def stream_pixel_metrics(
+    gt_path: str,
+    raster_path: str,
+    label_col: str,
+    label_map: CropTypeDictionary,
+    chunk_size: int = 50_000,
+    bands: tuple = (3, 4),
+    window_size: int = 1024,
+) -> MetricsAccumulator:
+    """
+    `pixel_metrics` over the ground truth read chunk by chunk, so vector memory is bounded by the chunk size as
+        well. Every chunk reads the raster windows its fields touch, so a spatially sorted ground truth file keeps
+        windows from being read by several chunks. Results are identical to `pixel_metrics` over all fields.
+
+    Args:
+        gt_path (str): Path to the ground truth vector file.
+        raster_path (str): Path to the prediction raster.
+        label_col (str): Column name for crop type values.
+        label_map (CropTypeDictionary): Dictionary mapping crop types to labels.
+        chunk_size (int): Number of fields per chunk.
+        bands (tuple): 1-based (class, confidence) band indexes of the raster.
+        window_size (int): Minimum window height/width in pixels used when coalescing raster blocks.
+
+    Returns:
+        MetricsAccumulator: Accumulator whose counts are pixels instead of fields.
+    """
+    metrics = MetricsAccumulator.from_label_map(label_map)
+    for i, chunk in enumerate(iter_field_chunks(gt_path, chunk_size)):
+        logging.info(f"Processing chunk {i} ({len(chunk)} fields)")
+        chunk = schema_check(chunk, label_col, label_map)
+        metrics.merge(
+            pixel_metrics(raster_path, chunk, label_col, label_map, bands, window_size)
+        )
+    return metrics
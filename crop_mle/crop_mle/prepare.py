@@ -0,0 +1,175 @@
+import numpy as np
+import rasterio as rio
+import geopandas as gpd
+import shapely
+import logging
+from crop_mle.process import predictions_frame
+
+PREFILTER_MODES = ["off", "drop", "centroid"]
+
+
+def align_crs(fields: gpd.GeoDataFrame, crs) -> gpd.GeoDataFrame:
+    """
+    Reproject the fields to the raster CRS in one vectorized call. Fields without a CRS are assumed to share it.
+
+    Args:
+        fields (gpd.GeoDataFrame): GeoDataFrame containing field geometries.
+        crs (rasterio.crs.CRS): CRS of the prediction raster.
+
+    Returns:
+        gpd.GeoDataFrame: The fields in the raster CRS.
+    """
+    if fields.crs is None or crs is None:
+        return fields
+    if fields.crs == crs:
+        return fields
+    logging.info(f"Reprojecting {len(fields)} fields from {fields.crs} to {crs}")
+    return fields.to_crs(crs)
+
+
+def footprint_overlap(geoms: np.ndarray, footprint: shapely.Geometry) -> np.ndarray:
+    """
+    Fields intersecting the raster footprint, found with an STRtree over the field geometries.
+
+    Args:
+        geoms (np.ndarray): Field geometries in the raster CRS.
+        footprint (shapely.Geometry): Raster footprint.
+
+    Returns:
+        np.ndarray: Boolean mask of fields intersecting the footprint.
+    """
+    overlap = np.zeros(len(geoms), dtype=bool)
+    overlap[shapely.STRtree(geoms).query(footprint, predicate="intersects")] = True
+    return overlap
+
+
+def pixel_center_mask(
+    geoms: np.ndarray, transform: rio.Affine, shape: tuple
+) -> np.ndarray:
+    """
+    Fields whose bounding box contains at least one raster pixel center. A field without one cannot have pixels,
+        since masking (not all-touched) only keeps pixels whose center lies inside the geometry, so it is a sliver
+        that is known to come back empty. Empty and zero-area geometries have no pixels either.
+
+    Args:
+        geoms (np.ndarray): Field geometries in the raster CRS.
+        transform (rio.Affine): Raster geotransform (north-up; rotated rasters are not checked).
+        shape (tuple): Raster height and width in pixels.
+
+    Returns:
+        np.ndarray: Boolean mask of fields that may have pixels.
+    """
+    has_area = ~shapely.is_empty(geoms) & (shapely.area(geoms) > 0)
+    if not transform.is_rectilinear:
+        return has_area
+    bounds = shapely.bounds(geoms)
+    # fractional column and row of the bounding box edges; pixel centers sit at integer + 0.5
+    cols = (bounds[:, [0, 2]] - transform.c) / transform.a
+    rows = (bounds[:, [1, 3]] - transform.f) / transform.e
+    cols.sort(axis=1)
+    rows.sort(axis=1)
+    first_col = np.maximum(np.ceil(cols[:, 0] - 0.5), 0)
+    last_col = np.minimum(np.floor(cols[:, 1] - 0.5), shape[1] - 1)
+    first_row = np.maximum(np.ceil(rows[:, 0] - 0.5), 0)
+    last_row = np.minimum(np.floor(rows[:, 1] - 0.5), shape[0] - 1)
+    return has_area & (first_col <= last_col) & (first_row <= last_row)
+
+
+def sample_points(src, points: np.ndarray, bands: tuple = (3, 4)) -> tuple:
+    """
+    Class and confidence of the pixels under `points`, read in one `sample` call.
+
+    Args:
+        src (rio.DatasetReader): Open prediction raster.
+        points (np.ndarray): Point geometries in the raster CRS.
+        bands (tuple): 1-based (class, confidence) band indexes of the raster.
+
+    Returns:
+        tuple: Class (np.ndarray, -1 where missing), confidence (np.ndarray, NaN where missing)
+    """
+    majority_class = np.full(len(points), -1, dtype=np.int64)
+    confidence = np.full(len(points), np.nan, dtype=np.float64)
+    rows, cols = rio.transform.rowcol(
+        src.transform, shapely.get_x(points), shapely.get_y(points)
+    )
+    rows, cols = np.asarray(rows), np.asarray(cols)
+    inside = (rows >= 0) & (rows < src.height) & (cols >= 0) & (cols < src.width)
+    if not inside.any():
+        return majority_class, confidence
+    coords = zip(shapely.get_x(points[inside]), shapely.get_y(points[inside]))
+    samples = np.ma.stack(list(src.sample(coords, indexes=list(bands), masked=True)))
+    valid = ~np.ma.getmaskarray(samples).any(axis=1)
+    positions = np.flatnonzero(inside)[valid]
+    majority_class[positions] = samples[valid, 0].astype(np.int64)
+    confidence[positions] = samples[valid, 1].astype(np.float64)
+    return majority_class, confidence
+
+
+def prefiltered_aggregate(
+    raster_path: str,
+    fields: gpd.GeoDataFrame,
+    aggregate,
+    mode: str = "drop",
+    bands: tuple = (3, 4),
+) -> gpd.GeoDataFrame:
+    """
+    Wrap an aggregation function with a preparation stage: the fields are reprojected to the raster CRS in bulk,
+        fields outside the raster footprint are found with an STRtree query, and slivers whose bounding box holds no
+        pixel center are predicted from their bounds. Only the remaining fields are passed to `aggregate`, so
+        non-overlapping and pixel-less fields no longer go through a failing mask each. Slivers are dropped
+        (no prediction, as before) or, in 'centroid' mode, get the class and confidence of the pixel under a point
+        on their surface.
+
+    Args:
+        raster_path (str): Path to the prediction raster.
+        fields (gpd.GeoDataFrame): GeoDataFrame containing field geometries.
+        aggregate (callable): Aggregation function with the `aggregate_predictions(raster_path, fields)` signature.
+        mode (str): 'drop' to leave slivers without a prediction, 'centroid' to sample them at a point on their
+            surface, or 'off' to pass all fields to `aggregate` unchanged.
+        bands (tuple): 1-based (class, confidence) band indexes of the raster.
+
+    Returns:
+        gpd.GeoDataFrame: GeoDataFrame containing field_id, predicted class, and confidence.
+    """
+    if mode == "off":
+        return aggregate(raster_path, fields)
+    if mode not in PREFILTER_MODES:
+        raise ValueError(
+            "Invalid prefilter mode. Please select 'off', 'drop' or 'centroid'."
+        )
+
+    with rio.open(raster_path) as src:
+        aligned = align_crs(fields, src.crs)
+        geoms = aligned.geometry.values
+        footprint = shapely.box(*src.bounds)
+        overlap = footprint_overlap(geoms, footprint)
+        regular = overlap & pixel_center_mask(geoms, src.transform, src.shape)
+        slivers = overlap & ~regular
+        logging.info(
+            f"Prefilter: {int((~overlap).sum())} fields outside the raster footprint, "
+            f"{int(slivers.sum())} slivers without pixel centers, {int(regular.sum())} fields to aggregate"
+        )
+        if (~regular).any():
+            logging.info(
+                f"Fields outside the raster: {fields.loc[~overlap, 'field_id'].values}\n"
+                f" Slivers: {fields.loc[slivers, 'field_id'].values}"
+            )
+
+        majority_class = np.full(len(fields), -1, dtype=np.int64)
+        confidence = np.full(len(fields), np.nan, dtype=np.float64)
+        if mode == "centroid" and slivers.any():
+            majority_class[slivers], confidence[slivers] = sample_points(
+                src, shapely.point_on_surface(geoms[slivers]), bands
+            )
+
+    if regular.any():
+        preds = aggregate(raster_path, aligned[regular])
+        missing = preds["predicted_int"].isna().to_numpy()
+        majority_class[regular] = np.where(
+            missing, -1, preds["predicted_int"].fillna(-1).to_numpy()
+        ).astype(np.int64)
+        confidence[regular] = preds["confidence"].to_numpy(dtype=np.float64)
+
+    return predictions_frame(
+        fields["field_id"].values, majority_class, confidence, majority_class < 0
+    )
@@ -2,83 +2,616 @@ import numpy as np
 import rasterio as rio
 from rasterio.mask import mask
 import multiprocessing as mp
+import multiprocessing.pool
 import pandas as pd
 import geopandas as gpd
+import shapely
+from functools import partial
+from crop_mle.bandstore import BandStore, open_band_store
+from crop_mle.histograms import FieldHistograms, CONF_EDGES, confidence_bins
+from crop_mle.ordering import spatial_order
+from crop_mle.instrument import FieldProfile, FIELD_OK, FIELD_EMPTY, FIELD_FAILED
 import logging
-import os
-from datetime import datetime
+import threading
+import time
 
-# Set up logging
-log_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".log"))
-os.makedirs(log_dir, exist_ok=True)
-log_filename = datetime.now().strftime("logfile_%Y%m%d_%H%M%S.log")
-log_filepath = os.path.join(log_dir, log_filename)
 
-logging.basicConfig(
-    filename=log_filepath,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+def _field_pixels(src, geom, bands: tuple = (3, 4)) -> tuple:
+    """
+    Valid class and confidence pixels of the open prediction raster `src` within a field geometry.
+        Only the class and confidence bands are read; pixels outside the field or masked by the dataset are excluded
+        through the read mask, so values keep the raster's native dtype.
 
+    Args:
+        src (rio.DatasetReader | BandStore): Open prediction raster, or its memory-mapped class/confidence band store.
+        geom (shapely.Geometry): Field geometry.
+        bands (tuple): 1-based (class, confidence) band indexes of the raster.
 
-def process_field(field: gpd.GeoDataFrame, raster_path: str) -> tuple:
+    Returns:
+        tuple: Class pixels (np.ndarray), confidence pixels (np.ndarray)
+    """
+    if isinstance(src, BandStore):
+        croptype, conf = src.mask(geom)
+    else:
+        croptype, conf = mask(
+            src, [geom], crop=True, indexes=list(bands), filled=False
+        )[0]
+    return croptype.compressed(), conf.compressed()
+
+
+def _majority(croptype: np.ndarray, conf: np.ndarray) -> tuple:
+    """Majority class and mean confidence of a field's valid pixels."""
+    return np.bincount(croptype).argmax(), np.mean(conf)
+
+
+def _histograms(croptype: np.ndarray, conf: np.ndarray) -> tuple:
+    """Class histogram, confidence bin histogram and confidence sum of a field's valid pixels (see `crop_mle.histograms`)."""
+    return (
+        np.bincount(croptype),
+        np.bincount(confidence_bins(conf), minlength=len(CONF_EDGES) - 1),
+        conf.sum(dtype=np.float64),
+    )
+
+
+def _aggregate_geometry(
+    src, geom, field_id, bands: tuple = (3, 4), reduce=_majority
+) -> tuple:
+    """
+    Aggregates the open prediction raster `src` to a single field geometry with `reduce`, by default taking the
+        majority class and mean confidence.
+
+    Args:
+        src (rio.DatasetReader | BandStore): Open prediction raster, or its memory-mapped class/confidence band store.
+        geom (shapely.Geometry): Field geometry.
+        field_id: Field ID, used for logging.
+        bands (tuple): 1-based (class, confidence) band indexes of the raster.
+        reduce (callable): Reduction of the field's valid class and confidence pixels to a tuple of values.
+
+    Returns:
+        tuple: `reduce` values (None if the field has no valid pixels), outcome (FIELD_OK, FIELD_EMPTY or FIELD_FAILED)
+    """
+    try:
+        croptype_nona, conf_nona = _field_pixels(src, geom, bands)
+        if croptype_nona.size > 0:  # if we have valid pixels in the field
+            return reduce(croptype_nona, conf_nona), FIELD_OK
+        logging.info(f"No pixels in field {field_id}")
+        return None, FIELD_EMPTY
+    except Exception as e:
+        logging.info(f"Error processing field {field_id}:\n Traceback: {e}")
+        return None, FIELD_FAILED
+
+
+def process_field(
+    field: gpd.GeoDataFrame,
+    raster_path: str,
+    bands: tuple = (3, 4),
+    profiled: bool = False,
+    overview_level: int = None,
+) -> tuple:
     """
     Aggregates prediction raster at `raster_path` to the `field` geomtry, taking the majority class and mean confidence.
 
     Args:
         field (gpd.GeoDataFrame): GeoDataFrame containing field geometry.
         raster_path (str): Path to the prediction raster.
+        bands (tuple): 1-based (class, confidence) band indexes of the raster.
+        profiled (bool): Also report the field's latency, outcome and worker for `FieldProfile`.
+        overview_level (int): If given, read this (0-based) overview level of the raster.
 
     Returns:
-        tuple: Field ID, majority class, mean confidence
+        tuple: Field ID, majority class, mean confidence, geometry; followed by latency (s), outcome and worker ID
+            if `profiled`
+    """
+    start = time.perf_counter()
+    with _open_raster(raster_path, overview_level) as src:
+        values, status = _aggregate_geometry(
+            src, field.geometry, field["field_id"], bands
+        )
+    majority_class, avg_conf = values if values is not None else (None, None)
+    result = (field["field_id"], majority_class, avg_conf, field.geometry)
+    if profiled:
+        return result + (time.perf_counter() - start, status, _worker_id())
+    return result
+
+
+# raster handle (or band store) and band indexes set once per worker process or thread by `_init_worker`
+_worker = threading.local()
+
+EXECUTORS = ("process", "thread", "serial", "auto")
+
+
+def _open_raster(raster_path: str, overview_level: int = None) -> rio.DatasetReader:
+    """Open the prediction raster, or one of its (0-based) overview levels."""
+    if overview_level is None:
+        return rio.open(raster_path)
+    return rio.open(raster_path, overview_level=overview_level)
+
+
+def _init_worker(
+    raster_path: str,
+    band_store: str = None,
+    bands: tuple = (3, 4),
+    overview_level: int = None,
+):
     """
-    with rio.open(raster_path) as src:
-        geom = [field.geometry]
+    Pool initializer that opens the prediction raster once per worker process or thread.
+
+    Args:
+        raster_path (str): Path to the prediction raster.
+        band_store (str): Optional band store directory (see `crop_mle.bandstore`) to memory-map instead of
+            decoding the raster.
+        bands (tuple): 1-based (class, confidence) band indexes of the raster.
+        overview_level (int): If given, read this (0-based) overview level of the raster.
+    """
+    if band_store:
+        _worker.src = open_band_store(band_store)
+    else:
+        _worker.src = _open_raster(raster_path, overview_level)
+    _worker.bands = tuple(bands)
+    _worker.raster_path = raster_path
+    _worker.overview_level = overview_level
+
+
+def _close_worker():
+    """Close the prediction raster opened by `_init_worker` in the calling thread, if any."""
+    src = getattr(_worker, "src", None)
+    if src is not None and hasattr(src, "close"):
+        src.close()
+    _worker.__dict__.clear()
+
+
+def _worker_id() -> int:
+    """ID of the worker running a task: the OS thread ID, which is the process ID in single-threaded workers."""
+    return threading.get_native_id()
+
+
+class SerialPool:
+    """
+    Pool with the `map`/`starmap` interface of `multiprocessing.pool.Pool` that runs tasks one after another in the
+        calling thread, for the 'serial' executor. The initializer runs in the calling thread at the start of every
+        `map`/`starmap` call, and the raster it opens is closed at the end of the call.
+    """
+
+    def __init__(self, initializer=None, initargs: tuple = ()):
+        self._initializer = initializer
+        self._initargs = initargs
+
+    def starmap(self, func, iterable) -> list:
+        if self._initializer is None:
+            return [func(*args) for args in iterable]
+        self._initializer(*self._initargs)
         try:
-            out_image, _ = mask(
-                src, geom, crop=True, nodata=-99
-            )  # account for edge pixels give them intentional nodata value
-            croptype = out_image[2, :, :]
-            croptype_nona = croptype[croptype != -99]  # remove edge pixels
-
-            conf = out_image[3, :, :]
-            conf_nona = conf[conf != -99]  # remove edge pixels
-            if croptype_nona.size > 0:  # if we have valid pixels in the field
-                flattened = croptype_nona.flatten()
-                majority_class = np.bincount(flattened).argmax()
-                avg_conf = np.mean(conf_nona)
-            else:
-                logging.info(f"No pixels in field {field.field_id}")
-                majority_class, avg_conf = None, None
-        except Exception as e:
-            logging.info(
-                f"Error processing field {field['field_id']}:\n Traceback: {e}"
+            return [func(*args) for args in iterable]
+        finally:
+            _close_worker()
+
+    def map(self, func, iterable) -> list:
+        return self.starmap(func, ((item,) for item in iterable))
+
+    def terminate(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.terminate()
+
+
+def executor_workers(executor: str, n_workers: int = None) -> int:
+    """Number of workers of an executor's pool: 1 for 'serial', otherwise `n_workers` or one per CPU."""
+    if executor == "serial":
+        return 1
+    return n_workers or mp.cpu_count()
+
+
+def _executor_pool(
+    executor: str, n_workers: int, initializer=None, initargs: tuple = ()
+):
+    """Pool of `n_workers` processes or threads, or a `SerialPool`, for an executor other than 'auto'."""
+    if executor == "process":
+        return mp.Pool(n_workers, initializer=initializer, initargs=initargs)
+    elif executor == "thread":
+        return mp.pool.ThreadPool(n_workers, initializer=initializer, initargs=initargs)
+    elif executor == "serial":
+        return SerialPool(initializer, initargs)
+    else:
+        raise ValueError(
+            "Invalid executor. Please select 'process', 'thread' or 'serial'."
+        )
+
+
+def worker_pool(
+    raster_path: str,
+    band_store: str = None,
+    bands: tuple = (3, 4),
+    executor: str = "process",
+    n_workers: int = None,
+    overview_level: int = None,
+) -> mp.pool.Pool:
+    """
+    Pool whose workers keep the prediction raster (or band store) open, for the 'batch' worker mode.
+
+    Args:
+        raster_path (str): Path to the prediction raster.
+        band_store (str): Optional band store directory to memory-map instead of decoding the raster.
+        bands (tuple): 1-based (class, confidence) band indexes of the raster.
+        executor (str): 'process' for worker processes, 'thread' for worker threads of this process (GDAL reads and
+            NumPy reductions release the GIL; each thread opens its own dataset handle), or 'serial' to run in the
+            calling thread.
+        n_workers (int): Number of workers (default: one per CPU).
+        overview_level (int): If given, workers read this (0-based) overview level of the raster.
+
+    Returns:
+        mp.pool.Pool: Process pool, thread pool or `SerialPool`.
+    """
+    return _executor_pool(
+        executor,
+        executor_workers(executor, n_workers),
+        initializer=_init_worker,
+        initargs=(raster_path, band_store, bands, overview_level),
+    )
+
+
+def calibrate_executor(
+    worker,
+    batches: list,
+    raster_path: str,
+    band_store: str = None,
+    bands: tuple = (3, 4),
+    n_workers: int = None,
+    overview_level: int = None,
+) -> tuple:
+    """
+    Choose the executor for the 'batch' worker mode from a quick calibration on the first batches. One batch is run
+        serially, the next `n_workers` batches on a thread pool and, if enough batches remain to amortize it, the
+        next `n_workers` batches on a process pool. The executor with the lowest measured wall time per batch is
+        returned with its pool, which is reused for the remaining batches, so the process start-up cost is paid
+        once and only during the calibration. The calibration batches are real work and their results are returned
+        as well.
+
+    Args:
+        worker (callable): Batch worker, e.g. `process_batch`.
+        batches (list): Batches of (field_id, WKB geometry) tuples.
+        raster_path (str): Path to the prediction raster.
+        band_store (str): Optional band store directory to memory-map instead of decoding the raster.
+        bands (tuple): 1-based (class, confidence) band indexes of the raster.
+        n_workers (int): Number of workers (default: one per CPU).
+        overview_level (int): If given, workers read this (0-based) overview level of the raster.
+
+    Returns:
+        tuple: Executor ('process', 'thread' or 'serial'), worker results of the calibration batches (list),
+            pool of the executor from `worker_pool` (to be terminated by the caller)
+    """
+    n_workers = n_workers or mp.cpu_count()
+    if n_workers == 1 or len(batches) <= 1:
+        return (
+            "serial",
+            [],
+            worker_pool(
+                raster_path, band_store, bands, "serial", overview_level=overview_level
+            ),
+        )
+    pools, seconds, results = {}, {}, []
+    try:
+        for executor, n_batches in (
+            ("serial", 1),
+            ("thread", n_workers),
+            ("process", n_workers),
+        ):
+            # a process pool only pays off if batches remain after its calibration round
+            if executor == "process" and len(batches) - len(results) <= n_batches:
+                break
+            pools[executor] = worker_pool(
+                raster_path, band_store, bands, executor, n_workers, overview_level
             )
-            logging.info(f"croptype: {croptype}")
-            logging.info(f"conf: {conf}")
-            majority_class, avg_conf = None, None
+            sample = batches[len(results) : len(results) + n_batches]
+            start = time.perf_counter()
+            results += pools[executor].map(worker, sample)
+            seconds[executor] = (time.perf_counter() - start) / len(sample)
+        executor = min(seconds, key=seconds.get)
+    except BaseException:
+        for pool in pools.values():
+            pool.terminate()
+        raise
+    for name, pool in pools.items():
+        if name != executor:
+            pool.terminate()
+    logging.info(
+        "Executor calibration: "
+        + ", ".join(f"{s:.4f}s per batch with '{name}'" for name, s in seconds.items())
+        + f"; using '{executor}'"
+    )
+    return executor, results, pools[executor]
+
+
+def process_batch(
+    batch: list,
+    profiled: bool = False,
+    histograms: bool = False,
+    raster_path: str = None,
+) -> tuple:
+    """
+    Aggregates the worker's open prediction raster to a batch of fields, returning compact arrays instead of per-field tuples.
+        Must run in a worker initialized with `_init_worker`.
+
+    Args:
+        batch (list): List of (field_id, WKB geometry) tuples.
+        profiled (bool): Also report per-field latency and outcome, and the worker's busy time, for `FieldProfile`.
+        histograms (bool): Return per-field class and confidence histograms (see `crop_mle.histograms`) instead of
+            the reduced values.
+        raster_path (str): If given and different from the raster the worker has open, the worker switches to this
+            raster first, so one pool can serve several rasters.
+
+    Returns:
+        tuple: Majority class (np.ndarray, -1 where no prediction) and mean confidence (np.ndarray, NaN where no
+            prediction), or histograms (FieldHistograms) if `histograms`; followed by latency per field in seconds
+            (np.ndarray), outcome per field (np.ndarray), worker ID (int) and busy seconds (float) if `profiled`
+    """
+    batch_start = time.perf_counter()
+    if raster_path is not None and raster_path != _worker.raster_path:
+        bands, overview_level = _worker.bands, _worker.overview_level
+        _close_worker()
+        _init_worker(raster_path, bands=bands, overview_level=overview_level)
+    reduce = _histograms if histograms else _majority
+    values = [None] * len(batch)
+    latency = np.empty(len(batch), dtype=np.float64)
+    status = np.empty(len(batch), dtype=np.int8)
+    for i, (field_id, wkb) in enumerate(batch):
+        start = time.perf_counter()
+        values[i], status[i] = _aggregate_geometry(
+            _worker.src, shapely.from_wkb(wkb), field_id, _worker.bands, reduce
+        )
+        latency[i] = time.perf_counter() - start
 
-    return field["field_id"], majority_class, avg_conf, field.geometry
+    if histograms:
+        empty = np.zeros(0, dtype=np.int64)
+        result = (
+            FieldHistograms.from_rows(
+                np.array([field_id for field_id, _ in batch], dtype=object),
+                [empty if v is None else v[0] for v in values],
+                [empty if v is None else v[1] for v in values],
+                np.array([0.0 if v is None else v[2] for v in values]),
+                status == FIELD_FAILED,
+            ),
+        )
+    else:
+        majority_class = np.full(len(batch), -1, dtype=np.int64)
+        avg_conf = np.full(len(batch), np.nan, dtype=np.float64)
+        for i, v in enumerate(values):
+            if v is not None:
+                majority_class[i], avg_conf[i] = v
+        result = (majority_class, avg_conf)
+    if profiled:
+        busy = time.perf_counter() - batch_start
+        return result + (latency, status, _worker_id(), busy)
+    return result
 
 
-def aggregate_predictions(raster_path: str, fields: gpd.GeoDataFrame) -> pd.DataFrame:
+def predictions_frame(
+    field_ids: np.ndarray,
+    majority_class: np.ndarray,
+    avg_conf: np.ndarray,
+    missing: np.ndarray,
+) -> gpd.GeoDataFrame:
+    """
+    Build the per-field predictions table returned by the aggregation engines from column arrays.
+        Fields flagged as `missing` get NaN class and confidence, as `aggregate_predictions` does for fields without valid pixels.
+
+    Args:
+        field_ids (np.ndarray): Field IDs.
+        majority_class (np.ndarray): Majority class per field.
+        avg_conf (np.ndarray): Mean confidence per field.
+        missing (np.ndarray): Boolean mask of fields without a prediction.
+
+    Returns:
+        gpd.GeoDataFrame: GeoDataFrame containing field_id, predicted class, and confidence.
+    """
+    predicted_int = np.asarray(majority_class, dtype=np.int64)
+    confidence = np.asarray(avg_conf, dtype=np.float64).copy()
+    if missing.any():
+        predicted_int = predicted_int.astype(np.float64)
+        predicted_int[missing] = np.nan
+        confidence[missing] = np.nan
+    df = pd.DataFrame(
+        {
+            "field_id": field_ids,
+            "predicted_int": predicted_int,
+            "confidence": confidence,
+        }
+    )
+    return gpd.GeoDataFrame(df)
+
+
+def field_batches(
+    fields: gpd.GeoDataFrame,
+    order: str = "hilbert",
+    chunk_size: int = 256,
+    raster_path: str = None,
+) -> tuple:
+    """
+    Spatially ordered batches of (field_id, WKB geometry) tuples for the 'batch' worker mode.
+
+    Args:
+        fields (gpd.GeoDataFrame): GeoDataFrame containing field geometries.
+        order (str): Spatial scheduling order, see `crop_mle.ordering.spatial_order`.
+        chunk_size (int): Number of fields per batch.
+        raster_path (str): Path to the prediction raster, used for 'tile' ordering.
+
+    Returns:
+        tuple: Positional permutation of the fields (np.ndarray) and the batches (list).
+    """
+    perm = spatial_order(fields, order, raster_path)
+    ordered_ids = fields["field_id"].values[perm]
+    ordered_wkbs = shapely.to_wkb(fields.geometry.values)[perm]
+    batches = [
+        list(zip(ordered_ids[i : i + chunk_size], ordered_wkbs[i : i + chunk_size]))
+        for i in range(0, len(fields), chunk_size)
+    ]
+    return perm, batches
+
+
+def aggregate_predictions(
+    raster_path: str,
+    fields: gpd.GeoDataFrame,
+    worker_mode: str = "batch",
+    chunk_size: int = 256,
+    order: str = "hilbert",
+    profile: FieldProfile = None,
+    band_store: str = None,
+    bands: tuple = (3, 4),
+    histogram_path: str = None,
+    pool: mp.pool.Pool = None,
+    executor: str = "process",
+    n_workers: int = None,
+    overview_level: int = None,
+    batches: tuple = None,
+) -> pd.DataFrame:
     """
     Parallelizes the process_field function to aggregate predictions for each field in the fields GeoDataFrame.
 
     Args:
         raster_path (str): Path to the prediction raster.
         fields (gpd.GeoDataFrame): GeoDataFrame containing field geometries.
+        worker_mode (str): 'batch' sends chunks of (field_id, WKB) to workers that keep the raster open for their lifetime,
+            'field' sends one GeoDataFrame row per task and reopens the raster for every field.
+        chunk_size (int): Number of fields per task in 'batch' mode.
+        order (str): Spatial scheduling order ('hilbert', 'morton', 'tile' or 'none' for input order), see `crop_mle.ordering`.
+            Consecutive tasks, and so each worker's share of them, cover spatially compact groups of fields;
+            results are always returned in the input order.
+        profile (FieldProfile): Optional profile that per-field latencies, outcomes and worker busy times are added to.
+        band_store (str): Optional directory of a band store built from `raster_path` by `crop_mle.bandstore`;
+            'batch' workers then read field windows from the memory-mapped store instead of the GeoTIFF.
+        bands (tuple): 1-based (class, confidence) band indexes of the raster.
+        histogram_path (str): If given, 'batch' workers return per-field class and confidence histograms instead of
+            the reduced values; they are saved to this `.npz` path (see `crop_mle.histograms`) and the
+            predictions are computed from them.
+        pool (mp.pool.Pool): Optional 'batch' worker pool from `worker_pool` for the same raster, band store and
+            bands, reused across calls (e.g. per chunk) instead of starting a pool per call.
+        executor (str): Where the workers run: 'process' (worker processes), 'thread' (worker threads with one
+            dataset handle each, no task serialization and a single Python runtime in memory), 'serial' (the calling
+            thread) or, for 'batch' mode, 'auto' to choose among them from a quick calibration on the first batches
+            (see `calibrate_executor`). Ignored if `pool` is given.
+        n_workers (int): Number of workers (default: one per CPU, one for 'serial'). With `pool`, the size of
+            `pool` (as created by `worker_pool` with the same `executor` and `n_workers`).
+        overview_level (int): If given, read this (0-based) overview level of the raster instead of the full
+            resolution, e.g. for a quick approximate run. Fields smaller than an overview pixel get no prediction.
+            Ignored if `pool` is given.
+        batches (tuple): Optional (permutation, batches) from `field_batches` for the same `fields`, `order` and
+            `chunk_size`, computed once and reused across rasters instead of being rebuilt per call. 'batch' mode only.
 
     Returns:
         gpd.GeoDataFrame: GeoDataFrame containing field_id, predicted class, and confidence.
     """
-    with mp.Pool(mp.cpu_count()) as pool:
-        results = pool.starmap(
-            process_field, [(field, raster_path) for _, field in fields.iterrows()]
+    if band_store and worker_mode != "batch":
+        raise ValueError("A band store can only be used with worker_mode 'batch'.")
+    if pool is not None and worker_mode != "batch":
+        raise ValueError("A worker pool can only be used with worker_mode 'batch'.")
+    if executor not in EXECUTORS:
+        raise ValueError(
+            "Invalid executor. Please select 'process', 'thread', 'serial' or 'auto'."
         )
-    df = pd.DataFrame(
-        results, columns=["field_id", "predicted_int", "confidence", "geom"]
-    )
-    gdf = gpd.GeoDataFrame(df, geometry="geom", crs=fields.crs)
-    gdf.drop(columns=["geom"], inplace=True)
-    return gdf
+    if executor == "auto" and worker_mode != "batch":
+        raise ValueError(
+            "The 'auto' executor can only be used with worker_mode 'batch'."
+        )
+    if histogram_path and worker_mode != "batch":
+        raise ValueError("Histograms can only be collected with worker_mode 'batch'.")
+    if band_store and overview_level is not None:
+        raise ValueError("A band store holds full resolution bands, not overviews.")
+    if band_store and open_band_store(band_store).bands != list(bands):
+        raise ValueError(f"The band store at {band_store} does not hold bands {bands}.")
+    if batches is not None and worker_mode != "batch":
+        raise ValueError("Prepared batches can only be used with worker_mode 'batch'.")
+    if worker_mode == "batch":
+        field_ids = fields["field_id"].values
+        if batches is None:
+            batches = field_batches(fields, order, chunk_size, raster_path)
+        perm, batches = batches
+        worker = partial(
+            process_batch,
+            profiled=profile is not None,
+            histograms=bool(histogram_path),
+            # a pool passed in may have been started for another raster
+            raster_path=raster_path if pool is not None else None,
+        )
+        pool_start = time.perf_counter()
+        if pool is None:
+            results = []
+            if executor == "auto":
+                executor, results, own_pool = calibrate_executor(
+                    worker,
+                    batches,
+                    raster_path,
+                    band_store,
+                    bands,
+                    n_workers,
+                    overview_level,
+                )
+            else:
+                own_pool = worker_pool(
+                    raster_path,
+                    band_store,
+                    bands,
+                    executor,
+                    executor_workers(executor, n_workers),
+                    overview_level,
+                )
+            n_workers = executor_workers(executor, n_workers)
+            with own_pool:
+                results += own_pool.map(worker, batches[len(results) :])
+        else:
+            n_workers = executor_workers(executor, n_workers)
+            results = pool.map(worker, batches)
+        if profile is not None:
+            profile.add_pool(time.perf_counter() - pool_start, n_workers)
+            for r in results:
+                profile.add(*r[-4:])
+
+        if histogram_path:
+            histograms = FieldHistograms.concat([r[0] for r in results])
+            histograms = histograms.take(np.argsort(perm))  # restore input order
+            histograms.field_id = field_ids
+            histograms.save(histogram_path)
+            return predictions_frame(
+                field_ids,
+                histograms.majority(),
+                histograms.mean_confidence(),
+                histograms.missing,
+            )
+
+        # restore input order
+        majority_class = np.empty(len(fields), dtype=np.int64)
+        avg_conf = np.empty(len(fields), dtype=np.float64)
+        if results:
+            majority_class[perm] = np.concatenate([r[0] for r in results])
+            avg_conf[perm] = np.concatenate([r[1] for r in results])
+        return predictions_frame(
+            field_ids, majority_class, avg_conf, majority_class < 0
+        )
+    elif worker_mode == "field":
+        perm = spatial_order(fields, order, raster_path)
+        pool_start = time.perf_counter()
+        n_workers = executor_workers(executor, n_workers)
+        with _executor_pool(executor, n_workers) as pool:
+            results = pool.starmap(
+                process_field,
+                [
+                    (field, raster_path, bands, profile is not None, overview_level)
+                    for _, field in fields.iloc[perm].iterrows()
+                ],
+            )
+        if profile is not None:
+            profile.add_pool(time.perf_counter() - pool_start, n_workers)
+            for r in results:
+                profile.add(*r[4:6], r[6], r[4])
+            results = [r[:4] for r in results]
+        results = [results[i] for i in np.argsort(perm)]  # restore input order
+        df = pd.DataFrame(
+            results, columns=["field_id", "predicted_int", "confidence", "geom"]
+        )
+        gdf = gpd.GeoDataFrame(df, geometry="geom", crs=fields.crs)
+        gdf.drop(columns=["geom"], inplace=True)
+        return gdf
+    else:
+        raise ValueError("Invalid worker_mode. Please select 'batch' or 'field'.")
@@ -0,0 +1,202 @@
+import logging
+import os
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from crop_mle._types import CropTypeDictionary
+from crop_mle.evaluate import merge_predictions
+from crop_mle.metrics import MetricsAccumulator, encode_labels, percentile_interval
+
+# sampling weight of each field, carried through the merge
+WEIGHT_COLUMN = "_sample_weight"
+
+
+def stratified_sample(
+    fields: gpd.GeoDataFrame,
+    label_col: str,
+    label_map: CropTypeDictionary,
+    per_class: int = 200,
+    seed: int = 0,
+) -> tuple:
+    """
+    Draw a simple random sample of at most `per_class` fields from every ground truth class. Classes with fewer
+        fields are taken in full.
+
+    Args:
+        fields (gpd.GeoDataFrame): Schema-checked ground truth fields.
+        label_col (str): Column name for crop type values.
+        label_map (CropTypeDictionary): Dictionary mapping crop types to labels.
+        per_class (int): Sample size per class.
+        seed (int): Random seed.
+
+    Returns:
+        tuple: Sorted positions of the sampled fields (np.ndarray), sampling weight of each sampled field
+            (class size / class sample size, np.ndarray)
+    """
+    codes = encode_labels(fields[label_col].map(label_map.alias_lookup), label_map)
+    strata = np.where(codes < 0, len(label_map.crop_dict), codes)
+    # random order within each class, then keep the first `per_class` of each
+    order = np.lexsort((np.random.default_rng(seed).random(len(fields)), strata))
+    sizes = np.bincount(strata, minlength=len(label_map.crop_dict) + 1)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    rank = np.arange(len(fields)) - starts[strata[order]]
+    rows = np.sort(order[rank < per_class])
+    weights = sizes / np.minimum(sizes, per_class).clip(min=1)
+    return rows, weights[strata[rows]]
+
+
+def weighted_metrics(
+    gt_codes: np.ndarray,
+    pred_codes: np.ndarray,
+    confidence: np.ndarray,
+    weights: np.ndarray,
+    labels: list,
+) -> MetricsAccumulator:
+    """
+    Accumulator of a weighted sample: every field counts `weight` times, so counts, agreement, F1 and average
+        confidence estimate those of the full population.
+
+    Args:
+        gt_codes (np.ndarray): Ground truth codes (-1 for missing).
+        pred_codes (np.ndarray): Predicted codes (-1 for missing).
+        confidence (np.ndarray): Field confidence values (NaN values are skipped for average confidence).
+        weights (np.ndarray): Sampling weight per field.
+        labels (list): Crop type labels in confusion matrix order.
+
+    Returns:
+        MetricsAccumulator: Accumulator with (float) weighted counts.
+    """
+    n = len(labels)
+    size = n + 1
+    gt = np.where(gt_codes < 0, n, gt_codes)
+    pred = np.where(pred_codes < 0, n, pred_codes)
+    has_conf = ~np.isnan(confidence)
+    return MetricsAccumulator(
+        labels,
+        counts=np.bincount(
+            gt * size + pred, weights=weights, minlength=size * size
+        ).reshape(size, size),
+        conf_sum=np.bincount(
+            pred[has_conf],
+            weights=weights[has_conf] * confidence[has_conf],
+            minlength=size,
+        ),
+        conf_count=np.bincount(
+            pred[has_conf], weights=weights[has_conf], minlength=size
+        ),
+    )
+
+
+def quicklook_results(
+    merged_df: gpd.GeoDataFrame,
+    label_map: CropTypeDictionary,
+    n_bootstrap: int = 200,
+    level: float = 0.95,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Estimated final results table of the population a weighted sample was drawn from, with stratified bootstrap
+        error bars: each resample redraws the sampled fields of every ground truth class with replacement. Classes
+        that were sampled in full (weight 1) carry no sampling error and are not redrawn.
+
+    Args:
+        merged_df (gpd.GeoDataFrame): Merged sample with standardized labels and a `WEIGHT_COLUMN` column.
+        label_map (CropTypeDictionary): Dictionary mapping crop types to labels.
+        n_bootstrap (int): Number of bootstrap resamples (0 to skip the error bars).
+        level (float): Confidence level of the error bars.
+        seed (int): Random seed.
+
+    Returns:
+        pd.DataFrame: `final_results` columns (Count is the estimated population count) plus Sample Count and
+            CI Low/High columns for F1, Average Confidence and Percent Agreement.
+    """
+    labels = list(label_map.crop_dict.keys())
+    gt = encode_labels(merged_df["gt_label"], label_map)
+    pred = encode_labels(merged_df["pred_label"], label_map)
+    confidence = merged_df["confidence"].to_numpy(dtype=np.float64, na_value=np.nan)
+    weights = merged_df[WEIGHT_COLUMN].to_numpy(dtype=np.float64)
+
+    metrics = weighted_metrics(gt, pred, confidence, weights, labels)
+    final_df = metrics.final_results()
+    present = [labels.index(crop) for crop in final_df["Crop"]]
+    final_df["Count"] = np.round(final_df["Count"].to_numpy(dtype=np.float64)).astype(
+        np.int64
+    )
+    final_df["Sample Count"] = np.bincount(gt[gt >= 0], minlength=len(labels))[present]
+    if n_bootstrap <= 0 or len(merged_df) == 0:
+        return final_df
+
+    # positions of the sampled fields grouped by ground truth class
+    strata = np.where(gt < 0, len(labels), gt)
+    order = np.argsort(strata, kind="stable")
+    sizes = np.bincount(strata)
+    starts = np.concatenate([[0], np.cumsum(sizes)[:-1]])
+    redrawn = weights[order] > 1
+    rng = np.random.default_rng(seed)
+    f1 = np.empty((n_bootstrap, len(labels)))
+    conf = np.empty((n_bootstrap, len(labels)))
+    agreement = np.empty((n_bootstrap, len(labels)))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        for b in range(n_bootstrap):
+            draw = (rng.random(len(order)) * sizes[strata[order]]).astype(np.int64)
+            rows = np.where(redrawn, order[starts[strata[order]] + draw], order)
+            resample = weighted_metrics(
+                gt[rows], pred[rows], confidence[rows], weights[rows], labels
+            )
+            f1[b] = resample.f1()
+            conf[b] = resample.average_confidence()
+            agreement[b] = resample.percent_agreement()
+    for name, values in (
+        ("F1", f1),
+        ("Average Confidence", conf),
+        ("Percent Agreement", agreement),
+    ):
+        low, high = percentile_interval(values, level)
+        final_df[f"{name} CI Low"] = np.round(low[present], 2)
+        final_df[f"{name} CI High"] = np.round(high[present], 2)
+    return final_df
+
+
+def quicklook(
+    fields: gpd.GeoDataFrame,
+    raster_path: str,
+    label_col: str,
+    label_map: CropTypeDictionary,
+    aggregate,
+    out_dir: str,
+    per_class: int = 200,
+    n_bootstrap: int = 200,
+    seed: int = 0,
+) -> pd.DataFrame:
+    """
+    Quick approximate analysis: aggregate the raster to a stratified sample of fields per ground truth class only,
+        and write the estimated final results with sampling error bars to `final_results.csv`. The 'field' engine
+        reads only the sampled fields' windows, so the raster I/O shrinks with the sample; combine with an
+        `aggregate` that reads a raster overview (`aggregate_predictions(..., overview_level=...)`) to cut it
+        further.
+
+    Args:
+        fields (gpd.GeoDataFrame): Schema-checked ground truth fields.
+        raster_path (str): Path to the prediction raster.
+        label_col (str): Column name for crop type values.
+        label_map (CropTypeDictionary): Dictionary mapping crop types to labels.
+        aggregate (callable): Aggregation function with the `aggregate_predictions(raster_path, fields)` signature.
+        out_dir (str): Directory to save the output files.
+        per_class (int): Sample size per ground truth class.
+        n_bootstrap (int): Number of bootstrap resamples for the error bars.
+        seed (int): Random seed of the sample and the bootstrap.
+
+    Returns:
+        pd.DataFrame: The estimated final results table.
+    """
+    rows, weights = stratified_sample(fields, label_col, label_map, per_class, seed)
+    sample = fields.iloc[rows].assign(**{WEIGHT_COLUMN: weights})
+    logging.info(
+        f"Quick look: aggregating a stratified sample of {len(sample)} of {len(fields)} fields"
+    )
+    merged_df = merge_predictions(
+        sample, aggregate(raster_path, sample), label_col, label_map
+    )
+    final_df = quicklook_results(merged_df, label_map, n_bootstrap, seed=seed)
+    final_df.to_csv(os.path.join(out_dir, "final_results.csv"), index=False)
+    return final_df
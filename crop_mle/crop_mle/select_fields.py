@@ -1,22 +1,46 @@
-import logging, os
-from datetime import datetime
+import argparse
+import logging
+from functools import partial
+import numpy as np
+import pandas as pd
 
 # import geopandas as gpd
 
-# Set up logging
-log_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), "..", ".log"))
-os.makedirs(log_dir, exist_ok=True)
-log_filename = datetime.now().strftime("logfile_%Y%m%d_%H%M%S.log")
-log_filepath = os.path.join(log_dir, log_filename)
 
-logging.basicConfig(
-    filename=log_filepath,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+def percentile_cutoffs(
+    input_gdf,
+    pred_column: str,
+    confidence_column: str,
+    percentiles: tuple = (0.5,),
+    strata: list = None,
+) -> pd.DataFrame:
+    """
+    Confidence percentiles per predicted label, or per (predicted label, stratum), in a single groupby pass.
+        Compute the cutoffs once for all percentiles of a policy sweep and pass them to `select_records`.
+
+    Args:
+        input_gdf (gpd.GeoDataFrame): Input GeoDataFrame containing the data.
+        pred_column (str): Column name for the predicted labels.
+        confidence_column (str): Column name for the confidence values.
+        percentiles (tuple): Percentiles to compute, as fractions between 0 and 1.
+        strata (list): Optional columns whose value combinations get their own cutoffs within each label.
+
+    Returns:
+        pd.DataFrame: Cutoffs with one column per percentile, indexed by predicted label (and strata columns).
+    """
+    keys = [pred_column] + list(strata or [])
+    return (
+        # NaN labels or strata form groups of their own instead of being dropped
+        input_gdf.groupby(keys, sort=True, dropna=False)[confidence_column]
+        .quantile(list(percentiles))
+        .unstack()
+        .reindex(columns=list(percentiles))
+    )
 
 
-def conf_percentiles(input_gdf, pred_column: str, confidence_column: str):
+def conf_percentiles(
+    input_gdf, pred_column: str, confidence_column: str, percentiles: tuple = (0.5,)
+):
     """
     Calculate confidence percentiles for each predicted label.
 
@@ -24,16 +48,96 @@ def conf_percentiles(input_gdf, pred_column: str, confidence_column: str):
         input_gdf (gpd.GeoDataFrame): Input GeoDataFrame containing the data.
         pred_column (str): Column name for the predicted labels.
         confidence_column (str): Column name for the confidence values.
+        percentiles (tuple): Percentiles to compute, as fractions between 0 and 1.
 
     Returns:
         dict: Dictionary with predicted labels as keys and DataFrames of percentiles as values.
     """
-    percentiles = [0.5]  # Add more percentiles if needed
-    conf_percentiles = {}
-    for label in input_gdf[pred_column].unique():
-        label_conf = input_gdf[input_gdf[pred_column] == label][confidence_column]
-        conf_percentiles[label] = label_conf.quantile(percentiles).to_frame().T
-    return conf_percentiles
+    cutoffs = percentile_cutoffs(input_gdf, pred_column, confidence_column, percentiles)
+    return {
+        label: cutoffs.loc[[label]].set_axis([confidence_column])
+        for label in cutoffs.index
+    }
+
+
+def uncertainty_score(
+    input_gdf, pred_column: str, gt_column: str, confidence_column: str
+) -> np.ndarray:
+    """
+    Default selection priority: fields whose prediction disagrees with the ground truth rank above all agreeing
+        fields, and within each group lower confidence ranks higher. Fields without a confidence get NaN.
+
+    Args:
+        input_gdf (gpd.GeoDataFrame): Input GeoDataFrame containing the data.
+        pred_column (str): Column name for the predicted labels.
+        gt_column (str): Column name for the ground truth labels.
+        confidence_column (str): Column name for the confidence values.
+
+    Returns:
+        np.ndarray: Score per field, higher is selected first.
+    """
+    confidence = input_gdf[confidence_column].to_numpy(dtype=np.float64)
+    disagree = (input_gdf[pred_column] != input_gdf[gt_column]).to_numpy()
+    if not np.isfinite(confidence).any():
+        return -confidence
+    # offset that lifts every disagreement above every agreement
+    offset = np.nanmax(confidence) - np.nanmin(confidence) + 1.0
+    return disagree * offset - confidence
+
+
+def top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """
+    Positions of the `k` highest scores, found with a partial sort (`np.argpartition`) instead of a full sort.
+        NaN scores are never selected.
+
+    Args:
+        scores (np.ndarray): Score per item.
+        k (int): Number of items to select.
+
+    Returns:
+        np.ndarray: Sorted positions of the selected items.
+    """
+    candidates = np.flatnonzero(~np.isnan(scores))
+    if k <= 0:
+        return candidates[:0]
+    if k < len(candidates):
+        candidates = candidates[np.argpartition(-scores[candidates], k - 1)[:k]]
+    return np.sort(candidates)
+
+
+def quota_top_k(labels, scores: np.ndarray, class_quota) -> np.ndarray:
+    """
+    Positions of the highest scores within each label, keeping at most `class_quota` items per label. Items are
+        grouped with one stable integer sort of the label codes, and each group is partially sorted on its own.
+
+    Args:
+        labels (array-like): Label per item.
+        scores (np.ndarray): Score per item.
+        class_quota (int | dict): Maximum number of items per label, or a dictionary of per-label maxima
+            (labels missing from the dictionary are not limited).
+
+    Returns:
+        np.ndarray: Sorted positions of the selected items.
+    """
+    codes, uniques = pd.factorize(labels)
+    if len(uniques) < 2**15:
+        codes = codes.astype(np.int16)  # stable sort of 16-bit integers is a radix sort
+    order = np.argsort(codes, kind="stable")
+    bounds = np.searchsorted(codes[order], np.arange(len(uniques) + 1))
+    if len(order) and codes[order[0]] < 0:  # missing labels are coded -1
+        order = order[bounds[0] :]
+        bounds = bounds - bounds[0]
+    selected = []
+    for code, label in enumerate(uniques):
+        rows = order[bounds[code] : bounds[code + 1]]
+        if isinstance(class_quota, dict):
+            quota = class_quota.get(label, len(rows))
+        else:
+            quota = class_quota
+        selected.append(rows[top_k(scores[rows], quota)])
+    if not selected:
+        return np.zeros(0, dtype=np.int64)
+    return np.sort(np.concatenate(selected))
 
 
 def select_records(
@@ -41,41 +145,132 @@ def select_records(
     pred_column: str,
     gt_column: str,
     confidence_column: str,
+    percentile: float = 0.5,
+    strata: list = None,
+    cutoffs: pd.DataFrame = None,
+    budget: int = None,
+    class_quota=None,
+    score_column: str = None,
 ):
     """
-    Select records based on prediction agreement and confidence thresholds.
+    Select records based on prediction agreement and confidence thresholds. Candidates are fields whose prediction
+        disagrees with the ground truth, and correct predictions under the `percentile` confidence cutoff of their
+        predicted label (and stratum). With a labeling `budget` and/or `class_quota`, only the candidates with the
+        highest uncertainty score are kept. The input frame is not modified.
 
     Args:
         input_gdf (gpd.GeoDataFrame): Input GeoDataFrame containing the data.
         pred_column (str): Column name for the predicted labels.
         gt_column (str): Column name for the ground truth labels.
         confidence_column (str): Column name for the confidence values.
-        output_path (str): Path to save the selected records to a .gpkg file.
+        percentile (float): Confidence percentile (fraction between 0 and 1) below which correct predictions are kept.
+        strata (list): Optional columns whose value combinations get their own cutoffs within each label.
+        cutoffs (pd.DataFrame): Precomputed `percentile_cutoffs` of `input_gdf` with the same strata that include
+            `percentile`, e.g. shared across a sweep of selection policies.
+        budget (int): Maximum number of selected records.
+        class_quota (int | dict): Maximum number of selected records per predicted label, or a dictionary of
+            per-label maxima.
+        score_column (str): Column with the selection priority (higher first) used with a budget or quota;
+            defaults to `uncertainty_score`.
 
     Returns:
-        None (saves the selected records to a .gpkg file)
+        gpd.GeoDataFrame: Selected records in input order, with their `conf_cutoff` (and `selection_score` if a
+            budget or quota is set).
     """
-    confidence_percentiles = conf_percentiles(input_gdf, pred_column, confidence_column)
-    for label in confidence_percentiles:
+    if cutoffs is None:
+        cutoffs = percentile_cutoffs(
+            input_gdf, pred_column, confidence_column, (percentile,), strata
+        )
+    cutoff = cutoffs[percentile]
+    if not strata:
+        for label, value in cutoff.items():
+            logging.info(
+                f"Keeping Correct Predictions for label '{label}' under Confidence threshold: {float(value)}"
+            )
+    else:
         logging.info(
-            f"Keeping Correct Predictions for label '{label}' under Confidence threshold: {float(confidence_percentiles[label].iloc[0, 0])}"
+            f"Keeping Correct Predictions under Confidence thresholds of {len(cutoff)} label/stratum groups"
         )
-    # Create a dictionary to map predicted labels to their confidence cutoffs
-    conf_cutoff_dict = {
-        label: float(confidence_percentiles[label].iloc[0, 0])
-        for label in confidence_percentiles
-    }
 
-    # Vectorized operation to set confidence cutoffs
-    input_gdf["conf_cutoff"] = input_gdf[pred_column].map(conf_cutoff_dict)
+    # look up the cutoff of each record's (label, stratum) group; unlike a MultiIndex reindex, a merge matches NaN keys
+    keys = [pred_column] + list(strata or [])
+    conf_cutoff = (
+        input_gdf[keys]
+        .merge(cutoff.rename("conf_cutoff").reset_index(), on=keys, how="left")[
+            "conf_cutoff"
+        ]
+        .to_numpy()
+    )
 
     # Vectorized operation to apply the selection rules
-    conditions = (input_gdf[pred_column] != input_gdf[gt_column]) | (
-        (input_gdf[pred_column] == input_gdf[gt_column])
-        & (input_gdf[confidence_column] < input_gdf["conf_cutoff"])
+    pred = input_gdf[pred_column].to_numpy()
+    gt = input_gdf[gt_column].to_numpy()
+    confidence = input_gdf[confidence_column].to_numpy()
+    keep = (pred != gt) | ((pred == gt) & (confidence < conf_cutoff))
+    out_gdf = input_gdf.assign(conf_cutoff=conf_cutoff, keep=keep)[keep]
+
+    if budget is None and class_quota is None:
+        return out_gdf
+    if score_column is None:
+        scores = uncertainty_score(out_gdf, pred_column, gt_column, confidence_column)
+    else:
+        scores = out_gdf[score_column].to_numpy(dtype=np.float64)
+    if class_quota is not None:
+        rows = quota_top_k(out_gdf[pred_column], scores, class_quota)
+    else:
+        rows = np.arange(len(out_gdf))
+    if budget is not None:
+        rows = rows[top_k(scores[rows], budget)]
+    logging.info(
+        f"Selected {len(rows)} of {len(out_gdf)} candidate records within the labeling budget"
+    )
+    return out_gdf.iloc[rows].assign(selection_score=scores[rows])
+
+
+def add_selection_arguments(parser: argparse.ArgumentParser):
+    """Add the selection policy options of 'select' mode to a command line parser."""
+    parser.add_argument(
+        "--select_percentile",
+        type=float,
+        default=0.5,
+        help="'select' mode: keep correct predictions under this confidence percentile (0-1) of their predicted label",
     )
-    input_gdf["keep"] = conditions
+    parser.add_argument(
+        "--select_strata",
+        type=str,
+        nargs="+",
+        required=False,
+        help="'select' mode: ground truth columns whose values get their own confidence cutoffs within each label",
+    )
+    parser.add_argument(
+        "--budget",
+        type=int,
+        required=False,
+        help="'select' mode: labeling budget, keep only this many selected fields with the highest uncertainty",
+    )
+    parser.add_argument(
+        "--class_quota",
+        type=int,
+        required=False,
+        help="'select' mode: keep at most this many selected fields per predicted label",
+    )
+
 
-    # Filter the GeoDataFrame
-    out_gdf = input_gdf[input_gdf["keep"]]
-    return out_gdf
+def selection_policy(args: argparse.Namespace):
+    """
+    `select_records` configured with the selection policy options of `add_selection_arguments`.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+
+    Returns:
+        callable: Selection function with the `select_records(input_gdf, pred_column, gt_column,
+            confidence_column)` signature.
+    """
+    return partial(
+        select_records,
+        percentile=args.select_percentile,
+        strata=args.select_strata,
+        budget=args.budget,
+        class_quota=args.class_quota,
+    )
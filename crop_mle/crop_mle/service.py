@@ -0,0 +1,400 @@
+import argparse
+import json
+import logging
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio as rio
+from crop_mle._types import CropTypeDictionary
+from crop_mle.cache import geometry_hashes
+from crop_mle.evaluate import schema_check, merge_predictions
+from crop_mle.logs import setup_logging
+from crop_mle.metrics import MetricsAccumulator
+from crop_mle.prepare import align_crs, prefiltered_aggregate, PREFILTER_MODES
+from crop_mle.process import (
+    EXECUTORS,
+    aggregate_predictions,
+    executor_workers,
+    predictions_frame,
+    worker_pool,
+)
+from crop_mle.zonal import zonal_aggregate
+
+# fields per 'batch' task are capped like `aggregate_predictions`, but small requests are spread over all workers
+MAX_CHUNK_SIZE = 256
+# default number of per-field results kept in the in-memory cache
+CACHE_SIZE = 1_000_000
+
+
+@dataclass
+class EvaluationService:
+    """
+    Warm evaluation state for many small requests against one prediction raster: the label dictionary and its lookup
+        tables, the 'field' engine's worker pool with the raster open in every worker, and an in-memory cache of
+        per-field results keyed by field ID and geometry hash. The cache holds at most `cache_size` fields and
+        evicts the least recently used ones beyond that. Safe to call from several threads.
+    """
+
+    raster_path: str
+    label_map: CropTypeDictionary = field(default_factory=CropTypeDictionary)
+    engine: str = "field"
+    executor: str = "thread"
+    bands: tuple = (3, 4)
+    prefilter: str = "off"
+    cache: bool = True
+    cache_size: int = CACHE_SIZE
+    requests: int = 0
+    evictions: int = 0
+
+    def __post_init__(self):
+        if self.engine not in ("field", "block"):
+            raise ValueError("Invalid engine. Please select 'field' or 'block'.")
+        if self.executor == "auto":
+            raise ValueError("The service needs a fixed executor, not 'auto'.")
+        with rio.open(self.raster_path) as src:
+            self.crs = src.crs
+        # build the lookup tables once instead of on the first request
+        self.label_map.alias_lookup
+        self.label_map.name_lookup
+        self._pool = None
+        self._n_workers = 1
+        if self.engine == "field":
+            self._n_workers = executor_workers(self.executor)
+            self._pool = worker_pool(
+                self.raster_path,
+                bands=self.bands,
+                executor=self.executor,
+                n_workers=self._n_workers,
+            )
+        self._cache = OrderedDict()
+        self._lock = threading.Lock()
+
+    def close(self):
+        """Stop the worker pool."""
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
+
+    def _aggregate(
+        self, raster_path: str, fields: gpd.GeoDataFrame
+    ) -> gpd.GeoDataFrame:
+        if self.engine == "block":
+            return zonal_aggregate(raster_path, fields, bands=self.bands)
+        chunk_size = min(MAX_CHUNK_SIZE, max(1, -(-len(fields) // self._n_workers)))
+        return aggregate_predictions(
+            raster_path,
+            fields,
+            chunk_size=chunk_size,
+            bands=self.bands,
+            pool=self._pool,
+            executor=self.executor,
+            n_workers=self._n_workers,
+        )
+
+    def predict(self, fields: gpd.GeoDataFrame) -> gpd.GeoDataFrame:
+        """
+        Aggregate the prediction raster to `fields`, serving unchanged fields from the in-memory cache.
+
+        Args:
+            fields (gpd.GeoDataFrame): GeoDataFrame containing field_id and field geometries (reprojected to the
+                raster CRS if needed).
+
+        Returns:
+            gpd.GeoDataFrame: GeoDataFrame containing field_id, predicted class, and confidence.
+        """
+        with self._lock:
+            self.requests += 1
+        fields = align_crs(fields, self.crs)
+        if len(fields) == 0:
+            return predictions_frame(
+                fields["field_id"].values,
+                np.zeros(0, dtype=np.int64),
+                np.zeros(0),
+                np.zeros(0, dtype=bool),
+            )
+        aggregate = partial(
+            prefiltered_aggregate,
+            aggregate=self._aggregate,
+            mode=self.prefilter,
+            bands=self.bands,
+        )
+        if not self.cache:
+            return aggregate(self.raster_path, fields)
+
+        keys = list(zip(fields["field_id"], geometry_hashes(fields.geometry.values)))
+        with self._lock:
+            cached = [self._cache.get(key) for key in keys]
+            for key, c in zip(keys, cached):
+                if c is not None:
+                    self._cache.move_to_end(key)
+        hit = np.array([c is not None for c in cached], dtype=bool)
+        majority_class = np.full(len(fields), -1, dtype=np.int64)
+        confidence = np.full(len(fields), np.nan, dtype=np.float64)
+        for i in np.flatnonzero(hit):
+            majority_class[i], confidence[i] = cached[i]
+        if (~hit).any():
+            preds = aggregate(self.raster_path, fields[~hit])
+            majority_class[~hit] = preds["predicted_int"].fillna(-1).to_numpy()
+            confidence[~hit] = preds["confidence"].to_numpy(dtype=np.float64)
+            with self._lock:
+                for i in np.flatnonzero(~hit):
+                    self._cache[keys[i]] = (majority_class[i], confidence[i])
+                    self._cache.move_to_end(keys[i])
+                # evict the least recently used fields
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+                    self.evictions += 1
+        return predictions_frame(
+            fields["field_id"].values, majority_class, confidence, majority_class < 0
+        )
+
+    def evaluate(self, fields: gpd.GeoDataFrame, label_col: str) -> MetricsAccumulator:
+        """
+        Schema check `fields`, aggregate the raster to them and accumulate the analysis metrics.
+
+        Args:
+            fields (gpd.GeoDataFrame): Ground truth fields.
+            label_col (str): Column name for crop type values.
+
+        Returns:
+            MetricsAccumulator: Metrics of the fields with predictions.
+        """
+        fields = schema_check(fields, label_col, self.label_map)
+        merged_df = merge_predictions(
+            fields, self.predict(fields), label_col, self.label_map
+        )
+        return MetricsAccumulator.from_label_map(self.label_map).update_frame(
+            merged_df, "gt_label", "pred_label", "confidence", self.label_map
+        )
+
+
+def _records(df: pd.DataFrame) -> list:
+    """JSON-serializable records of `df`, with None for missing values."""
+    return json.loads(df.to_json(orient="records"))
+
+
+def read_features(payload: dict, crs) -> gpd.GeoDataFrame:
+    """
+    Fields of a request: a GeoJSON FeatureCollection whose features have a `field_id` property, in the CRS given by
+        the request's `crs` member (default: the raster CRS).
+
+    Args:
+        payload (dict): Decoded request body (any other JSON value is rejected with a ValueError).
+        crs: Default CRS of the features.
+
+    Returns:
+        gpd.GeoDataFrame: The request's fields.
+    """
+    if not isinstance(payload, dict) or payload.get("type") != "FeatureCollection":
+        raise ValueError("Request body must be a GeoJSON FeatureCollection.")
+    fields = gpd.GeoDataFrame.from_features(
+        payload["features"], crs=payload.get("crs") or crs
+    )
+    if len(fields) and "field_id" not in fields.columns:
+        raise ValueError("Features must have a 'field_id' property.")
+    if not len(fields):
+        fields = gpd.GeoDataFrame(
+            {"field_id": pd.Series(dtype=object)},
+            geometry=gpd.GeoSeries([], crs=payload.get("crs") or crs),
+        )
+    return fields
+
+
+class ServiceHandler(BaseHTTPRequestHandler):
+    """
+    HTTP endpoints of an `EvaluationService`:
+        `POST /predict` returns per-field predictions, `POST /metrics` the final results and confusion matrix of the
+        posted ground truth fields (label column from the `label_field` member, default 'normalized_label'), and
+        `GET /health` the service state. Malformed requests get a 400 response and failures while serving them a
+        500 response.
+    """
+
+    service: EvaluationService = None
+
+    def _send(self, status: int, body: dict):
+        data = json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path != "/health":
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+        self._send(
+            200,
+            {
+                "status": "ok",
+                "raster": self.service.raster_path,
+                "engine": self.service.engine,
+                "requests": self.service.requests,
+                "cached_fields": len(self.service._cache),
+                "cache_size": self.service.cache_size,
+                "cache_evictions": self.service.evictions,
+            },
+        )
+
+    def do_POST(self):
+        if self.path not in ("/predict", "/metrics"):
+            self._send(404, {"error": f"Unknown path {self.path}"})
+            return
+        start = time.perf_counter()
+        try:
+            payload = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+            fields = read_features(payload, self.service.crs)
+            if self.path == "/predict":
+                preds = self.service.predict(fields)
+                preds["pred_label"] = self.service.label_map.names_from_ints(
+                    preds["predicted_int"]
+                )
+                body = {"fields": _records(pd.DataFrame(preds))}
+            else:
+                metrics = self.service.evaluate(
+                    fields, payload.get("label_field", "normalized_label")
+                )
+                body = {
+                    "final_results": _records(metrics.final_results()),
+                    "labels": metrics.labels,
+                    "confusion_matrix": metrics.confusion.tolist(),
+                }
+        except (ValueError, KeyError, TypeError) as e:
+            self._send(400, {"error": str(e)})
+            return
+        except Exception as e:
+            # e.g. raster or geometry errors: keep serving and report them to the client
+            logging.exception(f"{self.path}: request failed")
+            self._send(500, {"error": f"{type(e).__name__}: {e}"})
+            return
+        body["n_fields"] = len(fields)
+        body["seconds"] = time.perf_counter() - start
+        logging.info(f"{self.path}: {len(fields)} fields in {body['seconds']:.4f}s")
+        self._send(200, body)
+
+    def log_message(self, format, *args):
+        logging.info(format % args)
+
+
+def make_server(
+    service: EvaluationService, host: str = "127.0.0.1", port: int = 8765
+) -> ThreadingHTTPServer:
+    """
+    HTTP server for `service`, handling each request in its own thread. Call `serve_forever()` to run it.
+
+    Args:
+        service (EvaluationService): Warm evaluation state.
+        host (str): Interface to listen on (local only by default).
+        port (int): Port to listen on (0 for any free port).
+
+    Returns:
+        ThreadingHTTPServer: The server.
+    """
+    handler = type("Handler", (ServiceHandler,), {"service": service})
+    return ThreadingHTTPServer((host, port), handler)
+
+
+def main():
+    """
+    Run the evaluation service.
+
+    Example usage:
+        python -m crop_mle.service --raster /path/to/prediction_raster.tif --port 8765
+        curl -X POST --data @fields.geojson http://127.0.0.1:8765/metrics
+    """
+    parser = argparse.ArgumentParser(
+        description="Serve per-field predictions and metrics for one prediction raster with warm state."
+    )
+    parser.add_argument(
+        "--raster", type=str, required=True, help="Path to the prediction raster"
+    )
+    parser.add_argument(
+        "--label_map",
+        type=str,
+        required=False,
+        help="Optional JSON/YAML file with 'crop_dict' and/or 'crop_numeric' keys to use instead of the built-in crop type dictionary",
+    )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        default="field",
+        choices=["field", "block"],
+        help="Aggregation engine, as in main.py",
+    )
+    parser.add_argument(
+        "--executor",
+        type=str,
+        default="thread",
+        choices=[e for e in EXECUTORS if e != "auto"],
+        help="'field' engine only: where the warm workers run, as in main.py",
+    )
+    parser.add_argument(
+        "--class_band",
+        type=int,
+        default=3,
+        help="1-based index of the raster band holding the predicted crop class",
+    )
+    parser.add_argument(
+        "--conf_band",
+        type=int,
+        default=4,
+        help="1-based index of the raster band holding the prediction confidence",
+    )
+    parser.add_argument(
+        "--prefilter",
+        type=str,
+        default="off",
+        choices=PREFILTER_MODES,
+        help="Preparation stage before aggregation, as in main.py",
+    )
+    parser.add_argument(
+        "--no_cache",
+        action="store_true",
+        help="Do not keep per-field results in memory",
+    )
+    parser.add_argument(
+        "--cache_size",
+        type=int,
+        default=CACHE_SIZE,
+        help="Maximum number of per-field results kept in memory; the least recently used are evicted beyond that",
+    )
+    parser.add_argument(
+        "--host", type=str, default="127.0.0.1", help="Interface to listen on"
+    )
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on")
+    args = parser.parse_args()
+
+    setup_logging()
+    if args.label_map:
+        label_map = CropTypeDictionary.from_file(args.label_map)
+    else:
+        label_map = CropTypeDictionary()
+    service = EvaluationService(
+        args.raster,
+        label_map,
+        engine=args.engine,
+        executor=args.executor,
+        bands=(args.class_band, args.conf_band),
+        prefilter=args.prefilter,
+        cache=not args.no_cache,
+        cache_size=args.cache_size,
+    )
+    server = make_server(service, args.host, args.port)
+    print(f"Serving {args.raster} on http://{args.host}:{server.server_port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        service.close()
+
+
+if __name__ == "__main__":
+    main()
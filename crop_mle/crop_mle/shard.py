@@ -0,0 +1,272 @@
+import argparse
+import glob
+import json
+import logging
+import os
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from crop_mle.evaluate import write_analysis
+from crop_mle.logs import setup_logging
+from crop_mle.metrics import MetricsAccumulator
+from crop_mle.ordering import hilbert_order
+from crop_mle.outputs import OUTPUT_FORMATS, output_path, write_fields
+from crop_mle.select_fields import (
+    add_selection_arguments,
+    select_records,
+    selection_policy,
+)
+
+FIELDS_FILE = "fields.parquet"
+METRICS_FILE = "metrics.npz"
+META_FILE = "shard.json"
+# input position of each field, used to restore the single-run field order when merging
+ROW_COLUMN = "input_row"
+
+
+def parse_shard(spec: str) -> tuple:
+    """
+    Parse a shard specification.
+
+    Args:
+        spec (str): 'i/N' for shard i (0-based) of N.
+
+    Returns:
+        tuple: Shard index (int), number of shards (int)
+    """
+    try:
+        index, count = (int(v) for v in spec.split("/"))
+    except ValueError:
+        raise ValueError(f"Invalid shard '{spec}'. Use 'i/N' with 0 <= i < N.")
+    if not 0 <= index < count:
+        raise ValueError(f"Invalid shard '{spec}'. Use 'i/N' with 0 <= i < N.")
+    return index, count
+
+
+def shard_rows(fields: gpd.GeoDataFrame, index: int, count: int) -> np.ndarray:
+    """
+    Positions of the fields belonging to shard `index` of `count`. Fields are ordered along a Hilbert curve and cut
+        into `count` contiguous ranges of equal size, so each shard covers a compact area of the raster. The partition
+        only depends on the ground truth file, so every shard computes it independently.
+
+    Args:
+        fields (gpd.GeoDataFrame): All ground truth fields.
+        index (int): Shard index (0-based).
+        count (int): Number of shards.
+
+    Returns:
+        np.ndarray: Sorted field positions of the shard.
+    """
+    perm = hilbert_order(fields)
+    bounds = np.arange(count + 1) * len(fields) // count
+    return np.sort(perm[bounds[index] : bounds[index + 1]])
+
+
+def shard_path(shard_dir: str, index: int, count: int) -> str:
+    """Directory of shard `index` of `count` in `shard_dir`."""
+    return os.path.join(shard_dir, f"shard-{index:05d}-of-{count:05d}")
+
+
+def write_shard(
+    shard_dir: str,
+    index: int,
+    count: int,
+    merged_df: gpd.GeoDataFrame,
+    rows: np.ndarray,
+    metrics: MetricsAccumulator,
+    n_fields: int,
+) -> str:
+    """
+    Write a shard's partial results: its merged per-field table as GeoParquet, its metrics accumulator, and a
+        `shard.json` marker that is written last, so only complete shards are merged.
+
+    Args:
+        shard_dir (str): Directory shared by all shards of the run.
+        index (int): Shard index (0-based).
+        count (int): Number of shards.
+        merged_df (gpd.GeoDataFrame): Merged ground truth and predictions of the shard's fields.
+        rows (np.ndarray): Input positions of the shard's fields (see `shard_rows`).
+        metrics (MetricsAccumulator): Accumulated metrics of the shard's fields.
+        n_fields (int): Number of fields in the whole run.
+
+    Returns:
+        str: The shard's directory.
+    """
+    path = shard_path(shard_dir, index, count)
+    os.makedirs(path, exist_ok=True)
+    write_fields(
+        merged_df.assign(**{ROW_COLUMN: rows}),
+        os.path.join(path, FIELDS_FILE),
+        "parquet",
+    )
+    metrics.save(os.path.join(path, METRICS_FILE))
+    with open(os.path.join(path, META_FILE), "w") as f:
+        json.dump(
+            {
+                "index": index,
+                "count": count,
+                "n_fields": n_fields,
+                "n_shard_fields": len(rows),
+            },
+            f,
+            indent=2,
+        )
+    return path
+
+
+def read_shards(shard_dir: str) -> list:
+    """
+    Find the complete shards of a run and check that all of them are present.
+
+    Args:
+        shard_dir (str): Directory shared by all shards of the run.
+
+    Returns:
+        list: Shard directories, in shard order.
+    """
+    metas = []
+    for meta_path in glob.glob(os.path.join(shard_dir, "shard-*", META_FILE)):
+        with open(meta_path) as f:
+            metas.append(json.load(f) | {"path": os.path.dirname(meta_path)})
+    if not metas:
+        raise ValueError(f"No complete shards found in {shard_dir}.")
+    counts = {m["count"] for m in metas}
+    if len(counts) > 1:
+        raise ValueError(f"Shards of runs with different shard counts found: {counts}")
+    count = counts.pop()
+    missing = sorted(set(range(count)) - {m["index"] for m in metas})
+    if missing:
+        raise ValueError(f"Missing shards {missing} of {count} in {shard_dir}.")
+    metas = sorted(metas, key=lambda m: m["index"])
+    if sum(m["n_shard_fields"] for m in metas) != metas[0]["n_fields"]:
+        raise ValueError("Shard field counts do not add up to the run's field count.")
+    return [m["path"] for m in metas]
+
+
+def merge_shards(
+    shard_dir: str,
+    out_dir: str,
+    mode: str = "analysis",
+    output_format: str = "gpkg",
+    columns: list = None,
+    row_group_size: int = None,
+    n_bootstrap: int = 0,
+    select=select_records,
+) -> pd.DataFrame:
+    """
+    Combine the partial results of all shards into the outputs of a single run: the confusion matrix and final
+        results from the merged metrics accumulators in analysis mode, or `selected_fields` from the shards'
+        per-field tables (restored to input order) in select mode.
+
+    Args:
+        shard_dir (str): Directory shared by all shards of the run.
+        out_dir (str): Directory to save the output files.
+        mode (str): 'analysis' or 'select'.
+        output_format (str): File format of the selected fields ('gpkg', 'parquet' or 'feather').
+        columns (list): Attribute columns to write to the selected fields (all columns if None).
+        row_group_size (int): Rows per Parquet row group / Feather record batch.
+        n_bootstrap (int): If positive, add bootstrap confidence intervals to the final results.
+        select (callable): Selection function with the `select_records` signature.
+
+    Returns:
+        pd.DataFrame: The final results table (analysis) or selected fields (select).
+    """
+    paths = read_shards(shard_dir)
+    logging.info(f"Merging {len(paths)} shards from {shard_dir}")
+    if mode == "select":
+        merged_df = (
+            pd.concat([gpd.read_parquet(os.path.join(p, FIELDS_FILE)) for p in paths])
+            .sort_values(ROW_COLUMN)
+            .drop(columns=ROW_COLUMN)
+            .reset_index(drop=True)
+        )
+        selected = select(merged_df, "pred_label", "gt_label", "confidence")
+        write_fields(
+            selected,
+            output_path(out_dir, "selected_fields", output_format),
+            output_format,
+            columns,
+            row_group_size,
+        )
+        return selected
+    elif mode == "analysis":
+        metrics = MetricsAccumulator.load(os.path.join(paths[0], METRICS_FILE))
+        for p in paths[1:]:
+            metrics.merge(MetricsAccumulator.load(os.path.join(p, METRICS_FILE)))
+        return write_analysis(metrics, metrics.labels, out_dir, n_bootstrap=n_bootstrap)
+    else:
+        raise ValueError("Invalid mode. Please select 'select' or 'analysis'.")
+
+
+def main():
+    """
+    Merge the shards of a `main.py --shard i/N` run.
+
+    Example usage:
+        python -m crop_mle.shard --shard_dir results/shards --out_dir results --mode analysis
+    """
+    parser = argparse.ArgumentParser(
+        description="Merge the partial results of a sharded run."
+    )
+    parser.add_argument(
+        "--shard_dir",
+        type=str,
+        required=True,
+        help="Directory the shards were written to (--shard_dir of main.py)",
+    )
+    parser.add_argument(
+        "--out_dir", type=str, required=True, help="Directory to save the outputs"
+    )
+    parser.add_argument(
+        "--mode",
+        type=str,
+        default="analysis",
+        choices=["select", "analysis"],
+        help="Outputs to produce, as in main.py",
+    )
+    parser.add_argument(
+        "--output_format",
+        type=str,
+        default="gpkg",
+        choices=OUTPUT_FORMATS,
+        help="File format of selected_fields",
+    )
+    parser.add_argument(
+        "--columns",
+        type=str,
+        nargs="+",
+        required=False,
+        help="Attribute columns to write to selected_fields",
+    )
+    parser.add_argument(
+        "--row_group_size",
+        type=int,
+        required=False,
+        help="Rows per Parquet row group / Feather record batch",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        default=0,
+        help="'analysis' mode: number of bootstrap resamples for confidence intervals",
+    )
+    add_selection_arguments(parser)
+    args = parser.parse_args()
+
+    setup_logging()
+    os.makedirs(args.out_dir, exist_ok=True)
+    merge_shards(
+        args.shard_dir,
+        args.out_dir,
+        mode=args.mode,
+        output_format=args.output_format,
+        columns=args.columns,
+        row_group_size=args.row_group_size,
+        n_bootstrap=args.bootstrap,
+        select=selection_policy(args),
+    )
+    print(f"Merged shards written to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+import geopandas as gpd
+import pandas as pd
+import logging
+from crop_mle._types import CropTypeDictionary
+from crop_mle.evaluate import schema_check, merge_predictions
+from crop_mle.metrics import MetricsAccumulator
+from crop_mle.outputs import FieldWriter, write_fields
+from crop_mle.pipeline import pipelined_merged_chunks
+from crop_mle.select_fields import select_records
+
+
+def iter_field_chunks(gt_path: str, chunk_size: int = 50_000):
+    """
+    Read a ground truth vector file in row chunks so only `chunk_size` geometries are held in memory at a time.
+
+    Args:
+        gt_path (str): Path to the ground truth vector file.
+        chunk_size (int): Number of fields per chunk.
+
+    Yields:
+        gpd.GeoDataFrame: Chunk of fields, indexed by row position in the file.
+    """
+    start = 0
+    while True:
+        chunk = gpd.read_file(gt_path, rows=slice(start, start + chunk_size))
+        if len(chunk) == 0:
+            break
+        chunk.index = pd.RangeIndex(start, start + len(chunk))
+        yield chunk
+        start += len(chunk)
+        if len(chunk) < chunk_size:
+            break
+
+
+def iter_merged_chunks(
+    gt_path: str,
+    raster_path: str,
+    label_col: str,
+    label_map: CropTypeDictionary,
+    aggregate,
+    chunk_size: int = 50_000,
+    queue_size: int = 0,
+):
+    """
+    Schema check, aggregate and merge the ground truth one chunk at a time.
+
+    Args:
+        gt_path (str): Path to the ground truth vector file.
+        raster_path (str): Path to the prediction raster.
+        label_col (str): Column name for crop type values.
+        label_map (CropTypeDictionary): Dictionary mapping crop types to labels.
+        aggregate (callable): Aggregation function with the `aggregate_predictions(raster_path, fields)` signature.
+        chunk_size (int): Number of fields per chunk.
+        queue_size (int): If positive, overlap reading, aggregation and the caller's processing of consecutive
+            chunks with at most this many chunks queued between stages (see `crop_mle.pipeline`).
+
+    Yields:
+        gpd.GeoDataFrame: Merged chunk with standardized labels, indexed by row position in the file.
+    """
+    if queue_size > 0:
+        yield from pipelined_merged_chunks(
+            iter_field_chunks(gt_path, chunk_size),
+            raster_path,
+            label_col,
+            label_map,
+            aggregate,
+            queue_size,
+        )
+        return
+    for i, chunk in enumerate(iter_field_chunks(gt_path, chunk_size)):
+        logging.info(f"Processing chunk {i} ({len(chunk)} fields)")
+        chunk = schema_check(chunk, label_col, label_map)
+        preds = aggregate(raster_path, chunk)
+        row = chunk.index
+        merged = merge_predictions(chunk.assign(_row=row), preds, label_col, label_map)
+        yield merged.set_index("_row").rename_axis(None)
+
+
+def stream_metrics(
+    gt_path: str,
+    raster_path: str,
+    label_col: str,
+    label_map: CropTypeDictionary,
+    aggregate,
+    chunk_size: int = 50_000,
+    merged_writer: FieldWriter = None,
+    queue_size: int = 0,
+) -> MetricsAccumulator:
+    """
+    Accumulate analysis metrics over the ground truth chunk by chunk. Each chunk's geometries are released
+        before the next chunk is read, so peak memory is bounded by the chunk size.
+
+    Args:
+        gt_path (str): Path to the ground truth vector file.
+        raster_path (str): Path to the prediction raster.
+        label_col (str): Column name for crop type values.
+        label_map (CropTypeDictionary): Dictionary mapping crop types to labels.
+        aggregate (callable): Aggregation function with the `aggregate_predictions(raster_path, fields)` signature.
+        chunk_size (int): Number of fields per chunk.
+        merged_writer (FieldWriter): Optional writer the merged per-field chunks are appended to.
+        queue_size (int): If positive, pipeline reading and aggregation with this many chunks queued between stages.
+
+    Returns:
+        MetricsAccumulator: Metrics over all fields.
+    """
+    metrics = MetricsAccumulator.from_label_map(label_map)
+    for merged in iter_merged_chunks(
+        gt_path, raster_path, label_col, label_map, aggregate, chunk_size, queue_size
+    ):
+        if merged_writer is not None:
+            merged_writer.write(merged)
+        metrics.update_frame(merged, "gt_label", "pred_label", "confidence", label_map)
+    return metrics
+
+
+def stream_select(
+    gt_path: str,
+    raster_path: str,
+    label_col: str,
+    label_map: CropTypeDictionary,
+    aggregate,
+    output_path: str,
+    chunk_size: int = 50_000,
+    output_format: str = "gpkg",
+    columns: list = None,
+    row_group_size: int = None,
+    merged_writer: FieldWriter = None,
+    queue_size: int = 0,
+    select=select_records,
+) -> int:
+    """
+    Chunked version of the select workflow. The first pass aggregates each chunk and keeps only its attribute
+        columns (no geometry), so per-label confidence cutoffs can be computed over all fields. The second pass
+        re-reads the geometries chunk by chunk and appends the selected fields to `output_path`.
+
+    Args:
+        gt_path (str): Path to the ground truth vector file.
+        raster_path (str): Path to the prediction raster.
+        label_col (str): Column name for crop type values.
+        label_map (CropTypeDictionary): Dictionary mapping crop types to labels.
+        aggregate (callable): Aggregation function with the `aggregate_predictions(raster_path, fields)` signature.
+        output_path (str): Path of the file to write the selected fields to.
+        chunk_size (int): Number of fields per chunk.
+        output_format (str): 'gpkg', 'parquet' or 'feather'.
+        columns (list): Attribute columns to write (all columns if None).
+        row_group_size (int): Rows per Parquet row group / Feather record batch.
+        merged_writer (FieldWriter): Optional writer the merged per-field chunks are appended to.
+        queue_size (int): If positive, pipeline reading and aggregation with this many chunks queued between stages.
+        select (callable): Selection function with the `select_records(input_gdf, pred_column, gt_column,
+            confidence_column)` signature, e.g. with a percentile, budget or quotas bound.
+
+    Returns:
+        int: Number of selected fields.
+    """
+    attributes = []
+    for merged in iter_merged_chunks(
+        gt_path, raster_path, label_col, label_map, aggregate, chunk_size, queue_size
+    ):
+        if merged_writer is not None:
+            merged_writer.write(merged)
+        attributes.append(pd.DataFrame(merged.drop(columns=merged.geometry.name)))
+    if attributes:
+        selected = select(pd.concat(attributes), "pred_label", "gt_label", "confidence")
+    else:
+        # empty ground truth
+        selected = pd.DataFrame()
+
+    # empty frame with the output schema, written if no field is selected
+    empty = gpd.read_file(gt_path, rows=slice(0, 0))
+    with FieldWriter(output_path, output_format, columns, row_group_size) as writer:
+        for chunk in iter_field_chunks(gt_path, chunk_size):
+            extra = selected.columns.difference(chunk.columns, sort=False)
+            empty = chunk.iloc[:0].join(selected.iloc[:0][extra])
+            rows = chunk.index.intersection(selected.index)
+            if len(rows) == 0:
+                continue
+            writer.write(chunk.loc[rows].join(selected.loc[rows, extra]))
+    if writer.n_written == 0:
+        write_fields(empty, output_path, output_format, columns, row_group_size)
+    return writer.n_written
@@ -0,0 +1,205 @@
+import numpy as np
+import geopandas as gpd
+import rasterio as rio
+from rasterio.transform import from_origin
+from rasterio.windows import Window
+import shapely
+from crop_mle._types import CropTypeDictionary
+
+BAND_DESCRIPTIONS = (
+    "number_of_cycles",
+    "number_of_cycles_confidence",
+    "crop_type_1",
+    "crop_type_1_confidence",
+)
+
+
+def patch_classes(
+    rows: np.ndarray, cols: np.ndarray, n_classes: int, patch_size: int, seed: int
+) -> np.ndarray:
+    """
+    Crop class of the synthetic raster at the given pixel rows/columns. Pixels are grouped into square patches of
+        `patch_size` pixels that share a pseudo-random class, so fields generated over the same grid can be labelled
+        without reading the raster.
+
+    Args:
+        rows (np.ndarray): Pixel row indices.
+        cols (np.ndarray): Pixel column indices.
+        n_classes (int): Number of crop classes.
+        patch_size (int): Patch height/width in pixels.
+        seed (int): Random seed of the raster.
+
+    Returns:
+        np.ndarray: Class per pixel.
+    """
+    pr = np.asarray(rows, dtype=np.int64) // patch_size
+    pc = np.asarray(cols, dtype=np.int64) // patch_size
+    h = (pr * 73856093) ^ (pc * 19349663) ^ ((seed + 1) * 83492791)
+    return (h % n_classes).astype(np.int16)
+
+
+def synthetic_raster(
+    path: str,
+    width: int = 4096,
+    height: int = 4096,
+    tile_size: int = 512,
+    n_classes: int = 32,
+    patch_size: int = 32,
+    pixel_size: float = 10.0,
+    crs: str = "EPSG:32631",
+    seed: int = 0,
+    compress: str = None,
+) -> str:
+    """
+    Write a synthetic 4-band prediction raster with the band layout `aggregate_predictions` reads: band 3 holds the
+        crop class (patches of `patch_size` pixels, see `patch_classes`, with ~10% of pixels flipped to a random class)
+        and band 4 the confidence (0-100). Bands 1-2 are filler. The raster is written one tile at a time.
+
+    Args:
+        path (str): Output GeoTIFF path.
+        width (int): Raster width in pixels.
+        height (int): Raster height in pixels.
+        tile_size (int): Internal tile size in pixels (0 for a striped, untiled raster).
+        n_classes (int): Number of crop classes.
+        patch_size (int): Height/width in pixels of the patches sharing a class.
+        pixel_size (float): Pixel size in CRS units.
+        crs (str): Raster CRS.
+        seed (int): Random seed.
+        compress (str): GeoTIFF compression (e.g. 'deflate', 'lzw', 'zstd'); None writes an uncompressed raster.
+
+    Returns:
+        str: `path`.
+    """
+    profile = {
+        "driver": "GTiff",
+        "dtype": "int16",
+        "width": width,
+        "height": height,
+        "count": len(BAND_DESCRIPTIONS),
+        "crs": crs,
+        "transform": from_origin(500_000.0, 5_500_000.0, pixel_size, pixel_size),
+    }
+    if tile_size:
+        profile.update(tiled=True, blockxsize=tile_size, blockysize=tile_size)
+    if compress:
+        profile["compress"] = compress
+    step = tile_size or 256
+    rng = np.random.default_rng(seed)
+    with rio.open(path, "w", **profile) as dst:
+        dst.descriptions = BAND_DESCRIPTIONS
+        dst.update_tags(synthetic_seed=seed, n_classes=n_classes, patch_size=patch_size)
+        for row_off in range(0, height, step):
+            for col_off in range(0, width, step):
+                window = Window(
+                    col_off,
+                    row_off,
+                    min(step, width - col_off),
+                    min(step, height - row_off),
+                )
+                rows, cols = np.mgrid[
+                    row_off : row_off + window.height, col_off : col_off + window.width
+                ]
+                classes = patch_classes(rows, cols, n_classes, patch_size, seed)
+                noise = rng.random(classes.shape) < 0.1
+                classes[noise] = rng.integers(0, n_classes, int(noise.sum()))
+                data = np.stack(
+                    [
+                        np.ones_like(classes),
+                        rng.integers(0, 100, classes.shape, dtype=np.int16),
+                        classes,
+                        rng.integers(0, 101, classes.shape, dtype=np.int16),
+                    ]
+                )
+                dst.write(data, window=window)
+    return path
+
+
+def synthetic_fields(
+    raster_path: str,
+    n_fields: int,
+    label_map: CropTypeDictionary = None,
+    min_size: int = 4,
+    max_size: int = 40,
+    agreement: float = 0.7,
+    seed: int = 0,
+) -> gpd.GeoDataFrame:
+    """
+    Random non-overlapping quadrilateral fields inside the extent of a `synthetic_raster`, with the ground truth
+        schema of the real data (field_id, area_m2, normalized_label, year, geometry). Fields are laid out on a
+        jittered grid: each field takes a random cell of a grid with at least `n_fields` cells and stays inside it,
+        so, as with real parcels, fields do not overlap. Field sizes are capped by the cell size when many fields
+        share the raster. About `agreement` of the fields are labelled with the raster class at their centre, the
+        rest with a random crop type.
+
+    Args:
+        raster_path (str): Path to a raster written by `synthetic_raster`.
+        n_fields (int): Number of fields.
+        label_map (CropTypeDictionary): Dictionary mapping crop types to labels (default dictionary if None).
+        min_size (int): Minimum field width/height in pixels.
+        max_size (int): Maximum field width/height in pixels.
+        agreement (float): Fraction of fields labelled with the raster class at their centre.
+        seed (int): Random seed.
+
+    Returns:
+        gpd.GeoDataFrame: Synthetic ground truth fields.
+    """
+    if label_map is None:
+        label_map = CropTypeDictionary()
+    rng = np.random.default_rng(seed)
+    with rio.open(raster_path) as src:
+        transform, crs = src.transform, src.crs
+        width, height = src.width, src.height
+        tags = src.tags()
+
+    # grid cells no larger than the largest field (with corner jitter) and at least `n_fields` of them
+    cell_size = min(max_size * 1.3, np.sqrt(width * height / n_fields))
+    n_cols, n_rows = int(np.ceil(width / cell_size)), int(np.ceil(height / cell_size))
+    cell = np.array([width / n_cols, height / n_rows])
+    cells = rng.choice(n_cols * n_rows, n_fields, replace=False)
+    origin = np.stack([cells % n_cols, cells // n_cols], axis=1) * cell
+
+    # field size and centre in pixel coordinates, corners jittered to make irregular quadrilaterals;
+    # corners move by up to 15% of the size, so a field spans at most 1.3 times its size around its centre
+    size = np.minimum(rng.uniform(min_size, max_size, (n_fields, 2)), cell / 1.3)
+    margin = size * 0.65
+    centre = origin + rng.uniform(margin, cell - margin)
+    corners = np.array([[-0.5, -0.5], [0.5, -0.5], [0.5, 0.5], [-0.5, 0.5]])
+    coords = centre[:, None, :] + corners[None] * size[:, None, :]
+    coords += rng.uniform(-0.15, 0.15, coords.shape) * size[:, None, :]
+    xs, ys = transform * (coords[..., 0], coords[..., 1])
+    ring = np.stack([xs, ys], axis=-1)
+    geoms = shapely.polygons(np.concatenate([ring, ring[:, :1]], axis=1))
+
+    # ground truth labels: raw aliases of the raster class at the field centre, or of a random class
+    n_classes = int(tags["n_classes"])
+    classes = patch_classes(
+        centre[:, 1].astype(np.int64),
+        centre[:, 0].astype(np.int64),
+        n_classes,
+        int(tags["patch_size"]),
+        int(tags["synthetic_seed"]),
+    )
+    disagree = rng.random(n_fields) >= agreement
+    classes[disagree] = rng.integers(0, n_classes, int(disagree.sum()))
+    # classes without a crop type in the label map get a label that fails the schema check
+    aliases = np.array(
+        [
+            label_map.crop_dict[name][0] if name is not None else "unknown"
+            for name in label_map.name_lookup
+        ]
+        + ["unknown"] * max(0, n_classes - len(label_map.name_lookup)),
+        dtype=object,
+    )
+
+    return gpd.GeoDataFrame(
+        {
+            "field_id": np.char.add("field_", np.arange(n_fields).astype(str)).astype(
+                object
+            ),
+            "area_m2": shapely.area(geoms),
+            "normalized_label": aliases[classes],
+            "year": np.full(n_fields, 2022, dtype=np.int64),
+        },
+        geometry=geoms,
+        crs=crs,
+    )
@@ -0,0 +1,291 @@
+from dataclasses import dataclass
+import numpy as np
+import rasterio as rio
+from rasterio.enums import MaskFlags
+from rasterio.features import rasterize
+from rasterio.windows import Window
+import geopandas as gpd
+import shapely
+from shapely import STRtree
+import logging
+
+from crop_mle.histograms import FieldHistograms, CONF_EDGES, confidence_bins
+from crop_mle.process import predictions_frame
+
+
+def field_layers(geoms: np.ndarray) -> np.ndarray:
+    """
+    Assign each field geometry to a rasterization layer so that no two fields whose interiors overlap share a layer.
+        A label grid can only hold one field per pixel, so overlapping fields are burned in separate passes.
+
+    Args:
+        geoms (np.ndarray): Array of shapely geometries.
+
+    Returns:
+        np.ndarray: Layer index (0-based) for each geometry.
+    """
+    n = len(geoms)
+    layers = np.zeros(n, dtype=np.int64)
+    tree = STRtree(geoms)
+    intersects = tree.query(geoms, predicate="intersects")
+    touches = tree.query(geoms, predicate="touches")
+
+    # pairs whose interiors overlap: intersecting but not merely touching, each pair counted once
+    pair_keys = np.setdiff1d(
+        intersects[0] * n + intersects[1], touches[0] * n + touches[1]
+    )
+    left, right = pair_keys // n, pair_keys % n
+    keep = left < right
+    left, right = left[keep], right[keep]
+    if left.size == 0:
+        return layers
+
+    # greedy colouring over the (usually tiny) set of overlapping fields only
+    neighbours = {}
+    for i, j in zip(left.tolist(), right.tolist()):
+        neighbours.setdefault(j, []).append(i)
+    for j in sorted(neighbours):
+        used = {layers[i] for i in neighbours[j]}
+        layer = 0
+        while layer in used:
+            layer += 1
+        layers[j] = layer
+    return layers
+
+
+def block_windows(src: rio.DatasetReader, window_size: int = 1024):
+    """
+    Yield windows aligned to the raster's internal block grid, coalescing small blocks (e.g. single-row strips)
+        into windows of at least `window_size` pixels per side.
+
+    Args:
+        src (rio.DatasetReader): Open raster dataset.
+        window_size (int): Minimum window height/width in pixels.
+
+    Yields:
+        Window: Block-aligned raster window.
+    """
+    block_h, block_w = src.block_shapes[0]
+    step_h = block_h * max(1, window_size // block_h)
+    step_w = block_w * max(1, window_size // block_w)
+    for row_off in range(0, src.height, step_h):
+        for col_off in range(0, src.width, step_w):
+            yield Window(
+                col_off,
+                row_off,
+                min(step_w, src.width - col_off),
+                min(step_h, src.height - row_off),
+            )
+
+
+def raster_grid(raster) -> dict:
+    """
+    Describe the pixel grid of a raster (CRS, transform and shape), e.g. to check that two rasters can share
+        rasterized field geometry or block digests.
+
+    Args:
+        raster (str | rio.DatasetReader): Path to, or open dataset of, the raster.
+
+    Returns:
+        dict: JSON-serializable grid description.
+    """
+    if isinstance(raster, str):
+        with rio.open(raster) as src:
+            return raster_grid(src)
+    return {
+        "crs": raster.crs.to_wkt() if raster.crs else None,
+        "transform": list(raster.transform)[:6],
+        "width": raster.width,
+        "height": raster.height,
+    }
+
+
+def _iter_field_pixels(src: rio.DatasetReader, geoms: np.ndarray, window_size: int):
+    """
+    Rasterize field geometries window by window.
+
+    Args:
+        src (rio.DatasetReader): Open raster dataset defining the pixel grid.
+        geoms (np.ndarray): Array of shapely geometries.
+        window_size (int): Minimum window height/width in pixels.
+
+    Yields:
+        tuple: Window and a list of (field indexes, flat pixel positions, local field position per pixel), one per layer.
+    """
+    layers = field_layers(geoms)
+    tree = STRtree(geoms)
+    for window in block_windows(src, window_size):
+        candidates = tree.query(shapely.box(*src.window_bounds(window)))
+        if candidates.size == 0:
+            continue
+        transform = src.window_transform(window)
+        parts = []
+        for layer in np.unique(layers[candidates]):
+            idx = np.sort(candidates[layers[candidates] == layer])
+            # burn local (1-based) positions so the label grid indexes straight into `idx`
+            labels = rasterize(
+                zip(geoms[idx], range(1, idx.size + 1)),
+                out_shape=(window.height, window.width),
+                transform=transform,
+                fill=0,
+                dtype="int32",
+            ).ravel()
+            pixels = np.flatnonzero(labels).astype(np.int32)
+            if pixels.size:
+                parts.append((idx, pixels, labels[pixels] - 1))
+        if parts:
+            yield window, parts
+
+
+@dataclass
+class FieldRaster:
+    """
+    Field geometries rasterized once against a pixel grid, stored as flat pixel positions per raster window,
+        so several rasters on the same grid (e.g. model checkpoints) can be aggregated without re-rasterizing.
+    """
+
+    grid: dict
+    n_fields: int
+    window_size: int
+    blocks: list
+
+
+def rasterize_fields(
+    raster_path: str, fields: gpd.GeoDataFrame, window_size: int = 1024
+) -> FieldRaster:
+    """
+    Rasterize the fields against the pixel grid of `raster_path`.
+
+    Args:
+        raster_path (str): Path to a raster on the target grid.
+        fields (gpd.GeoDataFrame): GeoDataFrame containing field geometries.
+        window_size (int): Minimum window height/width in pixels used when coalescing raster blocks.
+
+    Returns:
+        FieldRaster: Rasterized fields.
+    """
+    with rio.open(raster_path) as src:
+        blocks = list(
+            _iter_field_pixels(src, np.asarray(fields.geometry.values), window_size)
+        )
+        return FieldRaster(raster_grid(src), len(fields), window_size, blocks)
+
+
+def zonal_aggregate(
+    raster_path: str,
+    fields: gpd.GeoDataFrame,
+    window_size: int = 1024,
+    field_raster: FieldRaster = None,
+    bands: tuple = (3, 4),
+    histogram_path: str = None,
+    overview_level: int = None,
+) -> gpd.GeoDataFrame:
+    """
+    Block-based alternative to `aggregate_predictions`. Field IDs are rasterized into a label grid one raster block at a time,
+        and per-field class counts, pixel counts and confidence sums are accumulated with `np.bincount` over
+        (field_index, class) pairs, so each pixel is read exactly once regardless of the number of fields.
+
+    Args:
+        raster_path (str): Path to the prediction raster.
+        fields (gpd.GeoDataFrame): GeoDataFrame containing field geometries.
+        window_size (int): Minimum window height/width in pixels used when coalescing raster blocks.
+        field_raster (FieldRaster): Optional output of `rasterize_fields` for these fields on the same grid,
+            to skip rasterization.
+        bands (tuple): 1-based (class, confidence) band indexes of the raster. Pixels masked by the dataset
+            (nodata or mask band) are left out, as in `aggregate_predictions`.
+        histogram_path (str): If given, also accumulate per-field confidence histograms and save them with the
+            class counts to this `.npz` path (see `crop_mle.histograms`).
+        overview_level (int): If given, read this (0-based) overview level of the raster instead of the full
+            resolution; fields smaller than an overview pixel may get no prediction.
+
+    Returns:
+        gpd.GeoDataFrame: GeoDataFrame containing field_id, predicted class, and confidence (same layout as `aggregate_predictions`).
+    """
+    n_fields = len(fields)
+    n_classes = 1
+    class_counts = np.zeros((n_fields, n_classes), dtype=np.int64)
+    pixel_count = np.zeros(n_fields, dtype=np.int64)
+    conf_sum = np.zeros(n_fields, dtype=np.float64)
+    conf_count = np.zeros(n_fields, dtype=np.int64)
+    n_bins = len(CONF_EDGES) - 1
+    conf_hist = np.zeros((n_fields, n_bins) if histogram_path else (0, 0), np.int64)
+    failed = np.zeros(n_fields, dtype=bool)
+
+    open_options = {} if overview_level is None else {"overview_level": overview_level}
+    with rio.open(raster_path, **open_options) as src:
+        # only build read masks when the dataset can have invalid pixels
+        masked = not all(
+            MaskFlags.all_valid in src.mask_flag_enums[b - 1] for b in bands
+        )
+        if field_raster is None:
+            blocks = _iter_field_pixels(
+                src, np.asarray(fields.geometry.values), window_size
+            )
+        elif field_raster.grid != raster_grid(src) or field_raster.n_fields != n_fields:
+            raise ValueError(
+                "field_raster was built for a different raster grid or set of fields."
+            )
+        else:
+            blocks = field_raster.blocks
+
+        for window, parts in blocks:
+            croptype, conf = src.read(list(bands), window=window, masked=masked)
+            croptype, conf = croptype.ravel(), conf.ravel()
+            class_valid = ~np.ma.getmaskarray(croptype)
+            conf_valid = ~np.ma.getmaskarray(conf)
+            croptype, conf = np.ma.getdata(croptype), np.ma.getdata(conf)
+
+            for idx, pixels, local in parts:
+                local = local.astype(np.int64)
+                conf_local = local
+                conf_pixels = pixels
+                if masked:
+                    conf_local = local[conf_valid[pixels]]
+                    conf_pixels = pixels[conf_valid[pixels]]
+                    keep = class_valid[pixels]
+                    pixels, local = pixels[keep], local[keep]
+                    if pixels.size == 0:
+                        continue
+                classes = croptype[pixels].astype(np.int64)
+
+                # negative classes make np.bincount fail in process_field, so those fields get no prediction
+                negative = classes < 0
+                if negative.any():
+                    failed[idx[np.unique(local[negative])]] = True
+                    classes = np.where(negative, 0, classes)
+
+                if classes.max() >= n_classes:
+                    grow = int(classes.max()) + 1 - n_classes
+                    class_counts = np.pad(class_counts, ((0, 0), (0, grow)))
+                    n_classes += grow
+
+                local_counts = np.bincount(
+                    local * n_classes + classes, minlength=idx.size * n_classes
+                ).reshape(idx.size, n_classes)
+                class_counts[idx] += local_counts
+                pixel_count[idx] += np.bincount(local, minlength=idx.size)
+                conf_sum[idx] += np.bincount(
+                    conf_local, weights=conf[conf_pixels], minlength=idx.size
+                )
+                conf_count[idx] += np.bincount(conf_local, minlength=idx.size)
+                if histogram_path:
+                    bins = confidence_bins(conf[conf_pixels])
+                    conf_hist[idx] += np.bincount(
+                        conf_local * n_bins + bins, minlength=idx.size * n_bins
+                    ).reshape(idx.size, n_bins)
+
+    missing = (pixel_count == 0) | failed
+    if missing.any():
+        logging.info(
+            f"No pixels in {int(missing.sum())} fields: {fields['field_id'].values[missing]}"
+        )
+    if histogram_path:
+        FieldHistograms.from_dense(
+            fields["field_id"].values, class_counts, conf_hist, conf_sum, failed
+        ).save(histogram_path)
+    majority_class = class_counts.argmax(axis=1)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        avg_conf = conf_sum / conf_count
+    return predictions_frame(
+        fields["field_id"].values, majority_class, avg_conf, missing
+    )
@@ -1,34 +1,38 @@
-from crop_mle.process import aggregate_predictions
+from crop_mle.process import (
+    EXECUTORS,
+    aggregate_predictions,
+    field_batches,
+    worker_pool,
+)
+from crop_mle.zonal import zonal_aggregate
+from crop_mle.cache import cached_aggregate, CACHE_MODES
+from crop_mle.prepare import prefiltered_aggregate, PREFILTER_MODES
+from crop_mle.quicklook import quicklook
+from crop_mle.pixel import pixel_metrics, stream_pixel_metrics
+from crop_mle.incremental import incremental_aggregate, save_state
+from crop_mle.bandstore import ensure_band_store
+from crop_mle.histograms import FieldHistograms
+from crop_mle.batch import evaluate_rasters, read_manifest, raster_names
 from crop_mle.evaluate import (
     schema_check,
-    standardize_labels,
-    record_count,
-    agreement,
-    average_confidence,
-    cm_f1,
-    plot_confusion_matrix,
+    merge_predictions,
+    write_analysis,
 )
-from crop_mle.select_fields import select_records
-from dataclasses import asdict
+from crop_mle.metrics import MetricsAccumulator
+from crop_mle.instrument import StageTimer
+from crop_mle.outputs import OUTPUT_FORMATS, FieldWriter, output_path, write_fields
+from crop_mle.select_fields import add_selection_arguments, selection_policy
+from crop_mle.shard import parse_shard, shard_rows, write_shard
+from crop_mle.stream import stream_metrics, stream_select
 from crop_mle._types import CropTypeDictionary
+from crop_mle.logs import setup_logging
 import pandas as pd
 import geopandas as gpd
+from functools import partial
 import time
 import logging, os
-from datetime import datetime
 import argparse
-
-# Set up logging
-log_dir = os.path.abspath(os.path.join(os.path.dirname(__file__), ".log"))
-os.makedirs(log_dir, exist_ok=True)
-log_filename = datetime.now().strftime("logfile_%Y%m%d_%H%M%S.log")
-log_filepath = os.path.join(log_dir, log_filename)
-
-logging.basicConfig(
-    filename=log_filepath,
-    level=logging.INFO,
-    format="%(asctime)s - %(levelname)s - %(message)s",
-)
+import cProfile
 
 
 def main():
@@ -48,11 +52,17 @@ def main():
     parser.add_argument(
         "--gt", type=str, required=True, help="Path to the ground truth vector file"
     )
-    parser.add_argument(
+    raster_group = parser.add_mutually_exclusive_group(required=True)
+    raster_group.add_argument(
         "--raster",
         type=str,
-        required=True,
-        help="Path to the prediction raster data file",
+        nargs="+",
+        help="Path to the prediction raster data file (several paths evaluate each raster against the same ground truth)",
+    )
+    raster_group.add_argument(
+        "--manifest",
+        type=str,
+        help="CSV with a 'raster' column and optional 'name' column listing prediction rasters to evaluate against the same ground truth",
     )
     parser.add_argument(
         "--label_field",
@@ -60,96 +70,634 @@ def main():
         default="normalized_label",
         help="Field name in the ground truth data containing crop type labels",
     )
+    parser.add_argument(
+        "--label_map",
+        type=str,
+        required=False,
+        help="Optional JSON/YAML file with 'crop_dict' and/or 'crop_numeric' keys to use instead of the built-in crop type dictionary",
+    )
     parser.add_argument(
         "--mode",
         type=str,
         default="analysis",
-        choices=["select", "analysis"],
-        help="choose 'select' for selecting underperforming fields or 'analysis' for evaluating model performance",
+        choices=["select", "analysis", "pixel"],
+        help="choose 'select' for selecting underperforming fields, 'analysis' for evaluating model performance, or 'pixel' for evaluating every pixel inside the fields instead of one majority vote per field",
+    )
+    parser.add_argument(
+        "--class_band",
+        type=int,
+        default=3,
+        help="1-based index of the raster band holding the predicted crop class",
+    )
+    parser.add_argument(
+        "--conf_band",
+        type=int,
+        default=4,
+        help="1-based index of the raster band holding the prediction confidence",
+    )
+    parser.add_argument(
+        "--engine",
+        type=str,
+        default="field",
+        choices=["field", "block"],
+        help="choose 'field' to mask the raster once per field or 'block' to aggregate all fields in a single pass over the raster blocks",
     )
+    parser.add_argument(
+        "--worker_mode",
+        type=str,
+        default="batch",
+        choices=["batch", "field"],
+        help="'field' engine only: choose 'batch' to send chunks of field geometries to workers that keep the raster open, or 'field' to send one field per task",
+    )
+    parser.add_argument(
+        "--executor",
+        type=str,
+        default="process",
+        choices=EXECUTORS,
+        help="'field' engine only: run workers as 'process'es, as 'thread's of one process with a dataset handle each (less memory, no serialization), 'serial'ly in the main thread, or 'auto' to choose from a quick calibration ('batch' workers only)",
+    )
+    parser.add_argument(
+        "--order",
+        type=str,
+        default="hilbert",
+        choices=["hilbert", "morton", "tile", "none"],
+        help="'field' engine only: spatial order in which fields are scheduled on the workers ('none' keeps the input file order)",
+    )
+    parser.add_argument(
+        "--band_store",
+        type=str,
+        required=False,
+        help="'field' engine, 'batch' workers only: directory of an uncompressed memory-mapped copy of the class/confidence bands, built from the raster on first use and rebuilt when the raster changes",
+    )
+    parser.add_argument(
+        "--quicklook",
+        type=int,
+        required=False,
+        help="'analysis' mode: quick approximate run that aggregates only a stratified sample of this many fields per ground truth class and writes estimated final results with bootstrap error bars (--bootstrap resamples, default 200)",
+    )
+    parser.add_argument(
+        "--overview_level",
+        type=int,
+        required=False,
+        help="With --quicklook: read predictions from this (0-based) overview level of the raster instead of the full resolution",
+    )
+    parser.add_argument(
+        "--histograms",
+        action="store_true",
+        help="Keep sparse per-field class and confidence histograms from the raster pass in field_histograms.npz, and write statistics derived from them (runner-up class, purity, entropy, confidence quantiles) to field_statistics.csv",
+    )
+    parser.add_argument(
+        "--chunk_size",
+        type=int,
+        required=False,
+        help="Stream the ground truth file in chunks of this many fields to bound peak memory (default: load all fields at once)",
+    )
+    parser.add_argument(
+        "--pipeline",
+        type=int,
+        default=0,
+        help="With --chunk_size: overlap reading, aggregation and metric/selection accumulation of consecutive chunks, with at most this many chunks queued between stages; 'field' engine 'batch' workers are kept alive across chunks (0: process chunks one after another)",
+    )
+    parser.add_argument(
+        "--prefilter",
+        type=str,
+        default="off",
+        choices=PREFILTER_MODES,
+        help="reproject the fields to the raster CRS and skip fields outside the raster footprint and slivers without pixel centers before aggregation: 'drop' leaves slivers without a prediction, 'centroid' samples the pixel under a point on their surface, 'off' aggregates every field",
+    )
+    parser.add_argument(
+        "--cache",
+        type=str,
+        default="off",
+        choices=CACHE_MODES,
+        help="per-field aggregation cache: 'reuse' cached results for unchanged raster/geometries, 'refresh' to recompute and overwrite them, or 'off' to bypass the cache",
+    )
+    parser.add_argument(
+        "--cache_dir",
+        type=str,
+        default=os.path.join(os.path.dirname(__file__), ".cache"),
+        help="Directory for the per-field aggregation cache",
+    )
+    parser.add_argument(
+        "--previous_state",
+        type=str,
+        required=False,
+        help="'state' directory of a previous run: only fields that are new, changed, or overlap changed raster blocks are re-aggregated",
+    )
+    parser.add_argument(
+        "--save_state",
+        action="store_true",
+        help="Write per-field results and raster block digests to <out_dir>/state for a later --previous_state run (implied by --previous_state)",
+    )
+    parser.add_argument(
+        "--shard",
+        type=str,
+        required=False,
+        help="'i/N': process only shard i (0-based) of N spatially compact, equally sized partitions of the fields and write its partial results to --shard_dir; combine all shards with `python -m crop_mle.shard`",
+    )
+    parser.add_argument(
+        "--shard_dir",
+        type=str,
+        required=False,
+        help="Directory shared by all shards of a run (defaults to <out_dir>/shards)",
+    )
+    parser.add_argument(
+        "--output_format",
+        type=str,
+        default="gpkg",
+        choices=OUTPUT_FORMATS,
+        help="file format of per-field outputs (selected/merged fields): 'gpkg', 'parquet' (GeoParquet) or 'feather' (Arrow IPC)",
+    )
+    parser.add_argument(
+        "--columns",
+        type=str,
+        nargs="+",
+        required=False,
+        help="Attribute columns to write to per-field outputs (default: all columns; geometry is always written)",
+    )
+    parser.add_argument(
+        "--row_group_size",
+        type=int,
+        required=False,
+        help="Rows per Parquet row group / Feather record batch in per-field outputs",
+    )
+    parser.add_argument(
+        "--save_merged",
+        action="store_true",
+        help="Also write the merged per-field table (ground truth, prediction and confidence) to merged_fields.<output_format>",
+    )
+    parser.add_argument(
+        "--bootstrap",
+        type=int,
+        required=False,
+        help="'analysis' mode: number of bootstrap resamples for 95%% confidence intervals on per-class F1 and percent agreement in final_results.csv (default: 0, or 200 with --quicklook; 0 to skip)",
+    )
+    add_selection_arguments(parser)
     parser.add_argument(
         "--out_dir",
         type=str,
         help="Directory to save the output files",
         required=False,
     )
+    parser.add_argument(
+        "--instrument",
+        action="store_true",
+        help="Record wall/CPU time per stage, per-field latency and worker utilization ('field' engine) and write instrumentation.json/.csv reports to out_dir",
+    )
+    parser.add_argument(
+        "--profile",
+        action="store_true",
+        help="Write a cProfile dump of the main process to <out_dir>/profile.prof (inspect with `python -m pstats`)",
+    )
     args = parser.parse_args()
 
+    # Set up logging
+    log_filepath = setup_logging(os.path.join(os.path.dirname(__file__), ".log"))
+    print(f"Starting {args.mode} Process...check progress at {log_filepath}")
+    if not args.out_dir:
+        # we'll store results in a repo-level directory
+        args.out_dir = os.path.join(os.path.dirname(__file__), "..", "results")
+        os.makedirs(args.out_dir, exist_ok=True)
+
+    timer = StageTimer(enabled=args.instrument)
+    if args.profile:
+        profiler = cProfile.Profile()
+        profiler.runcall(run, args, parser, timer)
+        profiler.dump_stats(os.path.join(args.out_dir, "profile.prof"))
+    else:
+        run(args, parser, timer)
+    timer.write(args.out_dir)
+    logging.info("Done")
+
+
+def build_aggregate(
+    args: argparse.Namespace,
+    bands: tuple,
+    band_store: str = None,
+    histogram_path: str = None,
+    profile=None,
+    pool=None,
+    batches=None,
+):
+    """
+    Aggregation function with the engine, bands and scheduling options of the command line arguments, wrapped by the
+        prefilter and the per-field cache if enabled.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+        bands (tuple): 1-based (class, confidence) band indexes of the raster.
+        band_store (str): Optional band store directory for 'field' engine 'batch' workers.
+        histogram_path (str): Optional path to save per-field histograms to.
+        profile (FieldProfile): Optional 'field' engine per-field profile.
+        pool (mp.pool.Pool): Optional 'batch' worker pool from `worker_pool`, reused across calls.
+        batches (tuple): Optional 'batch' mode (permutation, batches) from `field_batches`, reused across rasters.
+
+    Returns:
+        callable: Aggregation function with the `aggregate_predictions(raster_path, fields)` signature.
+    """
+    if args.engine == "block":
+        aggregate = partial(
+            zonal_aggregate,
+            bands=bands,
+            histogram_path=histogram_path,
+            overview_level=args.overview_level,
+        )
+    else:
+        aggregate = partial(
+            aggregate_predictions,
+            worker_mode=args.worker_mode,
+            order=args.order,
+            profile=profile,
+            band_store=band_store,
+            bands=bands,
+            histogram_path=histogram_path,
+            pool=pool,
+            batches=batches,
+            executor=args.executor,
+            overview_level=args.overview_level,
+        )
+
+    if args.cache != "off":
+        # serve unchanged fields from the on-disk per-field cache; it sits inside the
+        # prefilter so cached rows are always full aggregations, whatever --prefilter is
+        aggregate = partial(
+            cached_aggregate,
+            aggregate=aggregate,
+            cache_dir=args.cache_dir,
+            mode=args.cache,
+            bands=bands,
+        )
+
+    if args.prefilter != "off":
+        # align CRS and settle non-overlapping fields and slivers in bulk before the per-field aggregation
+        aggregate = partial(
+            prefiltered_aggregate,
+            aggregate=aggregate,
+            mode=args.prefilter,
+            bands=bands,
+        )
+    return aggregate
+
+
+def run(args: argparse.Namespace, parser: argparse.ArgumentParser, timer: StageTimer):
+    """
+    Run the select or analysis workflow configured by the command line arguments.
+
+    Args:
+        args (argparse.Namespace): Parsed command line arguments.
+        parser (argparse.ArgumentParser): Argument parser, used to report incompatible options.
+        timer (StageTimer): Stage timer (disabled unless --instrument is given).
+    """
     # load data, data dictionary, and conduct schema check on fields
     gt_path = args.gt
-    raster_path = args.raster
     label_field = args.label_field
     mode = args.mode
+    engine = args.engine
+    worker_mode = args.worker_mode
+    order = args.order
     out_dir = args.out_dir
-
-    print(f"Starting {args.mode} Process...check progress at {log_filepath}")
-    if not args.out_dir:
-        # we'll store results in a repo-level directory
-        out_dir = os.path.join(os.path.dirname(__file__), "..", "results")
-        os.makedirs(out_dir, exist_ok=True)
+    if args.bootstrap is None:
+        # quick looks come with error bars unless explicitly turned off
+        args.bootstrap = 200 if args.quicklook else 0
 
     # initialize cropt tpye dictionary and access labels
-    labels_dict = CropTypeDictionary()
-    label_list = list(asdict(labels_dict)["crop_dict"].keys())
+    if args.label_map:
+        labels_dict = CropTypeDictionary.from_file(args.label_map)
+    else:
+        labels_dict = CropTypeDictionary()
+    label_list = list(labels_dict.crop_dict.keys())
 
-    # load ground truth data and conduct schema check
-    fields = gpd.read_file(gt_path)
-    fields = schema_check(fields, label_field, labels_dict)
+    if args.manifest:
+        rasters = read_manifest(args.manifest)
+    else:
+        rasters = list(zip(raster_names(args.raster), args.raster))
+
+    # aggregation function with the configured engine, bands and scheduling options
+    bands = (args.class_band, args.conf_band)
+    if args.band_store and (
+        engine != "field" or worker_mode != "batch" or len(rasters) > 1
+    ):
+        parser.error(
+            "--band_store requires the 'field' engine with worker_mode 'batch' and a single raster"
+        )
+    histogram_path = None
+    if args.histograms:
+        if (
+            (engine == "field" and worker_mode != "batch")
+            or len(rasters) > 1
+            or args.chunk_size
+            or args.cache != "off"
+            or args.prefilter != "off"
+            or args.previous_state
+        ):
+            parser.error(
+                "--histograms requires a single raster, worker_mode 'batch' for the 'field' engine, and cannot be combined with --chunk_size, --cache, --prefilter or --previous_state"
+            )
+        histogram_path = os.path.join(out_dir, "field_histograms.npz")
+    if args.executor == "auto" and (engine != "field" or worker_mode != "batch"):
+        parser.error(
+            "--executor auto requires the 'field' engine with worker_mode 'batch'"
+        )
+    if args.pipeline and not args.chunk_size:
+        parser.error("--pipeline requires --chunk_size")
+    # selection policy of 'select' mode
+    select = selection_policy(args)
+    if args.quicklook and (
+        mode != "analysis"
+        or len(rasters) > 1
+        or args.chunk_size
+        or args.shard
+        or args.histograms
+        or args.previous_state
+        or args.save_state
+    ):
+        parser.error(
+            "--quicklook requires 'analysis' mode and a single raster, and cannot be combined with --chunk_size, --shard, --histograms or --previous_state/--save_state"
+        )
+    if args.overview_level is not None and (
+        not args.quicklook or args.cache != "off" or args.band_store
+    ):
+        parser.error(
+            "--overview_level requires --quicklook and cannot be combined with --cache or --band_store"
+        )
+    if mode == "pixel" and (
+        len(rasters) > 1
+        or args.manifest
+        or args.pipeline
+        or args.shard
+        or args.histograms
+        or args.quicklook
+        or args.cache != "off"
+        or args.prefilter != "off"
+        or args.previous_state
+        or args.save_state
+        or args.band_store
+    ):
+        parser.error(
+            "--mode pixel requires a single raster and cannot be combined with --manifest, --pipeline, --shard, --histograms, --quicklook, --cache, --prefilter, --band_store or --previous_state/--save_state"
+        )
 
-    # aggregate model predictions to fields
-    preds = aggregate_predictions(raster_path, fields)
+    if args.chunk_size and (args.previous_state or args.save_state):
+        parser.error(
+            "--previous_state/--save_state cannot be combined with --chunk_size"
+        )
 
-    # merge ground truth and model predictions dataframes and save out to csv (useful for debugging)
-    merged_df = fields.merge(
-        preds, on="field_id", how="left", suffixes=("_field", "_pred")
-    )
-    merged_df.dropna(
-        inplace=True
-    )  # drop fields with no predictions (i.e. no pixels in field)
+    shard = None
+    if args.shard:
+        if (
+            len(rasters) > 1
+            or args.manifest
+            or args.chunk_size
+            or args.histograms
+            or args.previous_state
+            or args.save_state
+            or args.save_merged
+        ):
+            parser.error(
+                "--shard requires a single raster and cannot be combined with --manifest, --chunk_size, --histograms, --save_merged or --previous_state/--save_state"
+            )
+        try:
+            shard = parse_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        shard_dir = args.shard_dir or os.path.join(out_dir, "shards")
 
-    merged_df = standardize_labels(merged_df, label_field, "predicted_int", labels_dict)
-    if mode == "select":
-        # select records based on confidence percentiles
-        merged_df = select_records(merged_df, "pred_label", "gt_label", "confidence")
-        merged_df.to_file(os.path.join(out_dir, "selected_fields.gpkg"), driver="GPKG")
+    band_store = None
+    if args.band_store:
+        # decode the class/confidence bands once into a memory-mapped store shared by the workers; this comes
+        # after the option checks so a rejected command line never pays for it
+        with timer.stage("band_store"):
+            band_store = ensure_band_store(rasters[0][1], args.band_store, bands)
+    aggregate = build_aggregate(args, bands, band_store, histogram_path, timer.fields)
 
-    elif mode == "analysis":
+    if len(rasters) > 1 or args.manifest:
+        if (
+            args.chunk_size
+            or args.cache != "off"
+            or args.prefilter != "off"
+            or args.previous_state
+            or args.save_state
+        ):
+            parser.error(
+                "--chunk_size, --cache, --prefilter and --previous_state/--save_state cannot be combined with multiple rasters"
+            )
+        # rasterize the fields once per raster grid and evaluate every raster against them
+        with timer.stage("read"):
+            fields = gpd.read_file(gt_path)
+        with timer.stage("schema_check", len(fields)):
+            fields = schema_check(fields, label_field, labels_dict)
+        pool = None
+        try:
+            if engine == "field" and worker_mode == "batch" and args.executor != "auto":
+                # order and encode the fields and start the workers once for all rasters; workers switch rasters
+                pool = worker_pool(rasters[0][1], None, bands, args.executor)
+                aggregate = build_aggregate(
+                    args,
+                    bands,
+                    profile=timer.fields,
+                    pool=pool,
+                    batches=field_batches(fields, order, raster_path=rasters[0][1]),
+                )
+            with timer.stage("evaluate_rasters", len(fields) * len(rasters)):
+                evaluate_rasters(
+                    fields,
+                    rasters,
+                    label_field,
+                    labels_dict,
+                    out_dir,
+                    mode=mode,
+                    output_format=args.output_format,
+                    columns=args.columns,
+                    row_group_size=args.row_group_size,
+                    save_merged=args.save_merged,
+                    bands=bands,
+                    n_bootstrap=args.bootstrap,
+                    select=select,
+                    # the block engine shares one rasterization of the fields per raster grid
+                    aggregate=aggregate if engine == "field" else None,
+                )
+        finally:
+            if pool is not None:
+                pool.terminate()
+        return
+    raster_path = rasters[0][1]
 
-        # compute counts by crop type and agreement between ground truth and model predictions
-        counts_df = record_count(merged_df, "gt_label")
-        agreement_df = agreement(merged_df, "gt_label", "pred_label")
+    if mode == "pixel":
+        # stream the raster window by window into a pixel-level confusion matrix
+        if args.chunk_size:
+            # read the ground truth in chunks so vector memory is bounded as well
+            with timer.stage("pixel_metrics"):
+                metrics = stream_pixel_metrics(
+                    gt_path,
+                    raster_path,
+                    label_field,
+                    labels_dict,
+                    chunk_size=args.chunk_size,
+                    bands=bands,
+                )
+        else:
+            with timer.stage("read"):
+                fields = gpd.read_file(gt_path)
+            with timer.stage("schema_check", len(fields)):
+                fields = schema_check(fields, label_field, labels_dict)
+            with timer.stage("pixel_metrics", len(fields)):
+                metrics = pixel_metrics(
+                    raster_path, fields, label_field, labels_dict, bands=bands
+                )
+        write_analysis(metrics, label_list, out_dir, timer, args.bootstrap)
+        return
 
-        # get average confidence by crop type for model predictions
-        avg_conf_df = average_confidence(merged_df, "pred_label", "confidence")
+    if args.chunk_size:
+        # stream the ground truth in chunks so peak memory is bounded by the chunk size
+        merged_writer = None
+        pool = None
+        try:
+            if (
+                engine == "field"
+                and args.pipeline
+                and worker_mode == "batch"
+                and args.executor != "auto"
+            ):
+                # one worker pool for all pipelined chunks instead of one per chunk
+                pool = worker_pool(raster_path, band_store, bands, args.executor)
+                aggregate = build_aggregate(
+                    args, bands, band_store, profile=timer.fields, pool=pool
+                )
+            if args.save_merged:
+                merged_writer = FieldWriter(
+                    output_path(out_dir, "merged_fields", args.output_format),
+                    args.output_format,
+                    args.columns,
+                    args.row_group_size,
+                )
+            with timer.stage("stream"):
+                if mode == "select":
+                    stream_select(
+                        gt_path,
+                        raster_path,
+                        label_field,
+                        labels_dict,
+                        aggregate,
+                        output_path(out_dir, "selected_fields", args.output_format),
+                        chunk_size=args.chunk_size,
+                        output_format=args.output_format,
+                        columns=args.columns,
+                        row_group_size=args.row_group_size,
+                        merged_writer=merged_writer,
+                        queue_size=args.pipeline,
+                        select=select,
+                    )
+                else:
+                    metrics = stream_metrics(
+                        gt_path,
+                        raster_path,
+                        label_field,
+                        labels_dict,
+                        aggregate,
+                        chunk_size=args.chunk_size,
+                        merged_writer=merged_writer,
+                        queue_size=args.pipeline,
+                    )
+                if merged_writer is not None:
+                    merged_writer.close()
+        finally:
+            if pool is not None:
+                pool.terminate()
+        if mode == "analysis":
+            write_analysis(metrics, label_list, out_dir, timer, args.bootstrap)
+        return
 
-        # compute confusion matrix and F1 scores
-        cm, f1_scores_df = cm_f1(merged_df, "gt_label", "pred_label", labels_dict)
-        # Save confusion matrix csv/png
-        plot_confusion_matrix(
-            cm, label_list, output_path=out_dir + "/confusion_matrix.png"
-        )
-        cm_df = pd.DataFrame(cm)
-        cm_df.to_csv(os.path.join(out_dir, "confusion_matrix.csv"), index=True)
+    # load ground truth data and conduct schema check
+    with timer.stage("read"):
+        fields = gpd.read_file(gt_path)
+    with timer.stage("schema_check", len(fields)):
+        fields = schema_check(fields, label_field, labels_dict)
+    if args.quicklook:
+        # aggregate a stratified sample only and estimate the final results with error bars
+        with timer.stage("quicklook", len(fields)):
+            quicklook(
+                fields,
+                raster_path,
+                label_field,
+                labels_dict,
+                aggregate,
+                out_dir,
+                per_class=args.quicklook,
+                n_bootstrap=args.bootstrap,
+            )
+        return
+    if shard:
+        # keep only this shard's fields; the partition is the same in every shard
+        n_fields = len(fields)
+        rows = shard_rows(fields, *shard)
+        fields = fields.iloc[rows]
+        logging.info(f"Shard {args.shard}: {len(fields)} of {n_fields} fields")
 
-        # Merge crop counts, agreement and f1_scores for final .csv
-        ct_agree = counts_df.merge(agreement_df, on="gt_label", how="left")
-        f1_conf = f1_scores_df.merge(
-            avg_conf_df, left_on="Crop", right_on="pred_label", how="left"
-        )
-        final_df = f1_conf.merge(
-            ct_agree, left_on="Crop", right_on="gt_label", how="left"
-        )
+    # aggregate model predictions to fields, only re-processing changed fields/raster blocks if a previous state is given
+    digests = None
+    with timer.stage("aggregate", len(fields)):
+        if args.previous_state:
+            preds, digests = incremental_aggregate(
+                raster_path, fields, aggregate, args.previous_state, bands=bands
+            )
+        else:
+            preds = aggregate(raster_path, fields)
+    if histogram_path:
+        with timer.stage("field_statistics", len(fields)):
+            FieldHistograms.load(histogram_path).statistics().to_csv(
+                os.path.join(out_dir, "field_statistics.csv"), index=False
+            )
+    if args.previous_state or args.save_state:
+        with timer.stage("save_state", len(fields)):
+            save_state(
+                os.path.join(out_dir, "state"),
+                raster_path,
+                fields,
+                preds,
+                digests=digests,
+                bands=bands,
+            )
 
-        # drop any crop types with no gt_label (i.e. no instances in the ground truth)
-        final_df.dropna(subset=["gt_label"], inplace=True)
+    # merge ground truth and model predictions and standardize labels
+    merged_df = merge_predictions(fields, preds, label_field, labels_dict, timer)
+    if shard:
+        # partial results for `python -m crop_mle.shard`, which writes the run's outputs
+        with timer.stage("write_shard", len(merged_df)):
+            metrics = MetricsAccumulator.from_label_map(labels_dict).update_frame(
+                merged_df, "gt_label", "pred_label", "confidence", labels_dict
+            )
+            write_shard(shard_dir, *shard, merged_df, rows, metrics, n_fields)
+        return
+    if args.save_merged:
+        with timer.stage("write_merged", len(merged_df)):
+            write_fields(
+                merged_df,
+                output_path(out_dir, "merged_fields", args.output_format),
+                args.output_format,
+                args.columns,
+                args.row_group_size,
+            )
+    if mode == "select":
+        # select records based on confidence percentiles
+        with timer.stage("select", len(merged_df)):
+            merged_df = select(merged_df, "pred_label", "gt_label", "confidence")
+        with timer.stage("write", len(merged_df)):
+            write_fields(
+                merged_df,
+                output_path(out_dir, "selected_fields", args.output_format),
+                args.output_format,
+                args.columns,
+                args.row_group_size,
+            )
 
-        # clean-up duplicate columns and write out final result
-        final_df.drop(columns=["gt_label", "pred_label"], inplace=True)
-        final_df.to_csv(os.path.join(out_dir, "final_results.csv"), index=False)
-    else:
-        raise ValueError("Invalid mode. Please select 'select' or 'analysis'.")
+    elif mode == "analysis":
 
-    logging.info("Done")
+        # encode labels once and accumulate confusion matrix, counts, agreement and confidence in a single pass
+        with timer.stage("metrics_accumulate", len(merged_df)):
+            metrics = MetricsAccumulator.from_label_map(labels_dict).update_frame(
+                merged_df, "gt_label", "pred_label", "confidence", labels_dict
+            )
+        write_analysis(metrics, label_list, out_dir, timer, args.bootstrap)
 
 
 if __name__ == "__main__":
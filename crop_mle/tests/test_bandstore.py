@@ -0,0 +1,84 @@
+import unittest
+import os
+import shutil
+import tempfile
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio as rio
+from shapely.geometry import box
+from crop_mle.bandstore import build_band_store, ensure_band_store, open_band_store
+from crop_mle.process import aggregate_predictions
+
+
+class TestBandStore(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.fields = gpd.read_file("crop_mle/tests/test.gpkg")
+        self.tmp = tempfile.TemporaryDirectory()
+        self.raster_path = os.path.join(self.tmp.name, "test.tif")
+        shutil.copy("crop_mle/tests/test.tif", self.raster_path)
+        self.store_dir = os.path.join(self.tmp.name, "store")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_build_band_store(self):
+        build_band_store(self.raster_path, self.store_dir, strip_rows=7)
+        store = open_band_store(self.store_dir)
+        with rio.open(self.raster_path) as src:
+            np.testing.assert_array_equal(store.data, src.read([3, 4]))
+            self.assertEqual(store.transform, src.transform)
+        self.assertIsInstance(store.data, np.memmap)
+
+    def test_aggregate_with_band_store(self):
+        # add a field without pixel centres and one outside the raster
+        centroid = self.fields.geometry.iloc[0].centroid
+        extra = self.fields.iloc[[0, 0]].copy()
+        extra["field_id"] = ["tiny", "outside"]
+        extra["geometry"] = [
+            box(centroid.x, centroid.y, centroid.x + 1e-6, centroid.y + 1e-6),
+            box(0, 0, 0.01, 0.01),
+        ]
+        fields = pd.concat([self.fields, extra], ignore_index=True)
+        expected = aggregate_predictions(self.raster_path, fields)
+        ensure_band_store(self.raster_path, self.store_dir)
+        result = aggregate_predictions(
+            self.raster_path, fields, band_store=self.store_dir
+        )
+        pd.testing.assert_frame_equal(result, expected)
+        with self.assertRaises(ValueError):
+            aggregate_predictions(
+                self.raster_path, fields, worker_mode="field", band_store=self.store_dir
+            )
+
+    def test_mask_band(self):
+        # internal mask band over part of the fields, which the nodata value cannot express
+        unmasked = aggregate_predictions(self.raster_path, self.fields)
+        with rio.open(self.raster_path, "r+") as dst:
+            valid = np.full(dst.shape, 255, dtype=np.uint8)
+            valid[:, :175] = 0
+            dst.write_mask(valid)
+        expected = aggregate_predictions(self.raster_path, self.fields)
+        self.assertFalse(np.allclose(expected["confidence"], unmasked["confidence"]))
+        ensure_band_store(self.raster_path, self.store_dir)
+        self.assertIsNotNone(open_band_store(self.store_dir).valid)
+        pd.testing.assert_frame_equal(
+            aggregate_predictions(
+                self.raster_path, self.fields, band_store=self.store_dir
+            ),
+            expected,
+        )
+
+    def test_ensure_band_store_rebuilds_stale_store(self):
+        ensure_band_store(self.raster_path, self.store_dir)
+        with rio.open(self.raster_path, "r+") as dst:
+            data = dst.read(3)
+            dst.write(data + 1, 3)
+        ensure_band_store(self.raster_path, self.store_dir)
+        np.testing.assert_array_equal(open_band_store(self.store_dir).data[0], data + 1)
+
+
+if __name__ == "__main__":
+    unittest.main()
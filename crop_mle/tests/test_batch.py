@@ -0,0 +1,117 @@
+import unittest
+import os
+import tempfile
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+import rasterio as rio
+from functools import partial
+from crop_mle._types import CropTypeDictionary
+from crop_mle.batch import evaluate_rasters, read_manifest, raster_names
+from crop_mle.evaluate import schema_check
+from crop_mle.process import aggregate_predictions, field_batches, worker_pool
+from crop_mle.zonal import rasterize_fields, zonal_aggregate
+
+
+class TestBatch(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.label_map = CropTypeDictionary()
+        self.fields = schema_check(
+            gpd.read_file("crop_mle/tests/test.gpkg"),
+            "normalized_label",
+            self.label_map,
+        )
+        self.raster_path = "crop_mle/tests/test.tif"
+        self.tmp = tempfile.TemporaryDirectory()
+
+        # second model: same grid, every predicted class shifted to a different crop type
+        self.other_path = os.path.join(self.tmp.name, "other.tif")
+        with rio.open(self.raster_path) as src:
+            profile = src.profile
+            data = src.read()
+        data[2] = np.where(data[2] >= 0, (data[2] + 1) % 4, data[2])
+        with rio.open(self.other_path, "w", **profile) as dst:
+            dst.write(data)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_shared_field_raster(self):
+        field_raster = rasterize_fields(self.raster_path, self.fields)
+        for path in (self.raster_path, self.other_path):
+            pd.testing.assert_frame_equal(
+                zonal_aggregate(path, self.fields, field_raster=field_raster),
+                zonal_aggregate(path, self.fields),
+            )
+
+    def test_evaluate_rasters(self):
+        rasters = list(
+            zip(
+                raster_names([self.raster_path, self.other_path]),
+                [self.raster_path, self.other_path],
+            )
+        )
+        comparison = evaluate_rasters(
+            self.fields, rasters, "normalized_label", self.label_map, self.tmp.name
+        )
+        self.assertEqual(comparison["Model"].tolist(), ["test", "other"])
+        self.assertTrue(
+            os.path.exists(os.path.join(self.tmp.name, "model_comparison.csv"))
+        )
+        for name in ("test", "other"):
+            self.assertTrue(
+                os.path.exists(os.path.join(self.tmp.name, name, "final_results.csv"))
+            )
+        self.assertNotEqual(
+            comparison["Percent Agreement"].iloc[0],
+            comparison["Percent Agreement"].iloc[1],
+        )
+        # the 'field' engine gives the same comparison without shared field rasters
+        pd.testing.assert_frame_equal(
+            evaluate_rasters(
+                self.fields,
+                rasters,
+                "normalized_label",
+                self.label_map,
+                self.tmp.name,
+                aggregate=partial(aggregate_predictions, executor="serial"),
+            ),
+            comparison,
+        )
+
+    def test_shared_pool_and_batches(self):
+        paths = [self.raster_path, self.other_path]
+        batches = field_batches(self.fields, raster_path=self.raster_path)
+        for executor in ("thread", "serial"):
+            # one pool started for the first raster; its workers switch to the other one
+            with worker_pool(self.raster_path, executor=executor, n_workers=2) as pool:
+                shared = [
+                    aggregate_predictions(
+                        path,
+                        self.fields,
+                        pool=pool,
+                        batches=batches,
+                        executor=executor,
+                        n_workers=2,
+                    )
+                    for path in paths + paths
+                ]
+            for path, result in zip(paths + paths, shared):
+                pd.testing.assert_frame_equal(
+                    result,
+                    aggregate_predictions(path, self.fields, executor="serial"),
+                )
+
+    def test_read_manifest(self):
+        manifest_path = os.path.join(self.tmp.name, "manifest.csv")
+        pd.DataFrame({"raster": ["a/model.tif", "b/model.tif"]}).to_csv(
+            manifest_path, index=False
+        )
+        names = [name for name, _ in read_manifest(manifest_path)]
+        self.assertEqual(names, ["model", "model_2"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,143 @@
+import glob
+import os
+import unittest
+import tempfile
+from unittest import mock
+import geopandas as gpd
+import pandas as pd
+import rasterio as rio
+import shapely
+from functools import partial
+from shapely import affinity
+from crop_mle._types import CropTypeDictionary
+from crop_mle.cache import cached_aggregate, geometry_hashes, read_cache
+from crop_mle.prepare import prefiltered_aggregate
+from crop_mle.stream import stream_metrics
+from crop_mle.zonal import zonal_aggregate
+
+
+class TestCache(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.fields = gpd.read_file("crop_mle/tests/test.gpkg")
+        self.raster_path = "crop_mle/tests/test.tif"
+        self.calls = []
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def aggregate(self, raster_path, fields):
+        self.calls.append(len(fields))
+        return zonal_aggregate(raster_path, fields)
+
+    def test_cached_aggregate(self):
+        expected = zonal_aggregate(self.raster_path, self.fields)
+        for mode in ("reuse", "reuse", "refresh"):
+            result = cached_aggregate(
+                self.raster_path, self.fields, self.aggregate, self.tmp.name, mode
+            )
+            pd.testing.assert_frame_equal(result, expected)
+        # second run is served entirely from the cache
+        self.assertEqual(self.calls, [len(self.fields), len(self.fields)])
+
+    def test_changed_geometry_is_recomputed(self):
+        cached_aggregate(
+            self.raster_path, self.fields, self.aggregate, self.tmp.name, "reuse"
+        )
+        fields = self.fields.copy()
+        fields.loc[0, "geometry"] = affinity.translate(
+            fields.geometry.iloc[0], xoff=0.001
+        )
+        result = cached_aggregate(
+            self.raster_path, fields, self.aggregate, self.tmp.name, "reuse"
+        )
+        self.assertEqual(self.calls, [len(self.fields), 1])
+        pd.testing.assert_frame_equal(result, zonal_aggregate(self.raster_path, fields))
+        # the entry of the old geometry is replaced rather than kept alongside
+        self.assertEqual(len(read_cache(self.cache_path())), len(fields))
+
+    def test_chunked_refresh_keeps_other_entries(self):
+        for mode in ("refresh", "reuse"):
+            stream_metrics(
+                "crop_mle/tests/test.gpkg",
+                self.raster_path,
+                "normalized_label",
+                CropTypeDictionary(),
+                partial(
+                    cached_aggregate,
+                    aggregate=self.aggregate,
+                    cache_dir=self.tmp.name,
+                    mode=mode,
+                ),
+                chunk_size=2,
+            )
+        # refresh aggregates every chunk, the reuse run after it is all hits
+        self.assertEqual(sum(self.calls), len(self.fields))
+        self.assertEqual(len(read_cache(self.cache_path())), len(self.fields))
+
+    def test_chunks_append_parts_and_compact(self):
+        chunks = [self.fields.iloc[i : i + 2] for i in range(0, len(self.fields), 2)]
+        with mock.patch("crop_mle.cache.COMPACT_PARTS", 3):
+            for chunk in chunks:
+                cached_aggregate(
+                    self.raster_path, chunk, self.aggregate, self.tmp.name, "reuse"
+                )
+                # one part per call until there are more than COMPACT_PARTS
+                self.assertLessEqual(len(os.listdir(self.cache_path())), 3)
+        self.assertEqual(self.calls, [len(chunk) for chunk in chunks])
+        pd.testing.assert_frame_equal(
+            cached_aggregate(
+                self.raster_path, self.fields, self.aggregate, self.tmp.name, "reuse"
+            ),
+            zonal_aggregate(self.raster_path, self.fields),
+        )
+        self.assertEqual(len(self.calls), len(chunks))
+        # the fingerprint memo is replaced atomically, without leftover temporary files
+        self.assertEqual(
+            sorted(os.listdir(self.tmp.name)),
+            sorted(["fingerprints.json", os.path.basename(self.cache_path())]),
+        )
+
+    def test_prefilter_modes_share_the_cache(self):
+        # sliver inside pixel (10, 10) but away from its center
+        with rio.open(self.raster_path) as src:
+            t = src.transform
+        x, y = t * (10.5, 10.5)
+        sliver = gpd.GeoDataFrame(
+            {"field_id": ["sliver"]},
+            geometry=[
+                shapely.box(x + 0.1 * t.a, y + 0.1 * t.e, x + 0.3 * t.a, y + 0.3 * t.e)
+            ],
+            crs=self.fields.crs,
+        )
+        fields = pd.concat(
+            [self.fields[["field_id", "geometry"]], sliver], ignore_index=True
+        )
+        cached = partial(
+            cached_aggregate, aggregate=self.aggregate, cache_dir=self.tmp.name
+        )
+        for mode in ("drop", "centroid"):
+            result = prefiltered_aggregate(self.raster_path, fields, cached, mode)
+            expected = prefiltered_aggregate(
+                self.raster_path, fields, zonal_aggregate, mode
+            )
+            pd.testing.assert_frame_equal(result, expected)
+        # slivers never reach the cache, so the second mode is still all hits
+        self.assertEqual(self.calls, [len(self.fields)])
+
+    def cache_path(self) -> str:
+        (path,) = glob.glob(os.path.join(self.tmp.name, "*_bands3-4"))
+        return path
+
+    def test_geometry_hashes(self):
+        hashes = geometry_hashes(self.fields.geometry.values)
+        self.assertEqual(len(set(hashes)), len(self.fields))
+        self.assertEqual(
+            hashes.tolist(), geometry_hashes(self.fields.geometry.values).tolist()
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
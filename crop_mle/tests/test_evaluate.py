@@ -65,6 +65,13 @@ class TestProcess(unittest.TestCase):
             self.assertIn(label, crop_dict_keys)
         self.assertIsInstance(result, gpd.GeoDataFrame)
 
+    def test_schema_check_drops_unknown_labels(self):
+        fields = self.fields.copy()
+        fields.loc[fields.index[0], "normalized_label"] = "radish"
+        result = schema_check(fields, "normalized_label", self.label_map)
+        self.assertEqual(len(result), len(fields) - 1)
+        self.assertNotIn("radish", result.normalized_label.values)
+
     def test_record_count(self):
 
         # Test record_count function
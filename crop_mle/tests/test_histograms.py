@@ -0,0 +1,90 @@
+import os
+import tempfile
+import unittest
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from crop_mle.histograms import FieldHistograms
+from crop_mle.process import aggregate_predictions
+from crop_mle.zonal import zonal_aggregate
+
+
+class TestHistograms(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.fields = gpd.read_file("crop_mle/tests/test.gpkg")
+        self.raster_path = "crop_mle/tests/test.tif"
+        self.tmp = tempfile.TemporaryDirectory()
+        # field 0: tie between classes 1 and 3, field 1: no pixels, field 2: failed, field 3: one class
+        self.histograms = FieldHistograms.from_rows(
+            np.array(["a", "b", "c", "d"], dtype=object),
+            [np.array([0, 2, 1, 2]), np.zeros(0), np.zeros(0), np.array([0, 0, 4])],
+            [
+                np.eye(20, dtype=np.int64)[18] * 5,
+                np.zeros(0),
+                np.zeros(0),
+                np.eye(20)[0] * 4,
+            ],
+            [475.0, 0.0, 0.0, 8.0],
+            [False, False, True, False],
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_engines_emit_identical_histograms(self):
+        expected = aggregate_predictions(self.raster_path, self.fields)
+        field_path = os.path.join(self.tmp.name, "field.npz")
+        block_path = os.path.join(self.tmp.name, "block.npz")
+        pd.testing.assert_frame_equal(
+            aggregate_predictions(
+                self.raster_path, self.fields, chunk_size=3, histogram_path=field_path
+            ),
+            expected,
+        )
+        pd.testing.assert_frame_equal(
+            zonal_aggregate(self.raster_path, self.fields, histogram_path=block_path),
+            expected,
+        )
+        field, block = FieldHistograms.load(field_path), FieldHistograms.load(
+            block_path
+        )
+        for name in ("class_indptr", "class_index", "class_count", "conf_count"):
+            np.testing.assert_array_equal(getattr(field, name), getattr(block, name))
+        np.testing.assert_array_equal(field.field_id, self.fields["field_id"].values)
+        np.testing.assert_allclose(
+            field.mean_confidence(), expected["confidence"], rtol=1e-12
+        )
+
+    def test_statistics(self):
+        stats = self.histograms.statistics()
+        self.assertEqual(stats["pixel_count"].tolist(), [5, 0, 0, 4])
+        self.assertEqual(stats["predicted_int"].tolist(), [1, -1, -1, 2])
+        self.assertEqual(stats["runner_up"].tolist(), [3, -1, -1, -1])
+        np.testing.assert_allclose(stats["purity"], [0.4, np.nan, np.nan, 1.0])
+        np.testing.assert_allclose(
+            stats["entropy"], [1.5219280948873621, np.nan, np.nan, 0.0]
+        )
+        np.testing.assert_allclose(stats["confidence"], [95.0, np.nan, np.nan, 2.0])
+        # bins [90, 95) and [0, 5): quantiles interpolate within the bin
+        np.testing.assert_allclose(stats["confidence_p50"], [92.5, np.nan, np.nan, 2.5])
+        np.testing.assert_array_equal(
+            self.histograms.missing, [False, True, True, False]
+        )
+
+    def test_take_concat_and_save(self):
+        rows = np.array([3, 0, 2])
+        taken = self.histograms.take(rows)
+        stacked = FieldHistograms.concat([taken.take([0]), taken.take([1, 2])])
+        path = os.path.join(self.tmp.name, "histograms.npz")
+        stacked.save(path)
+        loaded = FieldHistograms.load(path)
+        pd.testing.assert_frame_equal(
+            loaded.statistics(),
+            self.histograms.statistics().iloc[rows].reset_index(drop=True),
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,89 @@
+import unittest
+import os
+import tempfile
+import geopandas as gpd
+import pandas as pd
+import rasterio as rio
+from shapely import affinity
+from crop_mle.incremental import incremental_aggregate, save_state
+from crop_mle.zonal import zonal_aggregate
+
+
+class TestIncremental(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.fields = gpd.read_file("crop_mle/tests/test.gpkg")
+        self.raster_path = "crop_mle/tests/test.tif"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.calls = []
+        self.preds = zonal_aggregate(self.raster_path, self.fields)
+        save_state(
+            self.tmp.name, self.raster_path, self.fields, self.preds, window_size=4
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def aggregate(self, raster_path, fields):
+        self.calls.append(fields["field_id"].tolist())
+        return zonal_aggregate(raster_path, fields)
+
+    def test_unchanged(self):
+        preds, _ = incremental_aggregate(
+            self.raster_path, self.fields, self.aggregate, self.tmp.name, window_size=4
+        )
+        self.assertEqual(self.calls, [])
+        pd.testing.assert_frame_equal(preds, self.preds)
+
+    def changed_raster(self) -> str:
+        # re-run "inference" over the block holding the first field only
+        new_raster = os.path.join(self.tmp.name, "new.tif")
+        with rio.open(self.raster_path) as src:
+            profile = src.profile
+            data = src.read()
+            row, col = src.index(*self.fields.geometry.iloc[0].centroid.coords[0])
+        data[2, row, col] = 30
+        with rio.open(new_raster, "w", **profile) as dst:
+            dst.write(data)
+        return new_raster
+
+    def test_changed_raster_region_and_new_field(self):
+        new_raster = self.changed_raster()
+        new_field = self.fields.iloc[[1]].copy()
+        new_field["field_id"] = "new"
+        new_field["geometry"] = [
+            affinity.translate(new_field.geometry.iloc[0], yoff=-0.001)
+        ]
+        fields = pd.concat([self.fields, new_field], ignore_index=True)
+
+        preds, _ = incremental_aggregate(
+            new_raster, fields, self.aggregate, self.tmp.name, window_size=4
+        )
+        self.assertEqual(len(self.calls), 1)
+        self.assertIn("new", self.calls[0])
+        self.assertIn(self.fields["field_id"].iloc[0], self.calls[0])
+        self.assertLess(len(self.calls[0]), len(fields))
+        pd.testing.assert_frame_equal(preds, zonal_aggregate(new_raster, fields))
+
+    def test_fields_in_another_crs(self):
+        fields = self.fields.to_crs(3857)
+        state_dir = os.path.join(self.tmp.name, "state_3857")
+        save_state(state_dir, self.raster_path, fields, self.preds, window_size=4)
+        new_raster = self.changed_raster()
+        preds, _ = incremental_aggregate(
+            new_raster,
+            fields,
+            lambda raster_path, f: self.aggregate(raster_path, f.to_crs(4326)),
+            state_dir,
+            window_size=4,
+        )
+        # changed blocks are matched against the fields in the raster CRS
+        self.assertEqual(len(self.calls), 1)
+        self.assertIn(self.fields["field_id"].iloc[0], self.calls[0])
+        self.assertLess(len(self.calls[0]), len(fields))
+        pd.testing.assert_frame_equal(preds, zonal_aggregate(new_raster, self.fields))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,72 @@
+import unittest
+import json
+import os
+import tempfile
+import geopandas as gpd
+import pandas as pd
+from shapely.geometry import box
+from crop_mle.instrument import StageTimer, FieldProfile
+from crop_mle.process import aggregate_predictions
+
+
+class TestInstrument(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data: the test fields plus one too small to contain a pixel centre
+        fields = gpd.read_file("crop_mle/tests/test.gpkg")
+        centroid = fields.geometry.iloc[0].centroid
+        tiny = fields.iloc[[0]].copy()
+        tiny["field_id"] = "tiny"
+        tiny["geometry"] = [
+            box(centroid.x, centroid.y, centroid.x + 1e-6, centroid.y + 1e-6)
+        ]
+        self.fields = pd.concat([fields, tiny], ignore_index=True)
+        self.raster_path = "crop_mle/tests/test.tif"
+
+    def test_stage_timer(self):
+        timer = StageTimer()
+        with timer.stage("read", 3):
+            pass
+        with timer.stage("metrics"):
+            pass
+        stages = timer.stage_frame()
+        self.assertEqual(stages["stage"].tolist(), ["read", "metrics"])
+        self.assertTrue((stages["wall_seconds"] >= 0).all())
+
+        disabled = StageTimer(enabled=False)
+        with disabled.stage("read"):
+            pass
+        self.assertEqual(disabled.stages, [])
+        self.assertIsNone(disabled.fields)
+
+    def test_field_profile(self):
+        expected = aggregate_predictions(self.raster_path, self.fields)
+        for worker_mode in ("batch", "field"):
+            profile = FieldProfile()
+            result = aggregate_predictions(
+                self.raster_path, self.fields, worker_mode=worker_mode, profile=profile
+            )
+            pd.testing.assert_frame_equal(result, expected)
+            summary = profile.summary()
+            self.assertEqual(summary["n_fields"], len(self.fields))
+            self.assertEqual(summary["n_empty"], 1)
+            self.assertEqual(summary["n_failed"], 0)
+            self.assertEqual(profile.histogram()["count"].sum(), len(self.fields))
+            self.assertGreater(summary["worker_utilization"], 0)
+
+    def test_write_report(self):
+        timer = StageTimer()
+        with timer.stage("aggregate", len(self.fields)):
+            aggregate_predictions(self.raster_path, self.fields, profile=timer.fields)
+        with tempfile.TemporaryDirectory() as out_dir:
+            timer.write(out_dir)
+            with open(os.path.join(out_dir, "instrumentation.json")) as f:
+                report = json.load(f)
+            self.assertEqual(report["stages"][0]["stage"], "aggregate")
+            self.assertEqual(report["fields"]["n_fields"], len(self.fields))
+            for name in ("instrumentation_stages.csv", "field_latency_histogram.csv"):
+                self.assertTrue(os.path.exists(os.path.join(out_dir, name)))
+
+
+if __name__ == "__main__":
+    unittest.main()
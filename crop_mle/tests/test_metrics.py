@@ -0,0 +1,140 @@
+import unittest
+import numpy as np
+import pandas as pd
+from crop_mle._types import CropTypeDictionary
+from crop_mle.evaluate import record_count, agreement, average_confidence, cm_f1
+from crop_mle.metrics import MetricsAccumulator, encode_labels
+
+
+class TestMetrics(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.label_map = CropTypeDictionary()
+        labels = list(self.label_map.crop_dict.keys())
+        rng = np.random.default_rng(0)
+        n = 2000
+        self.df = pd.DataFrame(
+            {
+                "gt_label": rng.choice(labels[:12], n),
+                "pred_label": rng.choice(labels[4:16], n),
+                "confidence": rng.uniform(10, 99, n),
+            }
+        )
+
+    def legacy_final_results(self, df):
+        # the pandas/sklearn analysis path main.py used before the metrics engine
+        counts_df = record_count(df, "gt_label")
+        agreement_df = agreement(df, "gt_label", "pred_label")
+        avg_conf_df = average_confidence(df, "pred_label", "confidence")
+        cm, f1_scores_df = cm_f1(df, "gt_label", "pred_label", self.label_map)
+        ct_agree = counts_df.merge(agreement_df, on="gt_label", how="left")
+        f1_conf = f1_scores_df.merge(
+            avg_conf_df, left_on="Crop", right_on="pred_label", how="left"
+        )
+        final_df = f1_conf.merge(
+            ct_agree, left_on="Crop", right_on="gt_label", how="left"
+        )
+        final_df.dropna(subset=["gt_label"], inplace=True)
+        final_df.drop(columns=["gt_label", "pred_label"], inplace=True)
+        return cm, final_df
+
+    def test_final_results_matches_legacy(self):
+        # second frame only predicts ground truth classes, which keeps Count as int
+        for df in (self.df, self.df.assign(pred_label=self.df["gt_label"])):
+            cm, expected = self.legacy_final_results(df)
+            metrics = MetricsAccumulator.from_label_map(self.label_map).update_frame(
+                df, "gt_label", "pred_label", "confidence", self.label_map
+            )
+            np.testing.assert_array_equal(metrics.confusion, cm)
+            pd.testing.assert_frame_equal(metrics.final_results(), expected)
+
+    def test_merge_chunks(self):
+        whole = MetricsAccumulator.from_label_map(self.label_map).update_frame(
+            self.df, "gt_label", "pred_label", "confidence", self.label_map
+        )
+        merged = MetricsAccumulator.from_label_map(self.label_map)
+        for chunk in np.array_split(np.arange(len(self.df)), 3):
+            part = MetricsAccumulator.from_label_map(self.label_map)
+            part.update_frame(
+                self.df.iloc[chunk],
+                "gt_label",
+                "pred_label",
+                "confidence",
+                self.label_map,
+            )
+            merged.merge(part)
+        np.testing.assert_array_equal(merged.counts, whole.counts)
+        np.testing.assert_allclose(merged.conf_sum, whole.conf_sum)
+
+    def test_bootstrap_intervals(self):
+        metrics = MetricsAccumulator.from_label_map(self.label_map).update_frame(
+            self.df, "gt_label", "pred_label", "confidence", self.label_map
+        )
+        point = metrics.final_results()
+        final_df = metrics.final_results(n_bootstrap=500)
+        pd.testing.assert_frame_equal(final_df[point.columns], point)
+        for metric in ("F1", "Percent Agreement"):
+            low, high = final_df[f"{metric} CI Low"], final_df[f"{metric} CI High"]
+            self.assertTrue((low <= final_df[metric] + 0.01).all())
+            self.assertTrue((final_df[metric] <= high + 0.01).all())
+            self.assertTrue((low < high).any())
+        pd.testing.assert_frame_equal(metrics.final_results(n_bootstrap=500), final_df)
+
+    def test_bootstrap_matches_field_resampling(self):
+        # multinomial draws over the counts should match resampling the fields themselves
+        gt = encode_labels(self.df["gt_label"], self.label_map)
+        pred = encode_labels(self.df["pred_label"], self.label_map)
+        metrics = MetricsAccumulator.from_label_map(self.label_map).update(
+            gt, pred, self.df["confidence"].to_numpy()
+        )
+        rng = np.random.default_rng(1)
+        f1 = []
+        for _ in range(400):
+            idx = rng.integers(0, len(gt), len(gt))
+            resample = MetricsAccumulator.from_label_map(self.label_map)
+            f1.append(resample.update(gt[idx], pred[idx], np.zeros(len(gt))).f1())
+        expected_low, expected_high = np.percentile(f1, [2.5, 97.5], axis=0)
+        intervals = metrics.bootstrap(2000)
+        np.testing.assert_allclose(intervals["F1 CI Low"], expected_low, atol=0.02)
+        np.testing.assert_allclose(intervals["F1 CI High"], expected_high, atol=0.02)
+
+    def test_average_confidence_large_magnitudes(self):
+        labels = list(self.label_map.crop_dict.keys())
+        rng = np.random.default_rng(1)
+        n = 400_000
+        df = pd.DataFrame(
+            {
+                "gt_label": rng.choice(labels, n),
+                "pred_label": rng.choice(labels, n),
+                "confidence": rng.uniform(1e5, 1e6, n),
+            }
+        )
+        # accumulated over chunks, as when streaming
+        metrics = MetricsAccumulator.from_label_map(self.label_map)
+        for start in range(0, n, 50_000):
+            metrics.update_frame(
+                df.iloc[start : start + 50_000],
+                "gt_label",
+                "pred_label",
+                "confidence",
+                self.label_map,
+            )
+        expected = average_confidence(df, "pred_label", "confidence")
+        np.testing.assert_array_equal(
+            np.round(metrics.average_confidence(), 2)[
+                [labels.index(label) for label in expected["pred_label"]]
+            ],
+            expected["Average Confidence"].to_numpy(),
+        )
+
+    def test_encode_labels(self):
+        codes = encode_labels(
+            pd.Series(["Clover", None, "radish", "Grassland Cultivated"]),
+            self.label_map,
+        )
+        self.assertEqual(codes.tolist(), [2, -1, -1, 0])
+
+
+if __name__ == "__main__":
+    unittest.main()
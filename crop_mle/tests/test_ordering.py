@@ -0,0 +1,36 @@
+import unittest
+import geopandas as gpd
+import numpy as np
+from shapely.geometry import Polygon, box
+from crop_mle.ordering import spatial_order
+
+
+class TestOrdering(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.fields = gpd.read_file("crop_mle/tests/test.gpkg")
+        self.raster_path = "crop_mle/tests/test.tif"
+
+    def test_spatial_order_is_permutation(self):
+        for order in ("none", "hilbert", "morton", "tile"):
+            perm = spatial_order(self.fields, order, self.raster_path)
+            self.assertEqual(sorted(perm.tolist()), list(range(len(self.fields))))
+
+    def test_spatial_order_groups_neighbours(self):
+        # two clusters interleaved in the input come out contiguous
+        geoms = [box(0, 0, 1, 1), box(100, 100, 101, 101), box(1, 0, 2, 1)]
+        geoms += [box(101, 100, 102, 101), Polygon()]
+        fields = gpd.GeoDataFrame({"field_id": range(5)}, geometry=geoms)
+        for order in ("hilbert", "morton"):
+            perm = spatial_order(fields, order)
+            self.assertEqual(set(perm[:2].tolist()), {0, 2})
+            self.assertEqual(perm[-1], 4)  # empty geometries go last
+
+    def test_invalid_order(self):
+        with self.assertRaises(ValueError):
+            spatial_order(self.fields, "random")
+
+
+if __name__ == "__main__":
+    unittest.main()
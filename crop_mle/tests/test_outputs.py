@@ -0,0 +1,92 @@
+import unittest
+import os
+import tempfile
+import geopandas as gpd
+import pandas as pd
+import pyarrow.parquet as pq
+from crop_mle._types import CropTypeDictionary
+from crop_mle.outputs import FieldWriter, output_path, write_fields
+from crop_mle.stream import stream_select
+from crop_mle.zonal import zonal_aggregate
+
+
+def read_fields(path, output_format):
+    if output_format == "parquet":
+        return gpd.read_parquet(path)
+    elif output_format == "feather":
+        return gpd.read_feather(path)
+    return gpd.read_file(path)
+
+
+class TestOutputs(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.gt_path = "crop_mle/tests/test.gpkg"
+        self.fields = gpd.read_file(self.gt_path)
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_write_fields(self):
+        for output_format in ("gpkg", "parquet", "feather"):
+            path = output_path(self.tmp.name, "fields", output_format)
+            write_fields(
+                self.fields,
+                path,
+                output_format,
+                columns=["normalized_label", "field_id"],
+                row_group_size=2,
+            )
+            result = read_fields(path, output_format)
+            self.assertEqual(
+                list(result.columns), ["normalized_label", "field_id", "geometry"]
+            )
+            self.assertEqual(result.crs, self.fields.crs)
+            self.assertTrue(result.geom_equals(self.fields.geometry).all())
+        self.assertEqual(
+            pq.ParquetFile(
+                output_path(self.tmp.name, "fields", "parquet")
+            ).num_row_groups,
+            4,
+        )
+        with self.assertRaises(ValueError):
+            write_fields(self.fields, path, "parquet", columns=["not_a_column"])
+
+    def test_field_writer_chunks(self):
+        for output_format in ("gpkg", "parquet", "feather"):
+            path = output_path(self.tmp.name, "chunks", output_format)
+            with FieldWriter(path, output_format) as writer:
+                writer.write(self.fields.iloc[:3])
+                writer.write(self.fields.iloc[:0])
+                writer.write(self.fields.iloc[3:])
+            self.assertEqual(writer.n_written, len(self.fields))
+            result = read_fields(path, output_format)
+            pd.testing.assert_frame_equal(
+                pd.DataFrame(result.drop(columns="geometry")),
+                pd.DataFrame(self.fields.drop(columns="geometry")),
+                check_dtype=False,
+            )
+            self.assertTrue(result.geom_equals(self.fields.geometry).all())
+
+    def test_stream_select_parquet(self):
+        args = (
+            self.gt_path,
+            "crop_mle/tests/test.tif",
+            "normalized_label",
+            CropTypeDictionary(),
+            zonal_aggregate,
+        )
+        gpkg_path = os.path.join(self.tmp.name, "selected.gpkg")
+        parquet_path = os.path.join(self.tmp.name, "selected.parquet")
+        stream_select(*args, gpkg_path, chunk_size=3)
+        stream_select(*args, parquet_path, chunk_size=3, output_format="parquet")
+        expected = gpd.read_file(gpkg_path)
+        result = gpd.read_parquet(parquet_path)
+        self.assertEqual(set(result.columns), set(expected.columns))
+        self.assertEqual(result["field_id"].tolist(), expected["field_id"].tolist())
+
+
+if __name__ == "__main__":
+    unittest.main()
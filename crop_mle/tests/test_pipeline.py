@@ -0,0 +1,89 @@
+import time
+import unittest
+from functools import partial
+import numpy as np
+import pandas as pd
+from crop_mle._types import CropTypeDictionary
+from crop_mle.pipeline import pipelined_merged_chunks
+from crop_mle.process import aggregate_predictions, worker_pool
+from crop_mle.stream import iter_field_chunks, stream_metrics
+from crop_mle.zonal import zonal_aggregate
+
+
+class TestPipeline(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.label_map = CropTypeDictionary()
+        self.gt_path = "crop_mle/tests/test.gpkg"
+        self.raster_path = "crop_mle/tests/test.tif"
+
+    def test_pipelined_metrics_match_sequential(self):
+        expected = stream_metrics(
+            self.gt_path,
+            self.raster_path,
+            "normalized_label",
+            self.label_map,
+            zonal_aggregate,
+            chunk_size=3,
+        )
+        with worker_pool(self.raster_path) as pool:
+            metrics = stream_metrics(
+                self.gt_path,
+                self.raster_path,
+                "normalized_label",
+                self.label_map,
+                partial(aggregate_predictions, chunk_size=2, pool=pool),
+                chunk_size=3,
+                queue_size=1,
+            )
+        np.testing.assert_array_equal(metrics.counts, expected.counts)
+        pd.testing.assert_frame_equal(metrics.final_results(), expected.final_results())
+
+    def test_backpressure(self):
+        # chunks read ahead of the consumer are bounded by the queues and the two stages
+        read = []
+
+        def chunks():
+            for chunk in iter_field_chunks(self.gt_path, chunk_size=1):
+                read.append(chunk.index[0])
+                yield chunk
+
+        ahead = []
+        merged = pipelined_merged_chunks(
+            chunks(),
+            self.raster_path,
+            "normalized_label",
+            self.label_map,
+            zonal_aggregate,
+            queue_size=1,
+        )
+        rows = []
+        for chunk in merged:
+            rows.extend(chunk.index)
+            # give the stages time to fill their queues
+            for _ in range(20):
+                if len(read) == 7:
+                    break
+                time.sleep(0.01)
+            ahead.append(len(read) - len(rows))
+        self.assertEqual(rows, list(range(7)))
+        self.assertLessEqual(max(ahead), 4)
+
+    def test_stage_error_propagates(self):
+        def failing(raster_path, fields):
+            raise RuntimeError("aggregation failed")
+
+        merged = pipelined_merged_chunks(
+            iter_field_chunks(self.gt_path, chunk_size=2),
+            self.raster_path,
+            "normalized_label",
+            self.label_map,
+            failing,
+        )
+        with self.assertRaisesRegex(RuntimeError, "aggregation failed"):
+            list(merged)
+
+
+if __name__ == "__main__":
+    unittest.main()
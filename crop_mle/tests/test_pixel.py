@@ -0,0 +1,80 @@
+import unittest
+import geopandas as gpd
+import numpy as np
+import rasterio as rio
+from rasterio.mask import mask
+from crop_mle._types import CropTypeDictionary
+from crop_mle.evaluate import schema_check
+from crop_mle.metrics import encode_labels
+from crop_mle.pixel import pixel_metrics, pred_code_lookup, stream_pixel_metrics
+
+
+class TestPixel(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.label_map = CropTypeDictionary()
+        self.fields = schema_check(
+            gpd.read_file("crop_mle/tests/test.gpkg"),
+            "normalized_label",
+            self.label_map,
+        )
+        self.raster_path = "crop_mle/tests/test.tif"
+
+    def expected_counts(self) -> np.ndarray:
+        # per-field masks of the whole raster, as the 'field' engine reads them
+        n = len(self.label_map.crop_dict)
+        counts = np.zeros((n + 1, n + 1), dtype=np.int64)
+        gt_codes = encode_labels(
+            self.fields["normalized_label"].map(self.label_map.alias_lookup),
+            self.label_map,
+        )
+        lookup = pred_code_lookup(self.label_map)
+        with rio.open(self.raster_path) as src:
+            for gt, geom in zip(gt_codes, self.fields.geometry):
+                classes = mask(src, [geom], crop=True, indexes=3, filled=False)[0]
+                pred = lookup[classes.compressed()]
+                np.add.at(counts[gt], np.where(pred < 0, n, pred), 1)
+        return counts
+
+    def test_matches_field_masks(self):
+        metrics = pixel_metrics(
+            self.raster_path, self.fields, "normalized_label", self.label_map
+        )
+        expected = self.expected_counts()
+        np.testing.assert_array_equal(metrics.counts, expected)
+        self.assertGreater(expected.sum(), len(self.fields))
+
+    def test_window_size_does_not_change_results(self):
+        large = pixel_metrics(
+            self.raster_path, self.fields, "normalized_label", self.label_map
+        )
+        small = pixel_metrics(
+            self.raster_path,
+            self.fields.to_crs(3857),
+            "normalized_label",
+            self.label_map,
+            window_size=16,
+        )
+        np.testing.assert_array_equal(small.counts, large.counts)
+        np.testing.assert_allclose(
+            small.average_confidence(), large.average_confidence(), equal_nan=True
+        )
+
+    def test_chunked_fields(self):
+        expected = pixel_metrics(
+            self.raster_path, self.fields, "normalized_label", self.label_map
+        )
+        chunked = stream_pixel_metrics(
+            "crop_mle/tests/test.gpkg",
+            self.raster_path,
+            "normalized_label",
+            self.label_map,
+            chunk_size=2,
+        )
+        np.testing.assert_array_equal(chunked.counts, expected.counts)
+        np.testing.assert_allclose(chunked.conf_sum, expected.conf_sum)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+import unittest
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio as rio
+import shapely
+from crop_mle.prepare import pixel_center_mask, prefiltered_aggregate
+from crop_mle.process import aggregate_predictions
+from crop_mle.zonal import zonal_aggregate
+
+
+class TestPrepare(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.fields = gpd.read_file("crop_mle/tests/test.gpkg")
+        self.raster_path = "crop_mle/tests/test.tif"
+        with rio.open(self.raster_path) as src:
+            self.transform, self.shape = src.transform, src.shape
+        # center of pixel (row 10, col 10)
+        t = self.transform
+        x, y = t * (10.5, 10.5)
+        self.extra = gpd.GeoDataFrame(
+            {"field_id": ["sliver", "outside", "center"]},
+            geometry=[
+                # inside pixel (10, 10) but away from its center
+                shapely.box(x + 0.1 * t.a, y + 0.1 * t.e, x + 0.3 * t.a, y + 0.3 * t.e),
+                shapely.box(0, 0, 0.1, 0.1),
+                # tiny box around the pixel center
+                shapely.box(x - 0.1 * t.a, y - 0.1 * t.e, x + 0.1 * t.a, y + 0.1 * t.e),
+            ],
+            crs=self.fields.crs,
+        )
+
+    def test_matches_full_aggregation(self):
+        fields = pd.concat(
+            [self.fields[["field_id", "geometry"]], self.extra], ignore_index=True
+        )
+        for aggregate in (aggregate_predictions, zonal_aggregate):
+            expected = aggregate(self.raster_path, fields)
+            pd.testing.assert_frame_equal(
+                prefiltered_aggregate(self.raster_path, fields, aggregate),
+                expected,
+            )
+        self.assertTrue(expected["predicted_int"].iloc[-3:-1].isna().all())
+
+    def test_reprojects_fields(self):
+        expected = aggregate_predictions(self.raster_path, self.fields)
+        pd.testing.assert_frame_equal(
+            prefiltered_aggregate(
+                self.raster_path, self.fields.to_crs(3857), aggregate_predictions
+            ),
+            expected,
+        )
+
+    def test_slivers(self):
+        geoms = self.extra.geometry.values
+        np.testing.assert_array_equal(
+            pixel_center_mask(geoms, self.transform, self.shape), [False, False, True]
+        )
+        preds = prefiltered_aggregate(
+            self.raster_path, self.extra, aggregate_predictions, mode="centroid"
+        )
+        # the sliver gets the pixel under it, the same pixel the tiny box around its center covers
+        self.assertEqual(preds["predicted_int"].iloc[0], preds["predicted_int"].iloc[2])
+        self.assertEqual(preds["confidence"].iloc[0], preds["confidence"].iloc[2])
+        self.assertTrue(np.isnan(preds["predicted_int"].iloc[1]))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,6 +1,18 @@
+import os
+import tempfile
 import unittest
 import geopandas as gpd
-from crop_mle.process import process_field, aggregate_predictions
+import numpy as np
+import pandas as pd
+import rasterio as rio
+import shapely
+from crop_mle.process import (
+    process_field,
+    aggregate_predictions,
+    process_batch,
+    _init_worker,
+    calibrate_executor,
+)
 
 
 class TestProcess(unittest.TestCase):
@@ -21,6 +33,100 @@ class TestProcess(unittest.TestCase):
         self.assertIsInstance(gdf, gpd.GeoDataFrame)
         self.assertEqual(len(gdf), len(self.fields))
 
+    def test_aggregate_predictions_worker_modes(self):
+        batch = aggregate_predictions(
+            self.raster_path, self.fields, worker_mode="batch", chunk_size=3
+        )
+        field = aggregate_predictions(
+            self.raster_path, self.fields, worker_mode="field"
+        )
+        pd.testing.assert_frame_equal(batch, field)
+
+    def test_aggregate_predictions_orders(self):
+        expected = aggregate_predictions(self.raster_path, self.fields, order="none")
+        for order in ("hilbert", "morton", "tile"):
+            for worker_mode in ("batch", "field"):
+                result = aggregate_predictions(
+                    self.raster_path,
+                    self.fields,
+                    worker_mode=worker_mode,
+                    chunk_size=2,
+                    order=order,
+                )
+                pd.testing.assert_frame_equal(result, expected)
+
+    def test_process_batch(self):
+        _init_worker(self.raster_path)
+        batch = list(
+            zip(self.fields["field_id"], shapely.to_wkb(self.fields.geometry.values))
+        )
+        majority_class, avg_conf = process_batch(batch)
+        self.assertEqual(majority_class.shape, (len(self.fields),))
+        self.assertTrue(np.all(majority_class >= 0))
+        self.assertFalse(np.isnan(avg_conf).any())
+
+    def test_aggregate_predictions_bands(self):
+        # class/confidence stored as bands 2/1 of a two-band raster
+        expected = aggregate_predictions(self.raster_path, self.fields)
+        with tempfile.TemporaryDirectory() as tmp_dir, rio.open(
+            self.raster_path
+        ) as src:
+            path = os.path.join(tmp_dir, "two_band.tif")
+            profile = src.profile | {"count": 2}
+            with rio.open(path, "w", **profile) as dst:
+                dst.write(src.read([4, 3]))
+            for worker_mode in ("batch", "field"):
+                result = aggregate_predictions(
+                    path, self.fields, worker_mode=worker_mode, bands=(2, 1)
+                )
+                pd.testing.assert_frame_equal(result, expected)
+
+    def test_aggregate_predictions_executors(self):
+        expected = aggregate_predictions(self.raster_path, self.fields)
+        for worker_mode, executors in (
+            ("batch", ("thread", "serial", "auto")),
+            ("field", ("thread", "serial")),
+        ):
+            for executor in executors:
+                result = aggregate_predictions(
+                    self.raster_path,
+                    self.fields,
+                    worker_mode=worker_mode,
+                    chunk_size=2,
+                    executor=executor,
+                )
+                pd.testing.assert_frame_equal(result, expected)
+        with self.assertRaises(ValueError):
+            aggregate_predictions(
+                self.raster_path, self.fields, worker_mode="field", executor="auto"
+            )
+
+    def test_calibrate_executor(self):
+        wkbs = shapely.to_wkb(self.fields.geometry.values)
+        expected = aggregate_predictions(self.raster_path, self.fields)
+        for chunk_size, n_calibrated in ((2, 3), (1, 5)):
+            batches = [
+                list(
+                    zip(
+                        self.fields["field_id"][i : i + chunk_size],
+                        wkbs[i : i + chunk_size],
+                    )
+                )
+                for i in range(0, len(self.fields), chunk_size)
+            ]
+            executor, results, pool = calibrate_executor(
+                process_batch, batches, self.raster_path, n_workers=2
+            )
+            pool.terminate()
+            self.assertIn(executor, ("process", "thread", "serial"))
+            # one batch runs serially and two on threads; with 7 batches, two more on processes
+            self.assertEqual(len(results), n_calibrated)
+            majority_class = np.concatenate([r[0] for r in results])
+            np.testing.assert_array_equal(
+                majority_class,
+                expected["predicted_int"][: n_calibrated * chunk_size],
+            )
+
 
 if __name__ == "__main__":
     unittest.main()
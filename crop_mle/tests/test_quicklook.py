@@ -0,0 +1,127 @@
+import os
+import shutil
+import tempfile
+import unittest
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio as rio
+from rasterio.enums import Resampling
+from functools import partial
+from crop_mle._types import CropTypeDictionary
+from crop_mle.evaluate import schema_check, merge_predictions
+from crop_mle.metrics import MetricsAccumulator
+from crop_mle.process import aggregate_predictions
+from crop_mle.quicklook import quicklook, stratified_sample
+from crop_mle.zonal import zonal_aggregate
+
+
+class TestQuicklook(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.label_map = CropTypeDictionary()
+        self.fields = schema_check(
+            gpd.read_file("crop_mle/tests/test.gpkg"),
+            "normalized_label",
+            self.label_map,
+        )
+        self.raster_path = "crop_mle/tests/test.tif"
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_stratified_sample(self):
+        aliases = [aliases[0] for aliases in self.label_map.crop_dict.values()][:3]
+        labels = np.repeat(aliases, [50, 10, 3])
+        fields = pd.DataFrame({"normalized_label": labels})
+        rows, weights = stratified_sample(
+            fields, "normalized_label", self.label_map, per_class=5, seed=1
+        )
+        sampled = pd.Series(labels[rows]).value_counts()
+        self.assertEqual(sampled[aliases[0]], 5)
+        self.assertEqual(sampled[aliases[1]], 5)
+        self.assertEqual(sampled[aliases[2]], 3)
+        np.testing.assert_array_equal(np.sort(np.unique(weights)), [1.0, 2.0, 10.0])
+        # weighted sample sizes add up to the class sizes
+        self.assertAlmostEqual(weights.sum(), len(fields))
+        np.testing.assert_array_equal(
+            stratified_sample(
+                fields, "normalized_label", self.label_map, per_class=5, seed=1
+            )[0],
+            rows,
+        )
+
+    def test_census_matches_full_analysis(self):
+        merged_df = merge_predictions(
+            self.fields,
+            zonal_aggregate(self.raster_path, self.fields),
+            "normalized_label",
+            self.label_map,
+        )
+        expected = (
+            MetricsAccumulator.from_label_map(self.label_map)
+            .update_frame(
+                merged_df, "gt_label", "pred_label", "confidence", self.label_map
+            )
+            .final_results()
+        )
+        result = quicklook(
+            self.fields,
+            self.raster_path,
+            "normalized_label",
+            self.label_map,
+            zonal_aggregate,
+            self.tmp.name,
+            per_class=len(self.fields),
+            n_bootstrap=50,
+        )
+        pd.testing.assert_frame_equal(result[expected.columns], expected)
+        # classes sampled in full have no sampling error
+        np.testing.assert_array_equal(
+            result["Average Confidence CI Low"], result["Average Confidence CI High"]
+        )
+        self.assertTrue(
+            os.path.exists(os.path.join(self.tmp.name, "final_results.csv"))
+        )
+
+    def test_overview_sample(self):
+        path = os.path.join(self.tmp.name, "overviews.tif")
+        shutil.copy(self.raster_path, path)
+        with rio.open(path, "r+") as dst:
+            dst.build_overviews([2, 4], Resampling.mode)
+        preds = zonal_aggregate(path, self.fields, overview_level=0)
+        self.assertEqual(preds["field_id"].tolist(), self.fields["field_id"].tolist())
+        # the 'field' engine workers read the same overview
+        for worker_mode in ("batch", "field"):
+            pd.testing.assert_frame_equal(
+                aggregate_predictions(
+                    path,
+                    self.fields,
+                    worker_mode=worker_mode,
+                    executor="serial",
+                    overview_level=0,
+                ),
+                preds,
+            )
+        result = quicklook(
+            self.fields,
+            path,
+            "normalized_label",
+            self.label_map,
+            partial(zonal_aggregate, overview_level=0),
+            self.tmp.name,
+            per_class=4,
+            n_bootstrap=50,
+        )
+        self.assertEqual(result["Sample Count"].sum(), 4)
+        self.assertEqual(result["Count"].sum(), len(self.fields))
+        self.assertTrue(
+            (result["F1 CI Low"] <= result["F1"]).all()
+            and (result["F1"] <= result["F1 CI High"]).all()
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -1,7 +1,15 @@
 import unittest
 import geopandas as gpd
+import numpy as np
+import pandas as pd
 from shapely.geometry import Polygon
-from crop_mle.select_fields import conf_percentiles, select_records
+from crop_mle.select_fields import (
+    conf_percentiles,
+    percentile_cutoffs,
+    quota_top_k,
+    select_records,
+    top_k,
+)
 
 
 class TestSelection(unittest.TestCase):
@@ -34,6 +42,95 @@ class TestSelection(unittest.TestCase):
         )
         self.assertIsInstance(sr, gpd.GeoDataFrame)
 
+    def test_select_records_does_not_modify_input(self):
+        columns = list(self.input_gdf.columns)
+        select_records(self.input_gdf, "pred_label", "gt_label", "confidence")
+        self.assertEqual(list(self.input_gdf.columns), columns)
+
+    def test_strata_and_percentile_sweep(self):
+        df = pd.DataFrame(
+            {
+                "pred_label": [1, 1, 1, 1, 2, 2],
+                "gt_label": [1, 1, 1, 1, 2, 1],
+                "confidence": [10.0, 20.0, 30.0, 40.0, 50.0, 60.0],
+                "region": ["a", "a", "b", "b", "a", "a"],
+            }
+        )
+        cutoffs = percentile_cutoffs(
+            df, "pred_label", "confidence", (0.5, 0.9), ["region"]
+        )
+        self.assertEqual(cutoffs.loc[(1, "b"), 0.5], 35.0)
+        selected = select_records(
+            df, "pred_label", "gt_label", "confidence", strata=["region"]
+        )
+        # median cutoffs 15 (1, a), 35 (1, b), 55 (2, a); the disagreement is always kept
+        self.assertEqual(selected.index.tolist(), [0, 2, 4, 5])
+        for percentile in (0.5, 0.9):
+            pd.testing.assert_frame_equal(
+                select_records(
+                    df,
+                    "pred_label",
+                    "gt_label",
+                    "confidence",
+                    percentile=percentile,
+                    strata=["region"],
+                    cutoffs=cutoffs,
+                ),
+                select_records(
+                    df,
+                    "pred_label",
+                    "gt_label",
+                    "confidence",
+                    percentile=percentile,
+                    strata=["region"],
+                ),
+            )
+
+    def test_nan_strata(self):
+        df = pd.DataFrame(
+            {
+                "pred_label": [1, 1, 1, 1, 1],
+                "gt_label": [1, 1, 1, 1, 1],
+                "confidence": [10.0, 20.0, 30.0, 40.0, 50.0],
+                "region": ["a", "a", np.nan, np.nan, np.nan],
+            }
+        )
+        cutoffs = percentile_cutoffs(df, "pred_label", "confidence", strata=["region"])
+        self.assertEqual(cutoffs.loc[(1, np.nan), 0.5], 40.0)
+        selected = select_records(
+            df, "pred_label", "gt_label", "confidence", strata=["region"]
+        )
+        # median cutoffs 15 (1, a) and 40 (1, NaN)
+        self.assertEqual(selected.index.tolist(), [0, 2])
+        self.assertEqual(selected["conf_cutoff"].tolist(), [15.0, 40.0])
+
+    def test_budget_and_quota(self):
+        scores = np.array([0.1, 0.9, np.nan, 0.5, 0.7])
+        np.testing.assert_array_equal(top_k(scores, 2), [1, 4])
+        np.testing.assert_array_equal(top_k(scores, 10), [0, 1, 3, 4])
+        labels = np.array(["x", "y", "x", "x", "y"])
+        np.testing.assert_array_equal(quota_top_k(labels, scores, 1), [1, 3])
+        np.testing.assert_array_equal(
+            quota_top_k(labels, scores, {"x": 2}), [0, 1, 3, 4]
+        )
+
+        df = pd.DataFrame(
+            {
+                "pred_label": [1, 1, 1, 2, 2, 2],
+                "gt_label": [1, 2, 1, 2, 1, 2],
+                "confidence": [10.0, 90.0, 20.0, 30.0, 80.0, 40.0],
+            }
+        )
+        selected = select_records(
+            df, "pred_label", "gt_label", "confidence", percentile=1.0, budget=3
+        )
+        # both disagreements, then the least confident correct prediction
+        self.assertEqual(selected.index.tolist(), [0, 1, 4])
+        selected = select_records(
+            df, "pred_label", "gt_label", "confidence", percentile=1.0, class_quota=1
+        )
+        self.assertEqual(selected.index.tolist(), [1, 4])
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,118 @@
+import json
+import threading
+import unittest
+import urllib.error
+import urllib.request
+from unittest import mock
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+from crop_mle._types import CropTypeDictionary
+from crop_mle.evaluate import schema_check, merge_predictions
+from crop_mle.metrics import MetricsAccumulator
+from crop_mle.process import aggregate_predictions
+from crop_mle.service import EvaluationService, make_server
+
+
+class TestService(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.fields = gpd.read_file("crop_mle/tests/test.gpkg")
+        self.raster_path = "crop_mle/tests/test.tif"
+        self.service = EvaluationService(self.raster_path)
+
+    def tearDown(self):
+        self.service.close()
+
+    def post(self, url: str, body: bytes) -> dict:
+        request = urllib.request.Request(url, data=body)
+        with urllib.request.urlopen(request) as response:
+            return json.loads(response.read())
+
+    def test_predict_matches_aggregation(self):
+        expected = aggregate_predictions(self.raster_path, self.fields)
+        pd.testing.assert_frame_equal(self.service.predict(self.fields), expected)
+        # second request is served from the warm cache
+        pd.testing.assert_frame_equal(
+            self.service.predict(self.fields.iloc[[4, 1]]),
+            expected.iloc[[4, 1]].reset_index(drop=True),
+        )
+        self.assertEqual(len(self.service._cache), len(self.fields))
+        # fields in another CRS are reprojected to the raster CRS
+        projected = self.fields.to_crs(3857)
+        pd.testing.assert_frame_equal(
+            self.service.predict(projected),
+            aggregate_predictions(self.raster_path, projected.to_crs(self.fields.crs)),
+        )
+
+    def test_http_endpoints(self):
+        server = make_server(self.service, port=0)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        url = f"http://127.0.0.1:{server.server_port}"
+        try:
+            body = self.fields.to_json().encode()
+            predictions = self.post(url + "/predict", body)
+            self.assertEqual(
+                [f["field_id"] for f in predictions["fields"]],
+                self.fields["field_id"].tolist(),
+            )
+            result = self.post(url + "/metrics", body)
+            label_map = CropTypeDictionary()
+            fields = schema_check(self.fields, "normalized_label", label_map)
+            merged_df = merge_predictions(
+                fields,
+                aggregate_predictions(self.raster_path, fields),
+                "normalized_label",
+                label_map,
+            )
+            metrics = MetricsAccumulator.from_label_map(label_map).update_frame(
+                merged_df, "gt_label", "pred_label", "confidence", label_map
+            )
+            np.testing.assert_array_equal(result["confusion_matrix"], metrics.confusion)
+            pd.testing.assert_frame_equal(
+                pd.DataFrame(result["final_results"]),
+                metrics.final_results().reset_index(drop=True),
+                check_dtype=False,
+            )
+            with self.assertRaises(urllib.error.HTTPError) as error:
+                self.post(url + "/predict", b'{"type": "Feature"}')
+            self.assertEqual(error.exception.code, 400)
+            with self.assertRaises(urllib.error.HTTPError) as error:
+                self.post(url + "/predict", b'"notjson"')
+            self.assertEqual(error.exception.code, 400)
+            # errors while aggregating are reported instead of dropping the connection
+            with mock.patch.object(
+                self.service, "predict", side_effect=RuntimeError("read failed")
+            ), self.assertRaises(urllib.error.HTTPError) as error:
+                self.post(url + "/predict", body)
+            self.assertEqual(error.exception.code, 500)
+            with urllib.request.urlopen(url + "/health") as response:
+                self.assertEqual(json.loads(response.read())["requests"], 2)
+        finally:
+            server.shutdown()
+            server.server_close()
+
+    def test_cache_eviction(self):
+        service = EvaluationService(self.raster_path, executor="serial", cache_size=3)
+        service.predict(self.fields.iloc[:3])
+        service.predict(self.fields.iloc[[0]])
+        service.predict(self.fields.iloc[3:5])
+        # field 0 was used most recently, fields 1 and 2 are evicted
+        ids = [field_id for field_id, _ in service._cache]
+        self.assertEqual(ids, self.fields["field_id"].iloc[[0, 3, 4]].tolist())
+        self.assertEqual(service.evictions, 2)
+        service.close()
+
+    def test_block_engine(self):
+        service = EvaluationService(self.raster_path, engine="block", cache=False)
+        pd.testing.assert_frame_equal(
+            service.predict(self.fields),
+            aggregate_predictions(self.raster_path, self.fields),
+        )
+        service.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
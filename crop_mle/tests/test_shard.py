@@ -0,0 +1,103 @@
+import unittest
+import os
+import shutil
+import tempfile
+import numpy as np
+import pandas as pd
+import geopandas as gpd
+from crop_mle._types import CropTypeDictionary
+from crop_mle.evaluate import schema_check, merge_predictions, write_analysis
+from crop_mle.metrics import MetricsAccumulator
+from crop_mle.select_fields import select_records
+from crop_mle.shard import (
+    merge_shards,
+    parse_shard,
+    shard_path,
+    shard_rows,
+    write_shard,
+)
+from crop_mle.zonal import zonal_aggregate
+
+
+class TestShard(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.label_map = CropTypeDictionary()
+        self.fields = schema_check(
+            gpd.read_file("crop_mle/tests/test.gpkg"),
+            "normalized_label",
+            self.label_map,
+        )
+        self.raster_path = "crop_mle/tests/test.tif"
+        self.tmp = tempfile.TemporaryDirectory()
+        self.shard_dir = os.path.join(self.tmp.name, "shards")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def run_shards(self, count):
+        for index in range(count):
+            rows = shard_rows(self.fields, index, count)
+            fields = self.fields.iloc[rows]
+            merged_df = merge_predictions(
+                fields,
+                zonal_aggregate(self.raster_path, fields),
+                "normalized_label",
+                self.label_map,
+            )
+            metrics = MetricsAccumulator.from_label_map(self.label_map).update_frame(
+                merged_df, "gt_label", "pred_label", "confidence", self.label_map
+            )
+            write_shard(
+                self.shard_dir, index, count, merged_df, rows, metrics, len(self.fields)
+            )
+
+    def test_shard_rows_partition(self):
+        rows = [shard_rows(self.fields, i, 3) for i in range(3)]
+        np.testing.assert_array_equal(
+            np.sort(np.concatenate(rows)), np.arange(len(self.fields))
+        )
+        self.assertLessEqual(max(map(len, rows)) - min(map(len, rows)), 1)
+        np.testing.assert_array_equal(shard_rows(self.fields, 1, 3), rows[1])
+        self.assertEqual(parse_shard("2/4"), (2, 4))
+        for spec in ("4/4", "-1/2", "1"):
+            with self.assertRaises(ValueError):
+                parse_shard(spec)
+
+    def test_merge_matches_single_run(self):
+        merged_df = merge_predictions(
+            self.fields,
+            zonal_aggregate(self.raster_path, self.fields),
+            "normalized_label",
+            self.label_map,
+        )
+        metrics = MetricsAccumulator.from_label_map(self.label_map).update_frame(
+            merged_df, "gt_label", "pred_label", "confidence", self.label_map
+        )
+        single_dir = os.path.join(self.tmp.name, "single")
+        os.makedirs(single_dir)
+        expected = write_analysis(metrics, metrics.labels, single_dir)
+        expected_selected = select_records(
+            merged_df.copy(), "pred_label", "gt_label", "confidence"
+        )
+
+        self.run_shards(3)
+        pd.testing.assert_frame_equal(
+            merge_shards(self.shard_dir, self.tmp.name), expected
+        )
+        selected = merge_shards(self.shard_dir, self.tmp.name, mode="select")
+        pd.testing.assert_frame_equal(
+            selected.reset_index(drop=True),
+            expected_selected.reset_index(drop=True),
+        )
+
+    def test_missing_shard(self):
+        self.run_shards(3)
+        shutil.rmtree(shard_path(self.shard_dir, 1, 3))
+        with self.assertRaisesRegex(ValueError, r"Missing shards \[1\]"):
+            merge_shards(self.shard_dir, self.tmp.name)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,67 @@
+import unittest
+import json
+import os
+import subprocess
+import sys
+
+# import-time budgets in seconds per mode, with headroom over the ~0.6s (select) and ~1.8s (analysis)
+# measured on a single core; select mode must stay clear of the plotting/sklearn stack and of pyarrow's
+# Parquet module (pandas loads the pyarrow core itself)
+IMPORT_BUDGET_S = {"select": 3.0, "analysis": 6.0}
+HEAVY_MODULES = ("matplotlib", "seaborn", "sklearn", "pyarrow.parquet")
+
+# modules each mode loads on top of main.py before its first heavy computation
+MODE_IMPORTS = {
+    "select": "",
+    "analysis": "import matplotlib.pyplot, seaborn",
+}
+
+SCRIPT = """
+import json, logging, sys, time
+start = time.perf_counter()
+import main
+{extra}
+print(json.dumps({{
+    "seconds": time.perf_counter() - start,
+    "heavy": [m for m in {heavy!r} if m in sys.modules],
+    "log_handlers": len(logging.getLogger().handlers),
+}}))
+"""
+
+
+def measure_import(mode: str) -> dict:
+    """Import crop_mle/main.py (and the libraries `mode` needs) in a fresh interpreter and report what was loaded."""
+    out = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            SCRIPT.format(extra=MODE_IMPORTS[mode], heavy=HEAVY_MODULES),
+        ],
+        cwd=os.path.join(os.path.dirname(__file__), ".."),
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+class TestStartup(unittest.TestCase):
+
+    def test_select_import_is_light(self):
+        result = measure_import("select")
+        self.assertEqual(result["heavy"], [])
+        # logging is configured by main(), not as an import side effect
+        self.assertEqual(result["log_handlers"], 0)
+
+    def test_import_budget(self):
+        for mode, budget in IMPORT_BUDGET_S.items():
+            seconds = measure_import(mode)["seconds"]
+            self.assertLess(
+                seconds,
+                budget,
+                f"{mode} imports took {seconds:.2f}s (budget {budget}s)",
+            )
+
+
+if __name__ == "__main__":
+    unittest.main()
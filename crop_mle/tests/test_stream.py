@@ -0,0 +1,102 @@
+import unittest
+import os
+import tempfile
+import geopandas as gpd
+import numpy as np
+from crop_mle._types import CropTypeDictionary
+from crop_mle.evaluate import schema_check, merge_predictions
+from crop_mle.metrics import MetricsAccumulator
+from crop_mle.select_fields import select_records
+from crop_mle.stream import iter_field_chunks, stream_metrics, stream_select
+from crop_mle.zonal import zonal_aggregate
+
+
+class TestStream(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.gt_path = "crop_mle/tests/test.gpkg"
+        self.raster_path = "crop_mle/tests/test.tif"
+        self.label_map = CropTypeDictionary()
+        fields = schema_check(
+            gpd.read_file(self.gt_path), "normalized_label", self.label_map
+        )
+        preds = zonal_aggregate(self.raster_path, fields)
+        self.merged = merge_predictions(
+            fields, preds, "normalized_label", self.label_map
+        )
+
+    def test_iter_field_chunks(self):
+        chunks = list(iter_field_chunks(self.gt_path, chunk_size=3))
+        self.assertEqual([len(c) for c in chunks], [3, 3, 1])
+        self.assertEqual(chunks[-1].index.tolist(), [6])
+
+    def test_stream_metrics(self):
+        expected = MetricsAccumulator.from_label_map(self.label_map).update_frame(
+            self.merged, "gt_label", "pred_label", "confidence", self.label_map
+        )
+        result = stream_metrics(
+            self.gt_path,
+            self.raster_path,
+            "normalized_label",
+            self.label_map,
+            zonal_aggregate,
+            chunk_size=2,
+        )
+        np.testing.assert_array_equal(result.counts, expected.counts)
+        np.testing.assert_allclose(
+            result.average_confidence(), expected.average_confidence()
+        )
+
+    def test_stream_select(self):
+        expected = select_records(self.merged, "pred_label", "gt_label", "confidence")
+        with tempfile.TemporaryDirectory() as tmp:
+            output_path = os.path.join(tmp, "selected_fields.gpkg")
+            n_selected = stream_select(
+                self.gt_path,
+                self.raster_path,
+                "normalized_label",
+                self.label_map,
+                zonal_aggregate,
+                output_path,
+                chunk_size=2,
+            )
+            result = gpd.read_file(output_path)
+        self.assertEqual(n_selected, len(expected))
+        self.assertEqual(result["field_id"].tolist(), expected["field_id"].tolist())
+        self.assertEqual(set(result.columns), set(expected.columns))
+
+    def test_stream_select_empty(self):
+        expected = select_records(self.merged, "pred_label", "gt_label", "confidence")
+        with tempfile.TemporaryDirectory() as tmp:
+            empty_gt = os.path.join(tmp, "empty.gpkg")
+            gpd.read_file(self.gt_path).iloc[:0].to_file(empty_gt)
+            for gt_path, select, columns in (
+                # nothing selected: the schema of a selection
+                (
+                    self.gt_path,
+                    lambda *args: select_records(*args).iloc[:0],
+                    expected.columns,
+                ),
+                # empty ground truth: the schema of the input
+                (empty_gt, select_records, gpd.read_file(self.gt_path).columns),
+            ):
+                output_path = os.path.join(tmp, "selected_fields.gpkg")
+                n_selected = stream_select(
+                    gt_path,
+                    self.raster_path,
+                    "normalized_label",
+                    self.label_map,
+                    zonal_aggregate,
+                    output_path,
+                    chunk_size=2,
+                    select=select,
+                )
+                result = gpd.read_file(output_path)
+                self.assertEqual(n_selected, 0)
+                self.assertEqual(len(result), 0)
+                self.assertEqual(set(result.columns), set(columns))
+
+
+if __name__ == "__main__":
+    unittest.main()
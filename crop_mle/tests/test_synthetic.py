@@ -0,0 +1,75 @@
+import unittest
+import os
+import tempfile
+import rasterio as rio
+import shapely
+from crop_mle._types import CropTypeDictionary
+from crop_mle.benchmark import run_benchmark
+from crop_mle.evaluate import schema_check
+from crop_mle.synthetic import synthetic_raster, synthetic_fields
+
+
+class TestSynthetic(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.raster_path = synthetic_raster(
+            os.path.join(self.tmp.name, "synthetic.tif"),
+            width=300,
+            height=200,
+            tile_size=128,
+        )
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_synthetic_raster(self):
+        with rio.open(self.raster_path) as src:
+            self.assertEqual((src.count, src.width, src.height), (4, 300, 200))
+            self.assertEqual(src.block_shapes[0], (128, 128))
+            classes, confidence = src.read([3, 4])
+        self.assertTrue(((classes >= 0) & (classes < 32)).all())
+        self.assertTrue(((confidence >= 0) & (confidence <= 100)).all())
+        compressed = synthetic_raster(
+            os.path.join(self.tmp.name, "deflate.tif"),
+            width=300,
+            height=200,
+            tile_size=128,
+            compress="deflate",
+        )
+        with rio.open(compressed) as src:
+            self.assertEqual(src.compression.name, "deflate")
+            self.assertTrue((src.read(3) == classes).all())
+
+    def test_synthetic_fields(self):
+        fields = synthetic_fields(self.raster_path, 500)
+        with rio.open(self.raster_path) as src:
+            left, bottom, right, top = src.bounds
+        minx, miny, maxx, maxy = fields.total_bounds
+        self.assertTrue(
+            left <= minx and maxx <= right and bottom <= miny and maxy <= top
+        )
+        self.assertTrue(fields.is_valid.all())
+        # fields do not overlap
+        self.assertAlmostEqual(
+            shapely.union_all(fields.geometry.values).area / fields.area.sum(), 1.0
+        )
+        self.assertTrue(fields["field_id"].is_unique)
+        # every label maps to a crop type in the default dictionary
+        checked = schema_check(fields, "normalized_label", CropTypeDictionary())
+        self.assertEqual(len(checked), len(fields))
+
+    def test_run_benchmark(self):
+        records = run_benchmark(
+            [50], self.tmp.name, width=256, height=256, tile_size=128, engines=["block"]
+        )
+        stages = [r["stage"] for r in records]
+        self.assertIn("aggregate_block", stages)
+        self.assertIn("select_records", stages)
+        self.assertTrue(
+            all(r["seconds"] >= 0 and r["peak_rss_mb"] > 0 for r in records)
+        )
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+import json
+import os
+import tempfile
+import numpy as np
+from crop_mle._types import CropTypeDictionary
+
+
+class TestTypes(unittest.TestCase):
+
+    def setUp(self):
+        self.label_map = CropTypeDictionary()
+
+    def test_alias_lookup(self):
+        lookup = self.label_map.alias_lookup
+        self.assertEqual(lookup["barley_summer"], "Spring Barley")
+        self.assertEqual(lookup["Sorghum"], "Sorghum")
+        for crop, aliases in self.label_map.crop_dict.items():
+            for alias in aliases:
+                self.assertEqual(lookup[alias], crop)
+
+    def test_names_from_ints(self):
+        names = self.label_map.names_from_ints([7, 7.0, np.nan, 99, -1, 0])
+        self.assertEqual(
+            names.tolist(),
+            ["Winter Wheat", "Winter Wheat", None, None, None, "Grassland Cultivated"],
+        )
+        self.assertEqual(
+            list(self.label_map.label_dtype.categories),
+            list(self.label_map.crop_dict.keys()),
+        )
+
+    def test_from_file(self):
+        crop_dict = {"Wheat": ["wheat_winter", "wheat_spring"], "Corn": ["corn"]}
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "labels.json")
+            with open(path, "w") as f:
+                json.dump(
+                    {"crop_dict": crop_dict, "crop_numeric": {"Wheat": 0, "Corn": 1}}, f
+                )
+            label_map = CropTypeDictionary.from_file(path)
+        self.assertEqual(label_map.crop_dict, crop_dict)
+        self.assertEqual(label_map.alias_lookup["wheat_spring"], "Wheat")
+        self.assertEqual(label_map.names_from_ints([1]).tolist(), ["Corn"])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import os
+import tempfile
+import unittest
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import rasterio as rio
+from shapely.geometry import box
+from crop_mle.process import aggregate_predictions
+from crop_mle.zonal import field_layers, zonal_aggregate
+
+
+class TestZonal(unittest.TestCase):
+
+    def setUp(self):
+        # Set up example data
+        self.fields = gpd.read_file("crop_mle/tests/test.gpkg")
+        self.raster_path = "crop_mle/tests/test.tif"
+
+    def test_zonal_aggregate_matches_aggregate_predictions(self):
+        expected = aggregate_predictions(self.raster_path, self.fields)
+        for window_size in (1, 1024):
+            result = zonal_aggregate(
+                self.raster_path, self.fields, window_size=window_size
+            )
+            pd.testing.assert_frame_equal(result, expected)
+
+    def test_overlapping_and_empty_fields(self):
+        # duplicate fields overlap their originals and a tiny field holds no pixel centre
+        centroid = self.fields.geometry.iloc[0].centroid
+        tiny = self.fields.iloc[[0]].copy()
+        tiny["field_id"] = "tiny"
+        tiny["geometry"] = [
+            box(centroid.x, centroid.y, centroid.x + 1e-6, centroid.y + 1e-6)
+        ]
+        fields = pd.concat(
+            [self.fields, self.fields.iloc[[0, 2]], tiny], ignore_index=True
+        )
+        expected = aggregate_predictions(self.raster_path, fields)
+        result = zonal_aggregate(self.raster_path, fields)
+        pd.testing.assert_frame_equal(result, expected)
+
+    def test_dataset_nodata_is_excluded(self):
+        # mark a stripe of pixels as nodata: both engines must leave them out
+        with tempfile.TemporaryDirectory() as tmp_dir, rio.open(
+            self.raster_path
+        ) as src:
+            path = os.path.join(tmp_dir, "nodata.tif")
+            data = src.read()
+            data[:, : src.height // 2 : 3, :] = -1
+            with rio.open(path, "w", **(src.profile | {"nodata": -1})) as dst:
+                dst.write(data)
+            expected = aggregate_predictions(path, self.fields)
+            result = zonal_aggregate(path, self.fields)
+        pd.testing.assert_frame_equal(result, expected)
+        # without the mask the -1 pixels would make the affected fields fail
+        self.assertTrue(np.all(result["predicted_int"].notna()))
+
+    def test_field_layers(self):
+        geoms = [box(0, 0, 2, 2), box(1, 1, 3, 3), box(2, 0, 4, 2), box(5, 5, 6, 6)]
+        layers = field_layers(gpd.GeoSeries(geoms).values)
+        self.assertNotEqual(layers[0], layers[1])
+        self.assertEqual(layers[2], 0)  # touches the first box, overlaps the second
+        self.assertEqual(layers[3], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()